@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark du stockage de l'historique : collection classique vs time-series
+
+Compare deux collections contenant les mêmes lignes :
+- taille : documents, données, stockage sur disque, index (collStats) ;
+- latence des requêtes par plage de dates : historique récent d'un
+  utilisateur, exercices d'une journée (tous utilisateurs), historique
+  complet d'un utilisateur.
+
+--prepare copie d'abord la collection classique dans une time-series (sans
+basculer l'application). Nécessite MongoDB 5.0+. Exemple (depuis
+application/backend, après generate_dataset.py) :
+    python -m benchmarks.bench_history_storage --prepare --repeat 50
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import timedelta
+from config.database import get_db
+from jobs.history_storage import create_target, copy_batches, is_timeseries
+
+
+def storage_stats(db, name):
+    stats = db.command('collStats', name)
+    return {
+        'documents': stats.get('count', 0),
+        'data_mb': stats.get('size', 0) / 1e6,
+        'storage_mb': stats.get('storageSize', 0) / 1e6,
+        'index_mb': stats.get('totalIndexSize', 0) / 1e6,
+        'buckets': stats.get('timeseries', {}).get('bucketCount')
+    }
+
+
+def sample_users(db, name, count, seed):
+    users = db[name].distinct('id_utilisateur')
+    return random.Random(seed).sample(users, min(count, len(users)))
+
+
+def queries(db, name, users, end):
+    collection = db[name]
+    return {
+        'utilisateur_30_jours': lambda user: list(collection.find(
+            {'id_utilisateur': user, 'date_execution': {'$gte': end - timedelta(days=30)}}
+        ).sort('date_execution', -1)),
+        'journee_par_exercice': lambda user: list(collection.aggregate([
+            {'$match': {'date_execution': {'$gte': end - timedelta(days=1), '$lt': end}}},
+            {'$group': {'_id': '$id_exercice', 'pratiques': {'$sum': 1}}}
+        ])),
+        'utilisateur_complet': lambda user: collection.count_documents({'id_utilisateur': user}),
+    }
+
+
+def measure(run, users, repeat):
+    timings = []
+    for index in range(repeat):
+        started = time.perf_counter()
+        run(users[index % len(users)])
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {'median_ms': statistics.median(timings) * 1000,
+            'p95_ms': timings[max(0, int(len(timings) * 0.95) - 1)] * 1000}
+
+
+def _format(value):
+    if value is None:
+        return '-'
+    return f"{value:,.1f}" if isinstance(value, float) else f"{value:,}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark classique vs time-series")
+    parser.add_argument('--standard', default='historiques_exercices')
+    parser.add_argument('--timeseries', default='historiques_ts')
+    parser.add_argument('--prepare', action='store_true',
+                        help="Copier la collection classique dans la time-series")
+    parser.add_argument('--granularity', choices=['seconds', 'minutes', 'hours'], default='hours')
+    parser.add_argument('--users', type=int, default=200, help="Utilisateurs échantillonnés")
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    db = get_db()
+    if db is None:
+        print("❌ Erreur: Impossible de se connecter à la base de données")
+        return
+
+    if args.prepare:
+        db[args.timeseries].drop()
+        create_target(db, args.timeseries, 'timeseries', args.granularity)
+        started = time.perf_counter()
+        _, inserted, rejected = copy_batches(db, args.standard, args.timeseries, 'timeseries')
+        print(f"📦 {inserted} ligne(s) copiée(s) ({rejected} rejetée(s)) "
+              f"en {time.perf_counter() - started:.1f}s")
+    if not is_timeseries(db, args.timeseries):
+        print(f"❌ {args.timeseries} n'est pas une collection time-series (voir --prepare)")
+        return
+
+    # Fin de la plage : date de la dernière ligne (jeu de données historique)
+    last = db[args.standard].find_one(sort=[('date_execution', -1)])
+    end = last['date_execution']
+    users = sample_users(db, args.standard, args.users, args.seed)
+
+    print(f"\n{'':<22}{'classique':>14}{'time-series':>14}")
+    standard, timeseries = storage_stats(db, args.standard), storage_stats(db, args.timeseries)
+    for key in ('documents', 'data_mb', 'storage_mb', 'index_mb', 'buckets'):
+        left, right = standard[key], timeseries[key]
+        print(f"{key:<22}{_format(left):>14}{_format(right):>14}")
+
+    print(f"\nLatence (médiane / p95 sur {args.repeat} requêtes, {len(users)} utilisateurs)")
+    standard_queries = queries(db, args.standard, users, end)
+    timeseries_queries = queries(db, args.timeseries, users, end)
+    for name in standard_queries:
+        left = measure(standard_queries[name], users, args.repeat)
+        right = measure(timeseries_queries[name], users, args.repeat)
+        print(f"  {name:<22} classique {left['median_ms']:7.2f} / {left['p95_ms']:7.2f} ms   "
+              f"time-series {right['median_ms']:7.2f} / {right['p95_ms']:7.2f} ms   "
+              f"x{left['median_ms'] / right['median_ms']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
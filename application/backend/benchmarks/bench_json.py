@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Benchmark de sérialisation JSON des endpoints de liste
+
+Compare, sur des documents synthétiques de la forme de GET /historiques,
+GET /users et GET /informations-sante :
+- ancien : copie champ par champ (str(ObjectId), isoformat) + provider Flask par défaut
+- nouveau (json) : documents tels quels + MongoJSONProvider sans orjson
+- nouveau (orjson) : documents tels quels + MongoJSONProvider avec orjson
+
+Aucune base n'est nécessaire. Exemple (depuis application/backend) :
+    python -m benchmarks.bench_json --rows 10000 --repeat 5
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+import utils.json_provider as json_provider
+from utils.json_provider import MongoJSONProvider
+
+
+def make_historiques(rows, rng):
+    base = datetime(2024, 1, 1)
+    exercices = [{'_id': ObjectId(), 'nom': f"Exercice {i}", 'duree_inspiration': 4,
+                  'duree_apnee': 7, 'duree_expiration': 8} for i in range(20)]
+    users = [{'_id': ObjectId(), 'nom': 'Martin', 'prenom': f"Utilisateur {i}"}
+             for i in range(500)]
+    return [{
+        '_id': ObjectId(),
+        'date_execution': base + timedelta(seconds=rng.randrange(365 * 86400)),
+        'exercice': [rng.choice(exercices)],
+        'utilisateur': [rng.choice(users)]
+    } for _ in range(rows)]
+
+
+def make_users(rows, rng):
+    base = datetime(2023, 1, 1)
+    return [{
+        '_id': ObjectId(), 'nom': 'Dubois', 'prenom': 'Léa',
+        'email': f"lea.dubois.{i}@example.com", 'role': 'utilisateur',
+        'est_actif': rng.random() > 0.1,
+        'date_creation': base + timedelta(minutes=rng.randrange(500000))
+    } for i in range(rows)]
+
+
+def make_contenus(rows, rng):
+    base = datetime(2024, 6, 1)
+    return [{
+        '_id': ObjectId(), 'titre': f"Contenu {i}", 'texte': "Respirez calmement. " * 20,
+        'date_creation': base + timedelta(hours=i),
+        'date_mise_a_jour': base + timedelta(hours=i, minutes=rng.randrange(600))
+    } for i in range(rows)]
+
+
+# Conversions "à la main" telles qu'écrites avant le provider
+def legacy_historiques(documents):
+    result = []
+    for historique in documents:
+        exercice = historique['exercice'][0] if historique.get('exercice') else {}
+        utilisateur = historique['utilisateur'][0] if historique.get('utilisateur') else {}
+        result.append({
+            'id': str(historique['_id']),
+            'date_execution': historique['date_execution'].isoformat(),
+            'exercice': {
+                'id': str(exercice['_id']),
+                'nom': exercice.get('nom', ''),
+                'duree_inspiration': exercice.get('duree_inspiration', 0),
+                'duree_apnee': exercice.get('duree_apnee', 0),
+                'duree_expiration': exercice.get('duree_expiration', 0)
+            } if exercice else None,
+            'utilisateur': {
+                'id': str(utilisateur['_id']),
+                'nom': utilisateur.get('nom', ''),
+                'prenom': utilisateur.get('prenom', '')
+            } if utilisateur else None
+        })
+    return result
+
+
+def legacy_users(documents):
+    return [{
+        'id': str(user['_id']), 'nom': user.get('nom', ''), 'prenom': user.get('prenom', ''),
+        'email': user.get('email', ''), 'role': user.get('role', 'utilisateur'),
+        'est_actif': user.get('est_actif', True), 'date_creation': user.get('date_creation')
+    } for user in documents]
+
+
+def legacy_contenus(documents):
+    result = []
+    for document in documents:
+        contenu = dict(document)
+        contenu['id'] = str(contenu.pop('_id'))
+        contenu['date_creation'] = contenu['date_creation'].isoformat()
+        contenu['date_mise_a_jour'] = contenu['date_mise_a_jour'].isoformat()
+        result.append(contenu)
+    return result
+
+
+# Forme renvoyée par MongoDB une fois la projection appliquée côté serveur
+def projected_historiques(documents):
+    return [{'id': d['_id'], 'date_execution': d['date_execution'],
+             'exercice': {'id': d['exercice'][0]['_id'], **{k: v for k, v in d['exercice'][0].items() if k != '_id'}},
+             'utilisateur': {'id': d['utilisateur'][0]['_id'], **{k: v for k, v in d['utilisateur'][0].items() if k != '_id'}}}
+            for d in documents]
+
+
+def projected_with_id(documents):
+    return [{'id': d['_id'], **{k: v for k, v in d.items() if k != '_id'}} for d in documents]
+
+
+def measure(label, app, payload_factory, repeat):
+    timings = []
+    size = 0
+    with app.app_context():
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = app.json.response(payload_factory())
+            timings.append(time.perf_counter() - started)
+            size = len(response.get_data())
+    return {'label': label, 'median_ms': statistics.median(timings) * 1000,
+            'min_ms': min(timings) * 1000, 'bytes': size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du provider JSON")
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    datasets = {
+        'historiques': (make_historiques(args.rows, rng), legacy_historiques, projected_historiques),
+        'users': (make_users(args.rows, rng), legacy_users, projected_with_id),
+        'contenus': (make_contenus(args.rows, rng), legacy_contenus, projected_with_id),
+    }
+
+    default_app = Flask('bench_default')
+    default_app.json = DefaultJSONProvider(default_app)
+    mongo_app = Flask('bench_mongo')
+    mongo_app.json = MongoJSONProvider(mongo_app)
+    orjson_module = json_provider.orjson
+
+    print(f"{args.rows} lignes, médiane sur {args.repeat} répétitions "
+          f"(orjson {'disponible' if orjson_module else 'absent'})")
+    for name, (documents, legacy, projected) in datasets.items():
+        # La projection est faite par MongoDB en production : hors mesure
+        projected_documents = projected(documents)
+        results = [measure('ancien', default_app, lambda: legacy(documents), args.repeat)]
+        json_provider.orjson = None
+        results.append(measure('nouveau (json)', mongo_app,
+                               lambda: projected_documents, args.repeat))
+        json_provider.orjson = orjson_module
+        if orjson_module is not None:
+            results.append(measure('nouveau (orjson)', mongo_app,
+                                   lambda: projected_documents, args.repeat))
+        baseline = results[0]['median_ms']
+        print(f"\n{name}")
+        for result in results:
+            print(f"  {result['label']:<18} {result['median_ms']:8.1f} ms "
+                  f"(min {result['min_ms']:.1f})  x{baseline / result['median_ms']:.1f}  "
+                  f"{result['bytes']} octets")
+
+
+if __name__ == "__main__":
+    main()
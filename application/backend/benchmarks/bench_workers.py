@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Benchmark des modèles de workers gunicorn (gunicorn.conf.py)
+
+Pour chaque modèle demandé, démarre gunicorn avec GUNICORN_WORKER_CLASS, attend
+/health, puis envoie des requêtes concurrentes sur les endpoints pendant
+--duration secondes : débit, latence médiane / p95 / p99 et erreurs par
+endpoint, RSS totale des processus gunicorn en fin de mesure.
+
+Nécessite MongoDB et un jeu de données (init_data.py ou generate_dataset.py) ;
+gevent n'est mesuré que si le paquet est installé. Exemple (depuis
+application/backend) :
+    python -m benchmarks.bench_workers --models sync gthread gevent --concurrency 64
+    python -m benchmarks.bench_workers --endpoint /exercices --endpoint /historiques/stats
+"""
+
+import argparse
+import importlib.util
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import psutil
+
+DEFAULT_ENDPOINTS = ['/health', '/exercices', '/informations-sante', '/search?q=respiration']
+
+
+def start_server(model, port, workers, threads):
+    env = dict(os.environ, GUNICORN_WORKER_CLASS=model, PORT=str(port),
+               GUNICORN_ACCESS_LOG='', GUNICORN_LOG_LEVEL='warning')
+    if workers:
+        env['GUNICORN_WORKERS'] = str(workers)
+    if threads:
+        env['GUNICORN_THREADS'] = str(threads)
+    return subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'main:app'],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+def wait_ready(base_url, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(process.stderr.read().decode('utf-8', 'replace')[-2000:])
+        try:
+            with urllib.request.urlopen(f"{base_url}/health", timeout=2):
+                return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.5)
+    raise RuntimeError(f"Serveur non prêt après {timeout}s")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def server_rss_mb(process):
+    try:
+        parent = psutil.Process(process.pid)
+        return sum(p.memory_info().rss for p in [parent] + parent.children(recursive=True)) / 1e6
+    except psutil.NoSuchProcess:
+        return None
+
+
+def load(base_url, endpoints, concurrency, duration, headers):
+    """Requêtes en boucle depuis `concurrency` threads ; retourne les mesures par endpoint"""
+    deadline = time.time() + duration
+    results = {endpoint: {'timings': [], 'errors': 0} for endpoint in endpoints}
+
+    def client(index):
+        request_number = index
+        while time.time() < deadline:
+            endpoint = endpoints[request_number % len(endpoints)]
+            request_number += 1
+            request = urllib.request.Request(base_url + endpoint, headers=headers)
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+                results[endpoint]['timings'].append(time.perf_counter() - started)
+            except (urllib.error.URLError, OSError):
+                results[endpoint]['errors'] += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(client, range(concurrency)))
+    return results
+
+
+def summarize(timings):
+    if not timings:
+        return {'median_ms': None, 'p95_ms': None, 'p99_ms': None}
+    timings = sorted(timings)
+    return {'median_ms': statistics.median(timings) * 1000,
+            'p95_ms': timings[max(0, int(len(timings) * 0.95) - 1)] * 1000,
+            'p99_ms': timings[max(0, int(len(timings) * 0.99) - 1)] * 1000}
+
+
+def _format(value):
+    return '-' if value is None else f"{value:,.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparaison des modèles de workers gunicorn")
+    parser.add_argument('--models', nargs='+', default=['sync', 'gthread', 'gevent'],
+                        choices=['sync', 'gthread', 'gevent'])
+    parser.add_argument('--endpoint', action='append', default=[],
+                        help="Endpoint à mesurer (répétable, défaut : catalogue, recherche, health)")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=15.0, help="Durée de mesure (s) par modèle")
+    parser.add_argument('--warmup', type=float, default=3.0)
+    parser.add_argument('--workers', type=int, help="Forcer le nombre de workers")
+    parser.add_argument('--threads', type=int, help="Forcer le nombre de threads (gthread)")
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--cookie', help="Cookie access_token pour les endpoints authentifiés")
+    args = parser.parse_args()
+
+    endpoints = args.endpoint or DEFAULT_ENDPOINTS
+    headers = {'Accept-Encoding': 'gzip'}
+    if args.cookie:
+        headers['Cookie'] = f"access_token={args.cookie}"
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    summary = []
+    for model in args.models:
+        if model == 'gevent' and importlib.util.find_spec('gevent') is None:
+            print("⏭️  gevent non installé : modèle ignoré")
+            continue
+        print(f"\n🚀 {model} ...")
+        process = start_server(model, args.port, args.workers, args.threads)
+        try:
+            wait_ready(base_url, process)
+            load(base_url, endpoints, args.concurrency, args.warmup, headers)
+            results = load(base_url, endpoints, args.concurrency, args.duration, headers)
+            rss = server_rss_mb(process)
+        except RuntimeError as e:
+            print(f"❌ {model}: {e}")
+            continue
+        finally:
+            stop_server(process)
+
+        total = sum(len(result['timings']) for result in results.values())
+        errors = sum(result['errors'] for result in results.values())
+        print(f"{'endpoint':<32}{'req':>8}{'médiane':>10}{'p95':>10}{'p99':>10}{'erreurs':>9}")
+        for endpoint, result in results.items():
+            stats = summarize(result['timings'])
+            print(f"{endpoint:<32}{len(result['timings']):>8}{_format(stats['median_ms']):>10}"
+                  f"{_format(stats['p95_ms']):>10}{_format(stats['p99_ms']):>10}{result['errors']:>9}")
+        summary.append((model, total / args.duration, errors, rss))
+
+    print(f"\n{'modèle':<10}{'req/s':>10}{'erreurs':>10}{'RSS (Mo)':>12}")
+    for model, throughput, errors, rss in summary:
+        print(f"{model:<10}{throughput:>10,.1f}{errors:>10}{_format(rss):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,4 +17,8 @@ else:
 load_dotenv('config.env')
 
 SECRET_KEY = os.getenv('SECRET_KEY', 'cesizen-secret-key-dev-2024')
-JWT_EXPIRATION_DELTA = int(os.getenv('JWT_EXPIRATION_DELTA', '86400'))
\ No newline at end of file
+JWT_EXPIRATION_DELTA = int(os.getenv('JWT_EXPIRATION_DELTA', '86400'))
+
+# Connexion MongoDB (sans ouvrir de connexion : voir config/database.py)
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
+DB_NAME = os.getenv('DB_NAME', 'cesizen_db')
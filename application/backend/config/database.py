@@ -1,6 +1,7 @@
 from pymongo import MongoClient
 from datetime import datetime
 import os
+import threading
 from dotenv import load_dotenv
 
 """Gestion du chargement des variables d'environnement pour MongoDB.
@@ -40,55 +41,80 @@ masked_uri = _mask_mongo_uri(MONGO_URI)
 print(f"Connecting to MongoDB with URI: {masked_uri}")
 print(f"Using database name: {DB_NAME}")
 
+# Un MongoClient (et son pool de connexions) par processus. MongoClient n'est
+# pas fork-safe : un worker forké après le chargement de l'application
+# (gunicorn preload_app) en recrée un au premier appel (voir reset_client).
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '100'))
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+def _connect():
+    print("Creating new MongoDB connection...")
+    client = MongoClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
+    # Test de la connexion
+    print("Testing connection with ping...")
+    client.admin.command('ping')
+    print("Connection successful!")
+    
+    # Vérification de la base de données
+    dbs = client.list_database_names()
+    print(f"Available databases: {dbs}")
+    
+    if DB_NAME not in dbs:
+        print(f"Database {DB_NAME} does not exist, it will be created on first use")
+    else:
+        print(f"Database {DB_NAME} exists")
+    return client
+
 def get_db():
+    """Base de données via le client partagé du processus (None si indisponible)"""
+    global _client, _client_pid
     try:
-        print("Creating new MongoDB connection...")
-        client = MongoClient(MONGO_URI)
-        # Test de la connexion
-        print("Testing connection with ping...")
-        client.admin.command('ping')
-        print("Connection successful!")
-        
-        # Vérification de la base de données
-        dbs = client.list_database_names()
-        print(f"Available databases: {dbs}")
-        
-        if DB_NAME not in dbs:
-            print(f"Database {DB_NAME} does not exist, it will be created on first use")
-        else:
-            print(f"Database {DB_NAME} exists")
-        
-        db = client[DB_NAME]
-        print(f"Using database: {db.name}")
+        if _client is None or _client_pid != os.getpid():
+            with _client_lock:
+                if _client is None or _client_pid != os.getpid():
+                    _client = _connect()
+                    _client_pid = os.getpid()
+        db = _client[DB_NAME]
         return db
     except Exception as e:
         print(f"Erreur de connexion à MongoDB: {e}")
         return None
 
+def reset_client():
+    """
+    Oublier le client hérité du processus parent (après un fork)
+
+    Le client du parent n'est pas fermé : ses sockets sont partagées avec le
+    parent et les autres workers.
+    """
+    global _client, _client_pid
+    with _client_lock:
+        _client = None
+        _client_pid = None
+
 class Database:
     _instance = None
-    _client = None
-    _db = None
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(Database, cls).__new__(cls)
         return cls._instance
 
-    def __init__(self):
-        if self._client is None:
-            self._client = get_db()
-            self._db = self._client
+    # Aucune connexion à l'import : le client est créé au premier get_db(),
+    # après l'enregistrement des listeners pymongo (utils/slow_requests.py)
 
     def get_db(self):
-        return self._db
+        # Toujours le client du processus courant (fork-safe)
+        return get_db()
 
     def get_collection(self, collection_name):
-        return self._db[collection_name]
+        return get_db()[collection_name]
 
     def close_connection(self):
-        if self._client:
-            self._client.close()
+        if _client is not None:
+            _client.close()
 
 # Instance globale
 db_instance = Database() 
\ No newline at end of file
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Générateur de jeu de données synthétique CesiZen
+Produit des volumes proches de la production (utilisateurs, exercices,
+historiques) pour les benchmarks et les tests d'index.
+
+Exemple :
+    python generate_dataset.py --users 200000 --exercices 50 \
+        --historiques 20000000 --workers 8 --db-name cesizen_bench --drop
+"""
+
+import argparse
+import bisect
+import itertools
+import math
+import os
+import random
+import struct
+import sys
+import time
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+
+import bcrypt
+from bson import ObjectId
+from pymongo import MongoClient
+from config.config import MONGO_URI, DB_NAME
+
+# Préfixes utilisés pour fabriquer des ObjectId déterministes
+KIND_USER = 1
+KIND_EXERCICE = 2
+
+# Horodatage fixe des ObjectId synthétiques (reproductibilité)
+OID_TIMESTAMP = 1704067200  # 2024-01-01T00:00:00Z
+# Dernier jour de l'historique par défaut : même graine, même jeu de données
+DEFAULT_END_DATE = '2025-01-01'
+
+# Poids relatifs par heure de la journée (pics matin, midi et soirée)
+HOURLY_WEIGHTS = [
+    1, 1, 1, 1, 1, 2, 5, 9, 10, 6, 4, 5,
+    8, 7, 4, 3, 3, 4, 6, 8, 10, 9, 6, 3
+]
+# Poids relatifs par jour de la semaine (lundi = 0)
+WEEKDAY_WEIGHTS = [1.1, 1.0, 1.0, 1.0, 0.9, 0.8, 0.9]
+
+PRENOMS = ['Alice', 'Lucas', 'Emma', 'Hugo', 'Chloé', 'Louis', 'Léa', 'Gabriel',
+           'Manon', 'Jules', 'Inès', 'Arthur', 'Camille', 'Nathan', 'Sarah', 'Tom']
+NOMS = ['Martin', 'Bernard', 'Dubois', 'Thomas', 'Robert', 'Richard', 'Petit',
+        'Durand', 'Leroy', 'Moreau', 'Simon', 'Laurent', 'Lefebvre', 'Michel']
+
+
+def synthetic_oid(kind, index):
+    """ObjectId déterministe dérivé du type de document et de son index"""
+    return ObjectId(struct.pack('>IB3xI', OID_TIMESTAMP, kind, index))
+
+
+def synthetic_identity(index, seed):
+    """Identité déterministe d'un utilisateur synthétique"""
+    rng = random.Random(f"{seed}:user:{index}")
+    prenom = rng.choice(PRENOMS)
+    nom = rng.choice(NOMS)
+    email = f"{prenom.lower()}.{nom.lower()}.{index}@bench.cesizen.fr"
+    return rng, prenom, nom, email
+
+
+def zipf_weights(count, alpha):
+    """Poids d'une loi de puissance (rang^-alpha), normalisés"""
+    weights = [1.0 / math.pow(rank, alpha) for rank in range(1, count + 1)]
+    total = sum(weights)
+    return [w / total for w in weights]
+
+
+def allocate_counts(total, weights):
+    """Répartit `total` événements selon les poids (méthode du plus fort reste)"""
+    raw = [total * w for w in weights]
+    counts = [int(r) for r in raw]
+    remainder = total - sum(counts)
+    order = sorted(range(len(raw)), key=lambda i: raw[i] - counts[i], reverse=True)
+    for i in order[:remainder]:
+        counts[i] += 1
+    return counts
+
+
+def chunk_ranges(total, chunk_size):
+    """Découpe [0, total) en intervalles (début, fin) de taille chunk_size"""
+    return [(start, min(start + chunk_size, total))
+            for start in range(0, total, chunk_size)]
+
+
+# ==========================================
+# WORKERS (exécutés dans des processus séparés)
+# ==========================================
+
+_worker_db = None
+
+
+def _init_worker(mongo_uri, db_name):
+    """Ouvre un client MongoDB propre à chaque processus (fork-safe)"""
+    global _worker_db
+    client = MongoClient(mongo_uri, w=1)
+    _worker_db = client[db_name]
+
+
+def _insert_batches(collection, documents, batch_size):
+    inserted = 0
+    for start in range(0, len(documents), batch_size):
+        batch = documents[start:start + batch_size]
+        collection.insert_many(batch, ordered=False)
+        inserted += len(batch)
+    return inserted
+
+
+def _generate_users(task):
+    """Génère et insère les utilisateurs [start, end)"""
+    start, end, seed, password_hash, base_date, batch_size = task
+    documents = []
+    for index in range(start, end):
+        rng, prenom, nom, email = synthetic_identity(index, seed)
+        active = rng.random() > 0.03
+        documents.append({
+            '_id': synthetic_oid(KIND_USER, index),
+            'nom': nom,
+            'prenom': prenom,
+            'email': email,
+            'mot_de_passe': password_hash,
+            'role': 'admin' if index == 0 else 'utilisateur',
+            # Le compte admin (index 0) reste toujours utilisable
+            'est_actif': index == 0 or active,
+            'date_creation': base_date + timedelta(seconds=rng.randrange(86400 * 30))
+        })
+    return 'utilisateurs', _insert_batches(_worker_db.utilisateurs, documents, batch_size)
+
+
+def _generate_historiques(task):
+    """Génère et insère les historiques des utilisateurs [start, end)"""
+    (start, end, counts, seed, exercice_cdf, days, end_date,
+     batch_size) = task
+    hour_cdf = list(itertools.accumulate(HOURLY_WEIGHTS))
+    # Jours candidats pondérés par le jour de la semaine
+    day_weights = [WEEKDAY_WEIGHTS[(end_date - timedelta(days=d)).weekday()]
+                   for d in range(days)]
+    day_cdf = list(itertools.accumulate(day_weights))
+
+    collection = _worker_db.historiques_exercices
+    buffer = []
+    inserted = 0
+    for offset, user_index in enumerate(range(start, end)):
+        count = counts[offset]
+        if not count:
+            continue
+        rng = random.Random(f"{seed}:historiques:{user_index}")
+        user_oid = synthetic_oid(KIND_USER, user_index)
+        # Chaque utilisateur a un exercice favori, pratiqué une fois sur deux
+        favori = bisect.bisect_left(exercice_cdf, rng.random() * exercice_cdf[-1])
+        for _ in range(count):
+            day = bisect.bisect_left(day_cdf, rng.random() * day_cdf[-1])
+            hour = bisect.bisect_left(hour_cdf, rng.random() * hour_cdf[-1])
+            if rng.random() < 0.5:
+                exercice_index = favori
+            else:
+                exercice_index = bisect.bisect_left(exercice_cdf, rng.random() * exercice_cdf[-1])
+            buffer.append({
+                'date_execution': (end_date - timedelta(days=day)).replace(
+                    hour=hour, minute=rng.randrange(60), second=rng.randrange(60),
+                    microsecond=0),
+                'id_utilisateur': user_oid,
+                'id_exercice': synthetic_oid(KIND_EXERCICE, exercice_index)
+            })
+            if len(buffer) >= batch_size:
+                collection.insert_many(buffer, ordered=False)
+                inserted += len(buffer)
+                buffer = []
+    if buffer:
+        collection.insert_many(buffer, ordered=False)
+        inserted += len(buffer)
+    return 'historiques_exercices', inserted
+
+
+# ==========================================
+# ORCHESTRATION
+# ==========================================
+
+def build_exercices(count, seed, base_date):
+    """Catalogue d'exercices déterministe (petit, inséré directement)"""
+    exercices = []
+    for index in range(count):
+        rng = random.Random(f"{seed}:exercice:{index}")
+        inspiration = rng.randint(3, 8)
+        apnee = rng.choice([0, 0, 2, 4, 7])
+        expiration = rng.randint(4, 10)
+        exercices.append({
+            '_id': synthetic_oid(KIND_EXERCICE, index),
+            'nom': f"Exercice {inspiration}-{apnee}-{expiration} #{index}",
+            'description': f"Inspire {inspiration}s, Apnée {apnee}s, Expire {expiration}s.",
+            'duree_inspiration': inspiration,
+            'duree_apnee': apnee,
+            'duree_expiration': expiration,
+            'nom_admin': 'Système',
+            'date_creation': base_date
+        })
+    return exercices
+
+
+def run_pool(pool, func, tasks, label, expected):
+    """Exécute les tâches en parallèle et affiche la progression"""
+    started = time.time()
+    done = 0
+    for _, inserted in pool.imap_unordered(func, tasks):
+        done += inserted
+        elapsed = time.time() - started
+        rate = done / elapsed if elapsed else 0
+        print(f"\r   {label}: {done}/{expected} ({rate:,.0f} docs/s)", end='', flush=True)
+    print()
+    return done, time.time() - started
+
+
+def generate(args):
+    client = MongoClient(args.mongo_uri)
+    db = client[args.db_name]
+    collections = ['utilisateurs', 'exercices', 'historiques_exercices']
+
+    existing = {name: db[name].estimated_document_count() for name in collections}
+    if any(existing.values()) and not args.drop:
+        print(f"❌ La base {args.db_name} contient déjà des données: {existing}")
+        print("   Utilisez --drop pour les supprimer ou --db-name pour une autre base")
+        return False
+    if args.drop:
+        print(f"🧹 Suppression des collections de {args.db_name}...")
+        for name in collections:
+            db.drop_collection(name)
+
+    base_date = datetime(2024, 1, 1)
+    end_date = args.end_date
+
+    # Un seul hash bcrypt partagé : le coût du hash dominerait sinon la génération
+    password_hash = bcrypt.hashpw(args.password.encode('utf-8'),
+                                  bcrypt.gensalt(rounds=4)).decode('utf-8')
+
+    print(f"🧘 Création de {args.exercices} exercices...")
+    exercices = build_exercices(args.exercices, args.seed, base_date)
+    if exercices:
+        db.exercices.insert_many(exercices, ordered=False)
+
+    user_weights = zipf_weights(args.users, args.user_alpha)
+    # Mélange déterministe : l'activité ne doit pas être corrélée à l'index
+    rng = random.Random(f"{args.seed}:activity")
+    rng.shuffle(user_weights)
+    counts = allocate_counts(args.historiques, user_weights)
+    exercice_cdf = list(itertools.accumulate(zipf_weights(args.exercices, args.exercice_alpha)))
+
+    user_tasks = [(start, end, args.seed, password_hash, base_date, args.batch_size)
+                  for start, end in chunk_ranges(args.users, args.chunk_users)]
+    historique_tasks = [(start, end, counts[start:end], args.seed, exercice_cdf,
+                         args.days, end_date, args.batch_size)
+                        for start, end in chunk_ranges(args.users, args.chunk_users)]
+
+    print(f"⚙️  {args.workers} processus, lots de {args.batch_size} documents")
+    with Pool(args.workers, initializer=_init_worker,
+              initargs=(args.mongo_uri, args.db_name)) as pool:
+        print(f"👥 Création de {args.users} utilisateurs...")
+        run_pool(pool, _generate_users, user_tasks, 'utilisateurs', args.users)
+        print(f"📊 Création de {args.historiques} historiques sur {args.days} jours...")
+        total, duration = run_pool(pool, _generate_historiques, historique_tasks,
+                                   'historiques', args.historiques)
+
+    print("\n📋 Résumé de la génération:")
+    for name in collections:
+        print(f"   {name}: {db[name].estimated_document_count()}")
+    print(f"   Débit historiques: {total / duration if duration else 0:,.0f} docs/s")
+    print(f"\n🔑 Mot de passe commun des comptes synthétiques: {args.password}")
+    print(f"   Admin: {synthetic_identity(0, args.seed)[3]}")
+    return True
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Génère un jeu de données CesiZen à grande échelle")
+    parser.add_argument('--users', type=int, default=10000, help="Nombre d'utilisateurs")
+    parser.add_argument('--exercices', type=int, default=30, help="Nombre d'exercices")
+    parser.add_argument('--historiques', type=int, default=1000000, help="Nombre d'historiques")
+    parser.add_argument('--days', type=int, default=365, help="Profondeur de l'historique en jours")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="Processus parallèles")
+    parser.add_argument('--batch-size', type=int, default=5000, help="Taille des lots insert_many")
+    parser.add_argument('--chunk-users', type=int, default=2000, help="Utilisateurs par tâche")
+    parser.add_argument('--seed', type=int, default=42, help="Graine de génération")
+    parser.add_argument('--user-alpha', type=float, default=1.1,
+                        help="Exposant de la loi de puissance de l'activité utilisateur")
+    parser.add_argument('--exercice-alpha', type=float, default=0.9,
+                        help="Exposant de la loi de puissance de popularité des exercices")
+    parser.add_argument('--password', default='password123', help="Mot de passe des comptes")
+    parser.add_argument('--end-date', type=datetime.fromisoformat, default=DEFAULT_END_DATE,
+                        help="Dernier jour de l'historique (AAAA-MM-JJ)")
+    parser.add_argument('--mongo-uri', default=MONGO_URI)
+    parser.add_argument('--db-name', default=DB_NAME)
+    parser.add_argument('--drop', action='store_true', help="Supprimer les collections existantes")
+    args = parser.parse_args(argv)
+    if args.users < 1 or args.exercices < 1:
+        parser.error("--users et --exercices doivent être >= 1")
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(0 if generate(parse_args()) else 1)
@@ -0,0 +1,92 @@
+"""
+Configuration gunicorn de production
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Modèle de workers (GUNICORN_WORKER_CLASS) :
+- sync : un processus par requête en cours ; 2 x CPU + 1 workers ;
+- gthread (défaut) : CPU + 1 workers de GUNICORN_THREADS threads (4) ; les
+  requêtes attendent surtout MongoDB, les threads recouvrent ces attentes ;
+- gevent : CPU workers de GUNICORN_WORKER_CONNECTIONS greenlets (1000) ;
+  nécessite le paquet gevent (non installé par défaut).
+GUNICORN_WORKERS / GUNICORN_THREADS remplacent le dimensionnement automatique.
+
+preload_app : l'application est importée une fois dans le master (démarrage
+plus rapide, mémoire partagée en copy-on-write). Chaque worker recrée ensuite
+son client MongoDB et les poignées de collection mises en cache (post_fork) ;
+les threads d'arrière-plan (planificateur, compteurs, bus d'invalidation)
+démarrent d'eux-mêmes dans chaque worker à la première requête.
+
+max_requests + jitter recyclent les workers progressivement (fuites mémoire
+lentes) sans les redémarrer tous en même temps ; les compteurs en mémoire
+sont écrits avant la sortie (worker_exit).
+"""
+
+import multiprocessing
+import os
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread').lower()
+if worker_class not in ('sync', 'gthread', 'gevent'):
+    raise ValueError(f"GUNICORN_WORKER_CLASS inconnu: {worker_class}")
+
+if worker_class == 'gevent':
+    # Avant l'import de l'application (preload) : pymongo, threading et
+    # sockets doivent être patchés dans le master
+    from gevent import monkey
+    monkey.patch_all()
+
+cpus = multiprocessing.cpu_count()
+_default_workers = {'sync': 2 * cpus + 1, 'gthread': cpus + 1, 'gevent': cpus}[worker_class]
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('GUNICORN_WORKERS', str(_default_workers)))
+threads = int(os.getenv('GUNICORN_THREADS', '4')) if worker_class == 'gthread' else 1
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', str(max_requests // 10)))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def _reset_process_state():
+    """Oublier les connexions héritées du master"""
+    from config.database import reset_client
+    from utils.versions import collection_versions
+    from utils.cache import response_cache
+    from utils.loaders import meditation_summaries, exercice_catalog
+
+    reset_client()
+    # Poignées de collection liées au client du master
+    collection_versions._collection = None
+    for loader in (meditation_summaries, exercice_catalog):
+        if hasattr(loader, '_collection'):
+            loader._collection = None
+    if response_cache.shared is not None:
+        response_cache.shared._collection = None
+
+
+def when_ready(server):
+    server.log.info(f"Workers {worker_class}: {workers} x {threads} thread(s), "
+                    f"preload={preload_app}, max_requests={max_requests}±{max_requests_jitter}")
+
+
+def post_fork(server, worker):
+    if preload_app:
+        _reset_process_state()
+
+
+def worker_exit(server, worker):
+    # Incréments de compteurs encore en mémoire (recyclage max_requests, arrêt)
+    try:
+        from utils.counters import hot_counters
+        hot_counters.flush()
+    except Exception as e:
+        server.log.error(f"Flush des compteurs à la sortie du worker {worker.pid}: {e}")
@@ -8,6 +8,7 @@ from datetime import datetime
 import bcrypt
 from config.database import get_db
 from bson import ObjectId
+from utils.history_store import historiques
 
 def init_database():
     """Initialise la base de données avec des données d'exemple"""
@@ -23,7 +24,7 @@ def init_database():
         print("🧹 Nettoyage des collections existantes...")
         db.utilisateurs.delete_many({})
         db.exercices.delete_many({})
-        db.historiques_exercices.delete_many({})
+        historiques(db).delete_many({})
         db.contenus.delete_many({})
         
         # 1. Créer les utilisateurs
@@ -116,7 +117,7 @@ def init_database():
             "id_exercice": ObjectId("6653ff363a6e8a2d4c1b8e13")
         }
         
-        db.historiques_exercices.insert_one(historique)
+        historiques(db).insert_one(historique)
         print("✅ Historique créé avec succès")
         
         # Afficher un résumé
@@ -124,7 +125,7 @@ def init_database():
         print(f"   👥 Utilisateurs: {db.utilisateurs.count_documents({})}")
         print(f"   🧘 Exercices: {db.exercices.count_documents({})}")
         print(f"   📝 Contenus: {db.contenus.count_documents({})}")
-        print(f"   📊 Historiques: {db.historiques_exercices.count_documents({})}")
+        print(f"   📊 Historiques: {historiques(db).count_documents({})}")
         
         print("\n🎉 Base de données initialisée avec succès!")
         print("\n🔑 Comptes de test:")
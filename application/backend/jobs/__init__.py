@@ -0,0 +1,3 @@
+"""
+Tâches de maintenance exécutables hors requête (CLI, planificateur)
+"""
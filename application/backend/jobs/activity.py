@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Reconstruction des agrégats d'activité (utils/activity.py)
+
+create_historique maintient `activite_quotidienne` et `activite_utilisateurs`
+de façon incrémentale. Ce job les recalcule depuis `historiques_exercices`
+(premier déploiement, import, suppression manuelle) : une agrégation
+$group / $merge pour les jours, puis les totaux et séries par utilisateur
+écrits par bulk_write.
+
+Exemple :
+    python -m jobs.activity
+    python -m jobs.activity --user 6653ff0a3a6e8a2d4c1b8e11
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReplaceOne
+from config.database import get_db
+from utils.activity import DAILY_COLLECTION, SUMMARY_COLLECTION, ensure_activity_indexes
+from utils.history_store import historiques
+from utils.archive import archive_horizon
+
+
+def rebuild_daily(db, match, marker, horizon=None):
+    """
+    Jours recalculés depuis l'historique, fusionnés dans activite_quotidienne
+
+    Les jours antérieurs à l'horizon d'archivage (utils/archive.py) ne sont plus
+    dans la collection active : leurs agrégats sont conservés tels quels.
+    """
+    history_match = dict(match)
+    if horizon is not None:
+        history_match['date_execution'] = {'$gte': horizon}
+    pipeline = [
+        {'$match': history_match},
+        {'$lookup': {
+            'from': 'exercices',
+            'localField': 'id_exercice',
+            'foreignField': '_id',
+            'as': 'exercice'
+        }},
+        {'$set': {'exercice': {'$arrayElemAt': ['$exercice', 0]}}},
+        {'$group': {
+            '_id': {
+                'id_utilisateur': '$id_utilisateur',
+                'jour': {'$dateFromParts': {
+                    'year': {'$year': '$date_execution'},
+                    'month': {'$month': '$date_execution'},
+                    'day': {'$dayOfMonth': '$date_execution'}
+                }}
+            },
+            'exercices': {'$sum': 1},
+            'secondes': {'$sum': {'$multiply': [
+                {'$ifNull': ['$nombre_cycles', 1]},
+                {'$add': [
+                    {'$ifNull': ['$exercice.duree_inspiration', 0]},
+                    {'$ifNull': ['$exercice.duree_apnee', 0]},
+                    {'$ifNull': ['$exercice.duree_expiration', 0]}
+                ]}
+            ]}}
+        }},
+        {'$project': {
+            '_id': 0,
+            'id_utilisateur': '$_id.id_utilisateur',
+            'jour': '$_id.jour',
+            'exercices': 1,
+            'secondes': 1,
+            'reconstruit_le': marker,
+            'modifie_le': marker
+        }},
+        {'$merge': {
+            'into': DAILY_COLLECTION,
+            'on': ['id_utilisateur', 'jour'],
+            'whenMatched': 'replace',
+            'whenNotMatched': 'insert'
+        }}
+    ]
+    historiques(db).aggregate(pipeline, allowDiskUse=True)
+
+    # Jours qui n'existent plus dans l'historique
+    stale = dict(match)
+    stale['reconstruit_le'] = {'$ne': marker}
+    if horizon is not None:
+        stale['jour'] = {'$gte': horizon}
+    return db[DAILY_COLLECTION].delete_many(stale).deleted_count
+
+
+def summarize(days):
+    """Totaux et séries d'un utilisateur depuis ses jours triés"""
+    summary = {'total_exercices': 0, 'total_secondes': 0, 'jours_actifs': 0,
+               'serie_actuelle': 0, 'meilleure_serie': 0, 'dernier_jour': None}
+    for day in days:
+        summary['total_exercices'] += day['exercices']
+        summary['total_secondes'] += day['secondes']
+        summary['jours_actifs'] += 1
+        previous = summary['dernier_jour']
+        if previous is not None and day['jour'] - previous == timedelta(days=1):
+            summary['serie_actuelle'] += 1
+        else:
+            summary['serie_actuelle'] = 1
+        summary['meilleure_serie'] = max(summary['meilleure_serie'], summary['serie_actuelle'])
+        summary['dernier_jour'] = day['jour']
+    return summary
+
+
+def rebuild_summaries(db, match, batch_size=1000):
+    """Résumés par utilisateur, en un seul parcours des jours triés"""
+    operations, written = [], 0
+    current_user, days = None, []
+
+    def push(user_id):
+        document = summarize(days)
+        document['modifie_le'] = datetime.utcnow()
+        operations.append(ReplaceOne({'_id': user_id}, document, upsert=True))
+
+    cursor = db[DAILY_COLLECTION].find(
+        match, {'_id': 0, 'id_utilisateur': 1, 'jour': 1, 'exercices': 1, 'secondes': 1}
+    ).sort([('id_utilisateur', 1), ('jour', 1)])
+    for day in cursor:
+        if day['id_utilisateur'] != current_user:
+            if days:
+                push(current_user)
+            current_user, days = day['id_utilisateur'], []
+        days.append(day)
+        if len(operations) >= batch_size:
+            written += len(operations)
+            db[SUMMARY_COLLECTION].bulk_write(operations, ordered=False)
+            operations = []
+    if days:
+        push(current_user)
+    if operations:
+        written += len(operations)
+        db[SUMMARY_COLLECTION].bulk_write(operations, ordered=False)
+    return written
+
+
+def rebuild_activity(db, user_ids=None, batch_size=1000):
+    """
+    Recalcule les agrégats d'activité
+
+    Args:
+        user_ids: Limiter à ces utilisateurs (tous par défaut)
+
+    Returns:
+        dict: jours supprimés et résumés réécrits
+    """
+    match = {'id_utilisateur': {'$in': user_ids}} if user_ids else {}
+    marker = datetime.utcnow()
+    removed = rebuild_daily(db, match, marker, archive_horizon(db))
+
+    # Utilisateurs sans aucun historique : résumé supprimé
+    active = set(db[DAILY_COLLECTION].distinct('id_utilisateur', match))
+    summary_match = {'_id': {'$in': user_ids}} if user_ids else {}
+    orphans = [doc['_id'] for doc in db[SUMMARY_COLLECTION].find(summary_match, {'_id': 1})
+               if doc['_id'] not in active]
+    if orphans:
+        db[SUMMARY_COLLECTION].delete_many({'_id': {'$in': orphans}})
+
+    written = rebuild_summaries(db, match, batch_size)
+    return {'jours_supprimes': removed, 'resumes': written, 'resumes_supprimes': len(orphans)}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Reconstruction des agrégats d'activité")
+    parser.add_argument('--user', action='append', default=[],
+                        help="ID utilisateur à reconstruire (répétable, tous par défaut)")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    invalid = [value for value in args.user if not ObjectId.is_valid(value)]
+    if invalid:
+        print(f"❌ ID invalide(s): {', '.join(invalid)}")
+        return False
+
+    db = get_db()
+    if db is None:
+        print("❌ Erreur: Impossible de se connecter à la base de données")
+        return False
+
+    ensure_activity_indexes(db)
+
+    started = time.perf_counter()
+    stats = rebuild_activity(
+        db,
+        user_ids=[ObjectId(value) for value in args.user] or None,
+        batch_size=args.batch_size
+    )
+    print(f"✅ {stats['resumes']} résumé(s) reconstruit(s), "
+          f"{stats['jours_supprimes']} jour(s) obsolète(s) supprimé(s) "
+          f"en {time.perf_counter() - started:.1f}s")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
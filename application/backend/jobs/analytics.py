@@ -0,0 +1,216 @@
+"""
+Agrégats statistiques globaux, recalculés par le planificateur (jobs/scheduler.py)
+
+Chaque exécution ne lit que les historiques insérés depuis le watermark
+(fenêtre sur l'_id ObjectId, donc sur la date d'insertion : un historique
+antidaté ou synchronisé en différé est bien pris en compte). Les jours et
+semaines touchés par ces nouvelles lignes sont ensuite recalculés en entier
+et fusionnés ($merge) dans les collections d'agrégats :
+
+- analytics_quotidien : utilisateurs actifs et exercices par jour ;
+- analytics_exercices : pratiques et utilisateurs par (jour, exercice) ;
+- analytics_activite_hebdo : appartenance (utilisateur, semaine active) ;
+- analytics_cohortes / analytics_retention : inscrits par semaine
+  d'inscription et actifs par semaine écoulée depuis l'inscription.
+
+Sur une collection time-series, l'_id n'est pas indexé : la fenêtre porte
+alors sur date_execution (timeField, filtrage par buckets), élargie de
+ANALYTICS_TIMESERIES_LOOKBACK_SECONDS. Une ligne antidatée de plus que ce
+délai n'est pas prise en compte par le passage incrémental (reconstruction :
+supprimer le watermark dans jobs_etat).
+
+Recalculer des périodes entières rend chaque exécution idempotente : le
+chevauchement ANALYTICS_OVERLAP_SECONDS couvre les écarts d'horloge entre
+serveurs sans compter deux fois une ligne.
+"""
+
+import os
+from datetime import timedelta
+from bson import ObjectId
+from pymongo import ASCENDING
+from jobs.scheduler import ScheduledJob, scheduler
+from jobs.history_storage import is_timeseries
+from utils.history_store import historiques
+
+DAILY_COLLECTION = 'analytics_quotidien'
+EXERCICES_COLLECTION = 'analytics_exercices'
+WEEKLY_ACTIVITY_COLLECTION = 'analytics_activite_hebdo'
+COHORTS_COLLECTION = 'analytics_cohortes'
+RETENTION_COLLECTION = 'analytics_retention'
+
+OVERLAP = timedelta(seconds=int(os.getenv('ANALYTICS_OVERLAP_SECONDS', '120')))
+INTERVAL = int(os.getenv('ANALYTICS_INTERVAL', '300'))
+TIMESERIES_LOOKBACK = timedelta(seconds=int(os.getenv('ANALYTICS_TIMESERIES_LOOKBACK_SECONDS',
+                                                      str(2 * 86400))))
+# Nombre de périodes recalculées par agrégation
+PERIODS_PER_BATCH = 100
+
+DAY = timedelta(days=1)
+WEEK = timedelta(days=7)
+WEEK_MS = 7 * 24 * 3600 * 1000
+
+
+def day_of(field):
+    """Minuit UTC du jour d'une date (MongoDB 4.4 : pas de $dateTrunc)"""
+    return {'$dateFromParts': {
+        'year': {'$year': field}, 'month': {'$month': field}, 'day': {'$dayOfMonth': field}
+    }}
+
+
+def week_of(field):
+    """Lundi (ISO) de la semaine d'une date"""
+    return {'$dateFromParts': {
+        'isoWeekYear': {'$isoWeekYear': field}, 'isoWeek': {'$isoWeek': field},
+        'isoDayOfWeek': 1
+    }}
+
+
+def inserted_between(since, until):
+    """Filtre des documents insérés dans la fenêtre (horodatage de l'ObjectId)"""
+    window = {'$lt': ObjectId.from_datetime(until)}
+    if since is not None:
+        window['$gte'] = ObjectId.from_datetime(since - OVERLAP)
+    return {'_id': window}
+
+
+def history_window(db, since, until):
+    """Fenêtre des historiques : _id, ou date_execution sur une time-series"""
+    collection = historiques(db)
+    if not is_timeseries(db, collection.name):
+        return inserted_between(since, until)
+    window = {'$lt': until}
+    if since is not None:
+        window['$gte'] = since - OVERLAP - TIMESERIES_LOOKBACK
+    return {'date_execution': window}
+
+
+def _periods(collection, match, field, period_of):
+    """Périodes (jours ou semaines) touchées par les documents de la fenêtre"""
+    groups = list(collection.aggregate([
+        {'$match': match},
+        {'$group': {'_id': period_of('$' + field), 'lignes': {'$sum': 1}}}
+    ]))
+    return sorted(group['_id'] for group in groups if group['_id'] is not None), \
+        sum(group['lignes'] for group in groups)
+
+
+def _batches(periods):
+    for start in range(0, len(periods), PERIODS_PER_BATCH):
+        # Premier passage (toute l'histoire) : le verrou est prolongé entre les lots
+        scheduler.heartbeat()
+        yield periods[start:start + PERIODS_PER_BATCH]
+
+
+def _in_periods(field, periods, length):
+    return {'$or': [{field: {'$gte': period, '$lt': period + length}} for period in periods]}
+
+
+def ensure_analytics_indexes(db):
+    db[WEEKLY_ACTIVITY_COLLECTION].create_index([('semaine', ASCENDING)])
+    db[RETENTION_COLLECTION].create_index([('cohorte', ASCENDING)])
+    historiques(db).create_index([('date_execution', ASCENDING)])
+
+
+def rollup_daily(db, since, until):
+    """Utilisateurs actifs et exercices les plus pratiqués, par jour"""
+    ensure_analytics_indexes(db)
+    days, rows = _periods(historiques(db), history_window(db, since, until),
+                          'date_execution', day_of)
+    for batch in _batches(days):
+        match = {'$match': _in_periods('date_execution', batch, DAY)}
+        historiques(db).aggregate([
+            match,
+            {'$group': {
+                '_id': day_of('$date_execution'),
+                'utilisateurs': {'$addToSet': '$id_utilisateur'},
+                'exercices': {'$sum': 1}
+            }},
+            {'$project': {
+                'jour': '$_id',
+                'utilisateurs_actifs': {'$size': '$utilisateurs'},
+                'exercices': 1
+            }},
+            {'$merge': {'into': DAILY_COLLECTION, 'whenMatched': 'replace'}}
+        ], allowDiskUse=True)
+        historiques(db).aggregate([
+            match,
+            {'$group': {
+                '_id': {'jour': day_of('$date_execution'), 'id_exercice': '$id_exercice'},
+                'utilisateurs': {'$addToSet': '$id_utilisateur'},
+                'pratiques': {'$sum': 1}
+            }},
+            {'$project': {
+                'jour': '$_id.jour',
+                'id_exercice': '$_id.id_exercice',
+                'utilisateurs': {'$size': '$utilisateurs'},
+                'pratiques': 1
+            }},
+            {'$merge': {'into': EXERCICES_COLLECTION, 'whenMatched': 'replace'}}
+        ], allowDiskUse=True)
+    return {'lignes': rows, 'jours_recalcules': len(days)}
+
+
+def rollup_retention(db, since, until):
+    """Rétention par semaine d'inscription"""
+    ensure_analytics_indexes(db)
+    signups_window = inserted_between(since, until)
+    window = history_window(db, since, until)
+
+    # 1. Taille des cohortes touchées par de nouvelles inscriptions
+    cohorts, signups = _periods(db.utilisateurs, signups_window, 'date_creation', week_of)
+    for batch in _batches(cohorts):
+        db.utilisateurs.aggregate([
+            {'$match': _in_periods('date_creation', batch, WEEK)},
+            {'$group': {'_id': week_of('$date_creation'), 'inscrits': {'$sum': 1}}},
+            {'$merge': {'into': COHORTS_COLLECTION, 'whenMatched': 'replace'}}
+        ])
+
+    # 2. Semaines d'activité des nouveaux historiques, rattachées à la cohorte
+    weeks, rows = _periods(historiques(db), window, 'date_execution', week_of)
+    scheduler.heartbeat()
+    if weeks:
+        historiques(db).aggregate([
+            {'$match': window},
+            {'$group': {'_id': {'utilisateur': '$id_utilisateur',
+                                'semaine': week_of('$date_execution')}}},
+            {'$lookup': {
+                'from': 'utilisateurs',
+                'localField': '_id.utilisateur',
+                'foreignField': '_id',
+                'as': 'utilisateur'
+            }},
+            {'$project': {
+                'semaine': '$_id.semaine',
+                'cohorte': week_of({'$arrayElemAt': ['$utilisateur.date_creation', 0]})
+            }},
+            {'$match': {'cohorte': {'$ne': None}}},
+            {'$merge': {'into': WEEKLY_ACTIVITY_COLLECTION, 'whenMatched': 'keepExisting'}}
+        ], allowDiskUse=True)
+
+    # 3. Actifs par (cohorte, semaine) recalculés pour les semaines touchées
+    for batch in _batches(weeks):
+        db[WEEKLY_ACTIVITY_COLLECTION].aggregate([
+            {'$match': {'semaine': {'$in': batch}}},
+            {'$match': {'$expr': {'$gte': ['$semaine', '$cohorte']}}},
+            {'$group': {'_id': {'cohorte': '$cohorte', 'semaine': '$semaine'},
+                        'utilisateurs_actifs': {'$sum': 1}}},
+            {'$project': {
+                'cohorte': '$_id.cohorte',
+                'semaine': '$_id.semaine',
+                'semaines_depuis_inscription': {'$toInt': {'$divide': [
+                    {'$subtract': ['$_id.semaine', '$_id.cohorte']}, WEEK_MS]}},
+                'utilisateurs_actifs': 1
+            }},
+            {'$merge': {'into': RETENTION_COLLECTION, 'whenMatched': 'replace'}}
+        ], allowDiskUse=True)
+
+    return {'inscriptions': signups, 'lignes': rows,
+            'cohortes_recalculees': len(cohorts), 'semaines_recalculees': len(weeks)}
+
+
+analytics_jobs = [
+    ScheduledJob('analytics_quotidien', INTERVAL, rollup_daily,
+                 "Utilisateurs actifs et exercices pratiqués par jour"),
+    ScheduledJob('analytics_retention', INTERVAL, rollup_retention,
+                 "Rétention par semaine d'inscription"),
+]
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Archivage de l'historique ancien (utils/archive.py)
+
+Déplace les lignes antérieures au premier jour du mois situé --older-than-days
+jours en arrière dans des archives compressées par (utilisateur, mois) :
+1. l'horizon du manifeste est avancé d'abord : les lectures consultent
+   les archives pour toute la période concernée dès le début du job ;
+2. les lignes sont lues par (utilisateur, date), archivées mois par mois,
+   puis supprimées de la collection active (lot par lot, après écriture
+   de l'archive : une interruption ne perd aucune ligne) ;
+3. le manifeste reçoit les totaux.
+
+Sur une collection time-series, la suppression par _id demande MongoDB 7.0+.
+Refusé pendant une migration du stockage (jobs/history_storage.py) : les
+lignes supprimées de la source réapparaîtraient dans la cible.
+
+Exemple :
+    python -m jobs.archive_history --older-than-days 365 --dry-run
+    python -m jobs.archive_history --older-than-days 365
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from pymongo import ASCENDING
+from config.database import get_db
+from utils.history_store import historiques
+from jobs.history_storage import ensure_no_migration, MigrationInProgress
+from utils.archive import (ARCHIVE_COLLECTION, MANIFEST_COLLECTION, MANIFEST_KEY,
+                           ensure_archive_indexes, month_of, store_month, default_codec)
+
+
+def archive_cutoff(older_than_days, now=None):
+    """Premier jour du mois : seuls des mois complets sont archivés"""
+    return month_of((now or datetime.utcnow()) - timedelta(days=older_than_days))
+
+
+def archive_history(db, cutoff, dry_run=False, log=print):
+    """
+    Archive les lignes antérieures à `cutoff`
+
+    Returns:
+        dict: lignes archivées, archives écrites, octets compressés
+    """
+    source = historiques(db)
+    source.create_index([('id_utilisateur', ASCENDING), ('date_execution', ASCENDING)])
+    query = {'date_execution': {'$lt': cutoff}}
+
+    if dry_run:
+        rows = source.count_documents(query)
+        months = len(list(source.aggregate([
+            {'$match': query},
+            {'$group': {'_id': {'u': '$id_utilisateur',
+                                'y': {'$year': '$date_execution'},
+                                'm': {'$month': '$date_execution'}}}}
+        ], allowDiskUse=True)))
+        return {'lignes': rows, 'archives': months, 'octets': 0, 'dry_run': True}
+
+    ensure_no_migration(db)
+    ensure_archive_indexes(db)
+    db[MANIFEST_COLLECTION].update_one(
+        {'_id': MANIFEST_KEY},
+        {'$max': {'horizon': cutoff}, '$set': {'en_cours_depuis': datetime.utcnow()}},
+        upsert=True
+    )
+
+    stats = {'lignes': 0, 'archives': 0, 'octets': 0, 'dry_run': False}
+    key, rows = None, []
+
+    def flush():
+        # Une migration commencée entre-temps : arrêt avant la suppression suivante
+        ensure_no_migration(db)
+        _, size = store_month(db, key[0], key[1], rows)
+        source.delete_many({'_id': {'$in': [row['_id'] for row in rows]}})
+        stats['lignes'] += len(rows)
+        stats['archives'] += 1
+        stats['octets'] += size
+        if stats['archives'] % 1000 == 0:
+            log(f"   … {stats['lignes']} ligne(s) dans {stats['archives']} archive(s)")
+
+    cursor = source.find(query).sort([('id_utilisateur', ASCENDING), ('date_execution', ASCENDING)])
+    for row in cursor:
+        row_key = (row.get('id_utilisateur'), month_of(row['date_execution']))
+        if row_key != key:
+            if rows:
+                flush()
+            key, rows = row_key, []
+        rows.append(row)
+    if rows:
+        flush()
+
+    totals = next(db[ARCHIVE_COLLECTION].aggregate([
+        {'$group': {'_id': None, 'archives': {'$sum': 1}, 'lignes': {'$sum': '$lignes'},
+                    'octets': {'$sum': '$octets'}}}
+    ]), {})
+    db[MANIFEST_COLLECTION].update_one(
+        {'_id': MANIFEST_KEY},
+        {'$set': {'archives': totals.get('archives', 0), 'lignes': totals.get('lignes', 0),
+                  'octets': totals.get('octets', 0), 'codec': default_codec(),
+                  'dernier_archivage': datetime.utcnow()},
+         '$unset': {'en_cours_depuis': ''}}
+    )
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Archivage de l'historique ancien")
+    parser.add_argument('--older-than-days', type=int, default=365)
+    parser.add_argument('--dry-run', action='store_true', help="Compter sans archiver")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.older_than_days < 31:
+        print("❌ --older-than-days doit être d'au moins 31 jours")
+        return False
+
+    db = get_db()
+    if db is None:
+        print("❌ Erreur: Impossible de se connecter à la base de données")
+        return False
+
+    cutoff = archive_cutoff(args.older_than_days)
+    started = time.perf_counter()
+    try:
+        stats = archive_history(db, cutoff, dry_run=args.dry_run)
+    except MigrationInProgress as e:
+        print(f"❌ {e}")
+        return False
+    action = 'à archiver' if args.dry_run else 'archivée(s)'
+    print(f"✅ {stats['lignes']} ligne(s) antérieure(s) au {cutoff.date().isoformat()} {action} "
+          f"dans {stats['archives']} archive(s) ({stats['octets'] / 1e6:.1f} Mo) "
+          f"en {time.perf_counter() - started:.1f}s")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
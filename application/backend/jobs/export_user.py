@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Export des données d'un utilisateur vers un fichier (utils/export.py)
+
+Même contenu que GET /users/<id>/export, écrit en gzip sans passer par
+l'API : demandes de portabilité sur des comptes volumineux, support.
+
+Exemple :
+    python -m jobs.export_user 6653ff0a3a6e8a2d4c1b8e11 --output /tmp/export.ndjson.gz
+    python -m jobs.export_user 6653ff0a3a6e8a2d4c1b8e11 --format csv --section evaluations
+"""
+
+import argparse
+import sys
+import time
+from bson import ObjectId
+from config.database import get_db
+from utils.export import UserExport, FORMATS, CSV_COLUMNS, write_export_file
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export des données d'un utilisateur")
+    parser.add_argument('user_id')
+    parser.add_argument('--format', choices=FORMATS, default='ndjson')
+    parser.add_argument('--section', choices=sorted(CSV_COLUMNS))
+    parser.add_argument('--output', help="Fichier gzip (défaut : export-<id>.<format>.gz)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        user_id = ObjectId(args.user_id)
+    except Exception:
+        print(f"❌ ID utilisateur invalide: {args.user_id}")
+        return False
+
+    db = get_db()
+    if db is None:
+        print("❌ Erreur: Impossible de se connecter à la base de données")
+        return False
+    if not db.utilisateurs.find_one({'_id': user_id}, {'_id': 1}):
+        print(f"❌ Utilisateur {args.user_id} non trouvé")
+        return False
+
+    export = UserExport(db, user_id, args.format, args.section)
+    output = args.output or f"export-{args.user_id}.{args.format}.gz"
+    total = export.total_lines
+    started = time.perf_counter()
+
+    def progress(lines, size):
+        print(f"   … {lines}/{total} ligne(s), {size / 1e6:.1f} Mo")
+
+    lines, size = write_export_file(export, output, progress, every=100000)
+    print(f"✅ {lines} ligne(s) ({size / 1e6:.1f} Mo non compressés) écrites dans {output} "
+          f"en {time.perf_counter() - started:.1f}s")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
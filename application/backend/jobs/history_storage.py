@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Migration en ligne du stockage de l'historique (classique <-> time-series)
+
+L'application continue d'écrire dans la collection active pendant la copie :
+1. création de la collection cible (time-series : timeField date_execution,
+   metaField id_utilisateur, MongoDB 5.0+) et de ses index ;
+2. copie par lots dans l'ordre des _id, avec un point de reprise enregistré
+   dans le pointeur (une migration interrompue reprend où elle s'était arrêtée) ;
+3. bascule atomique du pointeur (utils/history_store.py) vers la cible ;
+4. après le délai de relecture des workers, rattrapage des lignes écrites
+   dans la source depuis le dernier lot copié.
+
+La copie ne rejoue pas les suppressions : tant que `migration` est présent
+dans le pointeur (copie puis rattrapage), l'archivage (jobs/archive_history.py)
+et la suppression des comptes (jobs/user_deletion.py) sont suspendus. Les
+lignes dont le _id n'est pas un ObjectId (imports manuels) échappent à la
+pagination par _id : elles sont copiées dans une passe séparée.
+
+La source est conservée (retour arrière : migrer dans l'autre sens) jusqu'à
+`cleanup`. Une time-series n'accepte que des date_execution de type date :
+les autres lignes sont comptées comme rejetées et restent dans la source.
+
+Exemple :
+    python -m jobs.history_storage status
+    python -m jobs.history_storage migrate --to timeseries --target historiques_ts
+    python -m jobs.history_storage migrate --to standard --target historiques_exercices
+    python -m jobs.history_storage cleanup
+    python -m jobs.history_storage abort
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
+from config.database import get_db
+from utils.history_store import (history_store, POINTER_COLLECTION, HISTORY_KEY,
+                                 DEFAULT_COLLECTION)
+
+TIME_FIELD = 'date_execution'
+META_FIELD = 'id_utilisateur'
+# Lignes relues au rattrapage avant le dernier _id copié (écarts d'horloge entre serveurs)
+CATCH_UP_OVERLAP = timedelta(minutes=5)
+# Durée maximale de la suspension après la bascule (rattrapage interrompu)
+CATCH_UP_GRACE = timedelta(minutes=10)
+OBJECT_ID = {'$type': 'objectId'}
+
+
+class MigrationInProgress(Exception):
+    """Suppression dans l'historique refusée pendant une migration du stockage"""
+
+
+def _pointer(db):
+    return db[POINTER_COLLECTION].find_one({'_id': HISTORY_KEY}) or {
+        '_id': HISTORY_KEY, 'collection': DEFAULT_COLLECTION}
+
+
+def migration_in_progress(db):
+    """Vrai tant qu'une suppression dans la source réapparaîtrait dans la cible"""
+    state = _pointer(db).get('migration')
+    if not state:
+        return False
+    until = state.get('bloque_jusqu_a')
+    return until is None or until > datetime.utcnow()
+
+
+def ensure_no_migration(db):
+    if migration_in_progress(db):
+        raise MigrationInProgress("Migration du stockage de l'historique en cours "
+                                  "(python -m jobs.history_storage status)")
+
+
+def is_timeseries(db, name):
+    info = next(db.list_collections(filter={'name': name}), None)
+    return bool(info and info.get('type') == 'timeseries')
+
+
+def create_target(db, name, kind, granularity='hours'):
+    """Créer la collection cible et ses index (sans effet si elle existe déjà)"""
+    if name not in db.list_collection_names():
+        if kind == 'timeseries':
+            db.create_collection(name, timeseries={
+                'timeField': TIME_FIELD, 'metaField': META_FIELD, 'granularity': granularity})
+        else:
+            db.create_collection(name)
+    # Historique d'un utilisateur par date décroissante ; plages de dates globales
+    db[name].create_index([(META_FIELD, ASCENDING), (TIME_FIELD, DESCENDING)])
+    db[name].create_index([(TIME_FIELD, ASCENDING)])
+
+
+def _insert(target, documents, kind):
+    """Insérer un lot ; retourne (insérés, rejetés)"""
+    rejected = 0
+    if kind == 'timeseries':
+        valid = [doc for doc in documents if isinstance(doc.get(TIME_FIELD), datetime)]
+        rejected = len(documents) - len(valid)
+        documents = valid
+    if not documents:
+        return 0, rejected
+    try:
+        return len(target.insert_many(documents, ordered=False).inserted_ids), rejected
+    except BulkWriteError as e:
+        # Doublons de _id (reprise d'une collection classique) : déjà copiés
+        errors = e.details.get('writeErrors', [])
+        duplicates = sum(1 for error in errors if error.get('code') == 11000)
+        return e.details.get('nInserted', 0), rejected + len(errors) - duplicates
+
+
+def _missing(target, documents):
+    """Documents du lot absents de la cible (une time-series n'impose pas l'unicité des _id)"""
+    if not documents:
+        return []
+    # Filtre sur le metaField : seules les partitions concernées sont lues dans la cible
+    present = {doc['_id'] for doc in target.find(
+        {'_id': {'$in': [doc['_id'] for doc in documents]},
+         META_FIELD: {'$in': list({doc.get(META_FIELD) for doc in documents})}},
+        {'_id': 1})}
+    return [doc for doc in documents if doc['_id'] not in present]
+
+
+def copy_batches(db, source, target, kind, start_after=None, batch_size=5000, progress=None):
+    """Copier source -> cible par _id croissant ; retourne (dernier _id, insérés, rejetés)"""
+    query = {'_id': dict(OBJECT_ID, **({'$gt': start_after} if start_after is not None else {}))}
+    last_id, inserted, rejected = start_after, 0, 0
+    # En reprise, le lot suivant le point de reprise a pu être inséré sans être enregistré
+    dedupe = start_after is not None
+    batch = []
+    cursor = db[source].find(query).sort('_id', ASCENDING).batch_size(batch_size)
+    for document in cursor:
+        batch.append(document)
+        if len(batch) < batch_size:
+            continue
+        done, bad = _insert(db[target], _missing(db[target], batch) if dedupe else batch, kind)
+        inserted, rejected, last_id = inserted + done, rejected + bad, batch[-1]['_id']
+        if progress:
+            progress(last_id, inserted, rejected)
+        batch, dedupe = [], False
+    if batch:
+        done, bad = _insert(db[target], _missing(db[target], batch) if dedupe else batch, kind)
+        inserted, rejected, last_id = inserted + done, rejected + bad, batch[-1]['_id']
+        if progress:
+            progress(last_id, inserted, rejected)
+    done, bad = copy_others(db, source, target, kind)
+    return last_id, inserted + done, rejected + bad
+
+
+def copy_others(db, source, target, kind):
+    """Lignes dont le _id n'est pas un ObjectId, hors de la pagination ; retourne (insérés, rejetés)"""
+    others = list(db[source].find({'_id': {'$not': OBJECT_ID}}))
+    return _insert(db[target], _missing(db[target], others), kind)
+
+
+def catch_up(db, source, target, kind, last_id):
+    """Recopier les lignes écrites dans la source autour et après le dernier lot"""
+    query = {'_id': OBJECT_ID}
+    if last_id is not None:
+        since = last_id.generation_time.replace(tzinfo=None) - CATCH_UP_OVERLAP
+        query = {'_id': {'$gte': ObjectId.from_datetime(since)}}
+    inserted, rejected = _insert(db[target], _missing(db[target], list(db[source].find(query))), kind)
+    done, bad = copy_others(db, source, target, kind)
+    return inserted + done, rejected + bad
+
+
+def migrate(db, kind, target, batch_size=5000, granularity='hours', log=print):
+    pointer = _pointer(db)
+    source = pointer['collection']
+    if source == target:
+        raise ValueError(f"{target} est déjà la collection active")
+
+    # Reprise d'une migration interrompue vers la même cible
+    state = pointer.get('migration') or {}
+    resuming = state.get('cible') == target
+    resume_from = state.get('dernier_id') if resuming else None
+    if not resuming and target in db.list_collection_names() and db[target].find_one():
+        raise ValueError(f"{target} contient déjà des données (voir la commande cleanup)")
+    create_target(db, target, kind, granularity)
+    db[POINTER_COLLECTION].update_one(
+        {'_id': HISTORY_KEY},
+        {'$set': {'migration': {'cible': target, 'source': source, 'type': kind,
+                                'dernier_id': resume_from, 'debut': datetime.utcnow()}},
+         '$setOnInsert': {'collection': source}},
+        upsert=True
+    )
+
+    def progress(last_id, inserted, rejected):
+        db[POINTER_COLLECTION].update_one(
+            {'_id': HISTORY_KEY}, {'$set': {'migration.dernier_id': last_id}})
+        log(f"   … {inserted} ligne(s) copiée(s), {rejected} rejetée(s)")
+
+    started = time.perf_counter()
+    last_id, inserted, rejected = copy_batches(db, source, target, kind, resume_from,
+                                               batch_size, progress)
+
+    # Bascule : une seule écriture, relue par chaque worker sous refresh_interval.
+    # Les suppressions restent suspendues jusqu'à la fin du rattrapage (une ligne
+    # supprimée dans la cible serait recopiée depuis la source)
+    delay = history_store.refresh_interval * 2 + 1
+    now = datetime.utcnow()
+    db[POINTER_COLLECTION].update_one(
+        {'_id': HISTORY_KEY},
+        {'$set': {'collection': target, 'precedente': source, 'bascule_le': now,
+                  'migration.etape': 'rattrapage',
+                  'migration.bloque_jusqu_a': now + timedelta(seconds=delay) + CATCH_UP_GRACE}}
+    )
+    history_store.invalidate()
+    log(f"🔀 Lectures et écritures basculées vers {target}")
+
+    # Les workers qui n'ont pas encore relu le pointeur écrivent encore dans la source
+    time.sleep(delay)
+    late, late_rejected = catch_up(db, source, target, kind, last_id)
+    db[POINTER_COLLECTION].update_one({'_id': HISTORY_KEY}, {'$unset': {'migration': ''}})
+
+    return {'source': source, 'cible': target, 'copiees': inserted + late,
+            'rattrapees': late, 'rejetees': rejected + late_rejected,
+            'duree_s': round(time.perf_counter() - started, 1)}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Migration du stockage de l'historique")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('status', help="Collection active, type et migration en cours")
+    migrate_parser = sub.add_parser('migrate', help="Copier puis basculer vers une autre collection")
+    migrate_parser.add_argument('--to', choices=['timeseries', 'standard'], required=True)
+    migrate_parser.add_argument('--target', required=True, help="Nom de la collection cible")
+    migrate_parser.add_argument('--batch-size', type=int, default=5000)
+    migrate_parser.add_argument('--granularity', choices=['seconds', 'minutes', 'hours'],
+                                default='hours')
+    sub.add_parser('cleanup', help="Supprimer la collection précédente après vérification")
+    sub.add_parser('abort', help="Abandonner une migration interrompue (supprime la cible)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    db = get_db()
+    if db is None:
+        print("❌ Erreur: Impossible de se connecter à la base de données")
+        return False
+
+    pointer = _pointer(db)
+    if args.command == 'status':
+        active = pointer['collection']
+        kind = 'time-series' if is_timeseries(db, active) else 'classique'
+        print(f"📦 Collection active: {active} ({kind}), {db[active].estimated_document_count()} ligne(s)")
+        if pointer.get('precedente'):
+            print(f"   Précédente: {pointer['precedente']} (basculée le {pointer.get('bascule_le')})")
+        if pointer.get('migration'):
+            print(f"   Migration interrompue: {pointer['migration']}")
+        if migration_in_progress(db):
+            print("   Archivage et suppression des comptes suspendus (migrate pour reprendre, abort pour abandonner)")
+        return True
+
+    if args.command == 'abort':
+        state = pointer.get('migration')
+        if not state or state.get('etape') == 'rattrapage':
+            print("ℹ️ Aucune copie interrompue à abandonner")
+            return True
+        db[state['cible']].drop()
+        db[POINTER_COLLECTION].update_one({'_id': HISTORY_KEY}, {'$unset': {'migration': ''}})
+        print(f"🗑️ Migration vers {state['cible']} abandonnée")
+        return True
+
+    if args.command == 'cleanup':
+        previous = pointer.get('precedente')
+        if not previous or previous == pointer['collection']:
+            print("ℹ️ Aucune collection précédente à supprimer")
+            return True
+        db[previous].drop()
+        db[POINTER_COLLECTION].update_one({'_id': HISTORY_KEY}, {'$unset': {'precedente': ''}})
+        print(f"🗑️ Collection {previous} supprimée")
+        return True
+
+    try:
+        stats = migrate(db, args.to, args.target, args.batch_size, args.granularity)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return False
+    print(f"✅ {stats['copiees']} ligne(s) copiée(s) de {stats['source']} vers {stats['cible']} "
+          f"(dont {stats['rattrapees']} au rattrapage, {stats['rejetees']} rejetée(s)) "
+          f"en {stats['duree_s']}s")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
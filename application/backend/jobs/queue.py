@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+File de tâches persistante, exécutée dans les processus de l'application
+
+Les effets de bord lents (suppressions en cascade, opérations groupées,
+exports) sont mis en file par enqueue() et exécutés par un pool de threads
+dans chaque worker. La file est la collection `taches` :
+- une tâche est prise par un find_one_and_update atomique (priorité la plus
+  haute, puis la plus ancienne) qui pose un bail renouvelé tant qu'elle
+  s'exécute ; une tâche dont le bail expire (worker tué) est reprise, dans
+  la limite de ses tentatives (au-delà, elle passe en échec) ;
+- un échec replanifie la tâche avec un délai exponentiel (avec gigue) ;
+  après max_tentatives, elle est déplacée dans `taches_echouees`
+  (rejouable par les admins) ;
+- les tâches terminées expirent après JOB_QUEUE_RETENTION_SECONDS (index TTL).
+
+Un handler est enregistré par @task('nom') : handler(db, donnees) -> dict.
+
+Variables : JOB_QUEUE_ENABLED (true par défaut), JOB_QUEUE_WORKERS,
+JOB_QUEUE_POLL_INTERVAL, JOB_QUEUE_LEASE_SECONDS, JOB_QUEUE_MAX_ATTEMPTS,
+JOB_QUEUE_BACKOFF_SECONDS, JOB_QUEUE_RETENTION_SECONDS.
+
+Exemple (hors application) :
+    python -m jobs.queue --list
+    python -m jobs.queue --work
+    python -m jobs.queue --retry 6653ff0a3a6e8a2d4c1b8e11
+"""
+
+import argparse
+import os
+import random
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUEUE_COLLECTION = 'taches'
+DEAD_COLLECTION = 'taches_echouees'
+
+# Modules qui enregistrent des handlers (pour les workers hors application)
+HANDLER_MODULES = ('jobs.user_deletion', 'utils.user_operations', 'utils.export', 'jobs.scheduler')
+
+
+class TaskType:
+    def __init__(self, name, handler, max_attempts, priority):
+        self.name = name
+        self.handler = handler
+        self.max_attempts = max_attempts
+        self.priority = priority
+
+
+class JobQueue:
+    def __init__(self, workers=2, poll_interval=1.0, lease_seconds=300, max_attempts=5,
+                 backoff_seconds=10.0, retention_seconds=7 * 86400):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.retention_seconds = retention_seconds
+        self.types = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self._owner = None
+        self._threads = []
+        self._db = None
+        self._indexed = False
+        # _id -> bail des tâches en cours dans ce processus
+        self._running = {}
+        # Métriques du worker
+        self.enqueued = 0
+        self.completed = 0
+        self.retried = 0
+        self.dead = 0
+        self.lost = 0
+        self.wait_times = deque(maxlen=500)
+        self.run_times = deque(maxlen=500)
+
+    # ---- Enregistrement et mise en file ----
+
+    def register(self, name, handler, max_attempts=None, priority=0):
+        self.types[name] = TaskType(name, handler, max_attempts or self.max_attempts, priority)
+        return handler
+
+    def _database(self):
+        if self._db is None:
+            from config.database import get_db
+            self._db = get_db()
+        return self._db
+
+    def ensure_indexes(self, db):
+        if self._indexed:
+            return
+        db[QUEUE_COLLECTION].create_index(
+            [('statut', ASCENDING), ('priorite', DESCENDING), ('disponible_le', ASCENDING)],
+            name='tache_a_prendre')
+        db[QUEUE_COLLECTION].create_index('fin', expireAfterSeconds=self.retention_seconds,
+                                          partialFilterExpression={'statut': 'termine'})
+        self._indexed = True
+
+    def enqueue(self, name, payload=None, priority=None, delay=0, db=None):
+        """Mettre une tâche en file ; retourne son _id"""
+        if name not in self.types:
+            raise ValueError(f"Type de tâche inconnu: {name}")
+        task_type = self.types[name]
+        db = db if db is not None else self._database()
+        self.ensure_indexes(db)
+        now = datetime.utcnow()
+        task = {
+            '_id': ObjectId(),
+            'type': name,
+            'donnees': payload or {},
+            'priorite': task_type.priority if priority is None else priority,
+            'statut': 'en_attente',
+            'tentatives': 0,
+            'max_tentatives': task_type.max_attempts,
+            'cree_le': now,
+            'disponible_le': now + timedelta(seconds=delay)
+        }
+        db[QUEUE_COLLECTION].insert_one(task)
+        self.enqueued += 1
+        # Un thread local prend la tâche sans attendre le prochain sondage
+        self._wake.set()
+        return task['_id']
+
+    # ---- Prise, exécution, acquittement ----
+
+    def _attempts(self, operator):
+        """Comparaison $expr des tentatives faites au maximum de la tâche"""
+        return {operator: ['$tentatives', {'$ifNull': ['$max_tentatives', self.max_attempts]}]}
+
+    def claim(self, db):
+        """Prendre la prochaine tâche disponible (ou dont le bail a expiré)"""
+        now = datetime.utcnow()
+        return db[QUEUE_COLLECTION].find_one_and_update(
+            {'type': {'$in': list(self.types)},
+             '$or': [{'statut': 'en_attente', 'disponible_le': {'$lte': now}},
+                     # Bail expiré (worker tué) : reprise seulement s'il reste des tentatives
+                     {'statut': 'en_cours', 'bail_jusqu_a': {'$lt': now},
+                      '$expr': self._attempts('$lt')}]},
+            {'$set': {'statut': 'en_cours', 'debut': now, 'worker': self._owner or 'cli',
+                      'bail': uuid.uuid4().hex,
+                      'bail_jusqu_a': now + timedelta(seconds=self.lease_seconds)},
+             '$inc': {'tentatives': 1}},
+            sort=[('priorite', DESCENDING), ('disponible_le', ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _dead_letter(self, db, task, error, now):
+        """
+        Déplacer une tâche dont on détient le bail vers les échecs
+
+        La lettre morte est écrite avant la suppression de la file : un arrêt
+        entre les deux laisse un doublon (rejouable), jamais une perte.
+        """
+        dead = {key: value for key, value in task.items() if key not in ('bail', 'bail_jusqu_a')}
+        dead.update(statut='echec', erreur=error, fin=now, bail_final=task['bail'])
+        db[DEAD_COLLECTION].replace_one({'_id': task['_id']}, dead, upsert=True)
+        if db[QUEUE_COLLECTION].delete_one({'_id': task['_id'], 'bail': task['bail']}).deleted_count:
+            self.dead += 1
+            return True
+        # Tâche reprise ailleurs entre-temps : elle reste dans la file
+        db[DEAD_COLLECTION].delete_one({'_id': task['_id'], 'bail_final': task['bail']})
+        return False
+
+    def reap(self, db):
+        """Passer en échec les tâches au bail expiré qui ont épuisé leurs tentatives"""
+        reaped = 0
+        while True:
+            now = datetime.utcnow()
+            # Bail repris d'abord : un seul worker déplace chaque tâche
+            task = db[QUEUE_COLLECTION].find_one_and_update(
+                {'type': {'$in': list(self.types)}, 'statut': 'en_cours',
+                 'bail_jusqu_a': {'$lt': now}, '$expr': self._attempts('$gte')},
+                {'$set': {'bail': uuid.uuid4().hex,
+                          'bail_jusqu_a': now + timedelta(seconds=self.lease_seconds)}},
+                return_document=ReturnDocument.AFTER
+            )
+            if task is None:
+                return reaped
+            logger.error(f"Tâche {task['type']} {task['_id']} abandonnée après "
+                         f"{task['tentatives']} tentative(s) interrompue(s)")
+            reaped += self._dead_letter(
+                db, task, task.get('erreur') or 'Bail expiré : worker interrompu', now)
+
+    def _backoff(self, attempts):
+        delay = min(self.backoff_seconds * 2 ** (attempts - 1), 3600)
+        return delay * random.uniform(0.8, 1.2)
+
+    def execute(self, db, task):
+        """Exécuter une tâche prise ; retourne le statut final"""
+        collection = db[QUEUE_COLLECTION]
+        owned = {'_id': task['_id'], 'bail': task['bail']}
+        self._running[task['_id']] = task['bail']
+        self.wait_times.append((task['debut'] - task['disponible_le']).total_seconds())
+        clock = time.perf_counter()
+        try:
+            result = self.types[task['type']].handler(db, task['donnees']) or {}
+            error = None
+        except Exception as e:
+            logger.error(f"Tâche {task['type']} {task['_id']} en échec: {e}")
+            result, error = None, str(e)
+        finally:
+            self._running.pop(task['_id'], None)
+        duration = time.perf_counter() - clock
+        self.run_times.append(duration)
+        now = datetime.utcnow()
+
+        if error is None:
+            owned_still = collection.update_one(owned, {
+                '$set': {'statut': 'termine', 'fin': now, 'duree_ms': round(duration * 1000, 1),
+                         'resultat': result},
+                '$unset': {'bail': '', 'bail_jusqu_a': '', 'erreur': ''}}).matched_count
+            status = 'termine'
+        elif task['tentatives'] < task.get('max_tentatives', self.max_attempts):
+            owned_still = collection.update_one(owned, {
+                '$set': {'statut': 'en_attente', 'erreur': error,
+                         'disponible_le': now + timedelta(seconds=self._backoff(task['tentatives']))},
+                '$unset': {'bail': '', 'bail_jusqu_a': ''}}).matched_count
+            status = 'replanifiee'
+            self.retried += owned_still
+        else:
+            # Lettre morte : retirée de la file, conservée pour analyse et rejeu
+            owned_still = self._dead_letter(db, task, error, now)
+            status = 'echec'
+
+        if not owned_still:
+            # Bail expiré pendant l'exécution : la tâche a été reprise ailleurs
+            self.lost += 1
+            logger.warning(f"Tâche {task['_id']} reprise par un autre worker")
+        elif status == 'termine':
+            self.completed += 1
+        return status
+
+    def work_once(self, db=None):
+        """Prendre et exécuter une tâche ; False si la file est vide"""
+        db = db if db is not None else self._database()
+        task = self.claim(db)
+        if task is None:
+            # File vide : abandonner les tâches qui tuent leur worker
+            self.reap(db)
+            return False
+        self.execute(db, task)
+        return True
+
+    # ---- Threads (un pool par processus, relancé après un fork) ----
+
+    def ensure_started(self):
+        if self._pid == os.getpid() or not self.types:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._owner = f"{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:8]}"
+            self._db = None
+            self._running = {}
+            self._threads = [threading.Thread(target=self._worker, name=f'job-queue-{index}',
+                                              daemon=True) for index in range(self.workers)]
+            self._threads.append(threading.Thread(target=self._heartbeat, name='job-queue-bail',
+                                                  daemon=True))
+            for thread in self._threads:
+                thread.start()
+
+    def _worker(self):
+        while True:
+            try:
+                if self.work_once():
+                    continue
+            except Exception as e:
+                logger.error(f"File de tâches: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _heartbeat(self):
+        """Renouveler le bail des tâches longues en cours dans ce processus"""
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            running = dict(self._running)
+            if not running:
+                continue
+            try:
+                self._database()[QUEUE_COLLECTION].update_many(
+                    {'_id': {'$in': list(running)}, 'bail': {'$in': list(running.values())}},
+                    {'$set': {'bail_jusqu_a': datetime.utcnow() + timedelta(seconds=self.lease_seconds)}})
+            except Exception as e:
+                logger.error(f"Renouvellement des baux: {e}")
+
+    # ---- Administration et métriques ----
+
+    def depth(self, db=None):
+        """Profondeur de la file par type et statut, âge de la plus ancienne tâche prête"""
+        db = db if db is not None else self._database()
+        now = datetime.utcnow()
+        by_type = {}
+        for row in db[QUEUE_COLLECTION].aggregate([
+            {'$match': {'statut': {'$in': ['en_attente', 'en_cours']}}},
+            {'$group': {'_id': {'type': '$type', 'statut': '$statut'}, 'n': {'$sum': 1},
+                        'plus_ancienne': {'$min': '$disponible_le'}}}
+        ]):
+            entry = by_type.setdefault(row['_id']['type'], {'en_attente': 0, 'en_cours': 0})
+            entry[row['_id']['statut']] = row['n']
+            if row['_id']['statut'] == 'en_attente' and row['plus_ancienne'] <= now:
+                entry['attente_max_secondes'] = (now - row['plus_ancienne']).total_seconds()
+        return {'types': by_type, 'echecs': db[DEAD_COLLECTION].count_documents({})}
+
+    def dead_letters(self, db=None, limit=50):
+        db = db if db is not None else self._database()
+        return list(db[DEAD_COLLECTION].find().sort('fin', DESCENDING).limit(limit))
+
+    def retry_dead(self, task_id, db=None):
+        """Remettre une lettre morte en file (tentatives remises à zéro) ; False si absente"""
+        db = db if db is not None else self._database()
+        task = db[DEAD_COLLECTION].find_one({'_id': task_id})
+        if task is None:
+            return False
+        task.update(statut='en_attente', tentatives=0, disponible_le=datetime.utcnow())
+        for key in ('fin', 'debut', 'worker', 'bail_final'):
+            task.pop(key, None)
+        db[QUEUE_COLLECTION].replace_one({'_id': task_id}, task, upsert=True)
+        db[DEAD_COLLECTION].delete_one({'_id': task_id})
+        self._wake.set()
+        return True
+
+    def get_stats(self):
+        waits = sorted(self.wait_times)
+        runs = sorted(self.run_times)
+        return {
+            'running': self._pid == os.getpid(),
+            'workers': self.workers,
+            'types': sorted(self.types),
+            'in_progress': len(self._running),
+            'enqueued': self.enqueued,
+            'completed': self.completed,
+            'retried': self.retried,
+            'dead_lettered': self.dead,
+            'lost_leases': self.lost,
+            'wait_seconds': {'avg': sum(waits) / len(waits) if waits else None,
+                             'p95': waits[int(len(waits) * 0.95)] if waits else None},
+            'run_seconds': {'avg': sum(runs) / len(runs) if runs else None,
+                            'p95': runs[int(len(runs) * 0.95)] if runs else None}
+        }
+
+
+# Instance globale
+job_queue = JobQueue(
+    workers=int(os.getenv('JOB_QUEUE_WORKERS', '2')),
+    poll_interval=float(os.getenv('JOB_QUEUE_POLL_INTERVAL', '1.0')),
+    lease_seconds=int(os.getenv('JOB_QUEUE_LEASE_SECONDS', '300')),
+    max_attempts=int(os.getenv('JOB_QUEUE_MAX_ATTEMPTS', '5')),
+    backoff_seconds=float(os.getenv('JOB_QUEUE_BACKOFF_SECONDS', '10')),
+    retention_seconds=int(os.getenv('JOB_QUEUE_RETENTION_SECONDS', str(7 * 86400)))
+)
+
+
+def task(name, max_attempts=None, priority=0):
+    """Décorateur : enregistrer un handler(db, donnees) pour le type de tâche `name`"""
+    def decorator(handler):
+        return job_queue.register(name, handler, max_attempts, priority)
+    return decorator
+
+
+def enqueue(name, payload=None, priority=None, delay=0, db=None):
+    """Mettre une tâche en file depuis n'importe quelle route"""
+    return job_queue.enqueue(name, payload, priority, delay, db)
+
+
+def init_queue(app):
+    """Le pool de threads démarre à la première requête de chaque worker"""
+    if os.getenv('JOB_QUEUE_ENABLED', 'true').lower() != 'true':
+        return app
+
+    @app.before_request
+    def start_job_queue():
+        job_queue.ensure_started()
+
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="File de tâches persistante")
+    parser.add_argument('--list', action='store_true', help="Profondeur de la file et échecs")
+    parser.add_argument('--work', action='store_true', help="Vider la file puis s'arrêter")
+    parser.add_argument('--retry', action='append', default=[],
+                        help="ID de tâche échouée à remettre en file (répétable)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    import importlib
+    from config.database import get_db
+
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+    args = parse_args(argv)
+    db = get_db()
+    if db is None:
+        print("❌ Erreur: Impossible de se connecter à la base de données")
+        return False
+
+    success = True
+    for value in args.retry:
+        if not ObjectId.is_valid(value) or not job_queue.retry_dead(ObjectId(value), db):
+            print(f"❌ Tâche échouée introuvable: {value}")
+            success = False
+        else:
+            print(f"🔁 {value} remise en file")
+
+    if args.work:
+        started = time.perf_counter()
+        count = 0
+        while job_queue.work_once(db):
+            count += 1
+        print(f"✅ {count} tâche(s) exécutée(s) en {time.perf_counter() - started:.1f}s "
+              f"({job_queue.completed} terminée(s), {job_queue.retried} replanifiée(s), "
+              f"{job_queue.dead} en échec)")
+
+    if args.list:
+        depth = job_queue.depth(db)
+        for name, entry in sorted(depth['types'].items()):
+            print(f"- {name}: {entry['en_attente']} en attente, {entry['en_cours']} en cours, "
+                  f"attente max {entry.get('attente_max_secondes', 0):.0f}s")
+        print(f"- échecs: {depth['echecs']}")
+    return success
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Réparation des agrégats de notes des méditations
+
+rate_meditation maintient somme_notes / nombre_evaluations / note_moyenne de
+façon incrémentale. Ce job les recalcule depuis la collection `evaluations`
+(après un import, une suppression manuelle ou une dérive constatée) :
+une agrégation $group puis des bulk_write par lots, en ne réécrivant que
+les méditations dont les agrégats ont dérivé.
+
+Les doublons (méditation, utilisateur), antérieurs à l'index unique, sont
+d'abord supprimés en gardant l'évaluation la plus récente, puis l'index
+unique est créé : rate_meditation n'essaie que de le créer.
+
+Exemple :
+    python -m jobs.ratings --batch-size 1000
+    python -m jobs.ratings --meditation 65a1f0c2e4b0a1b2c3d4e5f6 --dry-run
+"""
+
+import argparse
+import sys
+import time
+from bson import ObjectId
+from pymongo import UpdateOne, DeleteMany, ASCENDING
+from config.database import get_db
+
+
+def ensure_rating_indexes(db):
+    """Une évaluation par (méditation, utilisateur) : garantit l'exactitude des deltas"""
+    db.evaluations.create_index(
+        [('meditation_id', ASCENDING), ('user_id', ASCENDING)],
+        unique=True,
+        name='evaluation_unique_par_utilisateur'
+    )
+
+
+def dedupe_evaluations(db, batch_size=1000, dry_run=False):
+    """
+    Une seule évaluation par (méditation, utilisateur) : la plus récente
+
+    Returns:
+        int: évaluations en double supprimées (ou à supprimer en dry-run)
+    """
+    pipeline = [
+        {'$sort': {'date_modification': -1, '_id': -1}},
+        {'$group': {'_id': {'m': '$meditation_id', 'u': '$user_id'},
+                    'ids': {'$push': '$_id'}, 'nombre': {'$sum': 1}}},
+        {'$match': {'nombre': {'$gt': 1}}}
+    ]
+    removed, pending = 0, []
+    for group in db.evaluations.aggregate(pipeline, allowDiskUse=True):
+        extra = group['ids'][1:]
+        removed += len(extra)
+        if dry_run:
+            continue
+        pending.append(DeleteMany({'_id': {'$in': extra}}))
+        if len(pending) >= batch_size:
+            db.evaluations.bulk_write(pending, ordered=False)
+            pending = []
+    if pending:
+        db.evaluations.bulk_write(pending, ordered=False)
+    return removed
+
+
+def rating_fields(somme, nombre):
+    return {
+        'somme_notes': somme,
+        'nombre_evaluations': nombre,
+        'note_moyenne': somme / nombre if nombre else 0
+    }
+
+
+class _Batch:
+    """Lot de corrections : écrit (ou compte en dry-run) par paquets"""
+
+    def __init__(self, collection, batch_size, dry_run):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.pending = []
+        self.corrected = 0
+
+    def add(self, meditation_id, fields):
+        # Filtre "a dérivé" : seul un document dont un champ diffère est réécrit
+        drift = {'_id': meditation_id,
+                 '$or': [{key: {'$ne': value}} for key, value in fields.items()]}
+        self.pending.append((drift, fields))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        if self.dry_run:
+            self.corrected += self.collection.count_documents(
+                {'$or': [drift for drift, _ in self.pending]})
+        else:
+            result = self.collection.bulk_write(
+                [UpdateOne(drift, {'$set': fields}) for drift, fields in self.pending],
+                ordered=False
+            )
+            self.corrected += result.modified_count
+        self.pending = []
+
+
+def recompute_ratings(db, meditation_ids=None, batch_size=1000, dry_run=False):
+    """
+    Recalcule les agrégats de notes depuis `evaluations`
+
+    Args:
+        meditation_ids: Limiter à ces méditations (toutes par défaut)
+        dry_run: Compter les écarts sans écrire
+
+    Returns:
+        dict: méditations examinées et corrigées
+    """
+    match = {'meditation_id': {'$in': meditation_ids}} if meditation_ids else {}
+    pipeline = [
+        {'$match': match},
+        {'$group': {'_id': '$meditation_id',
+                    'somme': {'$sum': '$note'},
+                    'nombre': {'$sum': 1}}}
+    ]
+    batch = _Batch(db.meditations, batch_size, dry_run)
+    seen = set()
+
+    for group in db.evaluations.aggregate(pipeline, allowDiskUse=True):
+        seen.add(group['_id'])
+        batch.add(group['_id'], rating_fields(group['somme'], group['nombre']))
+
+    # Méditations encore notées alors que leurs évaluations ont disparu
+    orphan_filter = {'nombre_evaluations': {'$gt': 0}}
+    if meditation_ids:
+        orphan_filter['_id'] = {'$in': meditation_ids}
+    for doc in db.meditations.find(orphan_filter, {'_id': 1}):
+        if doc['_id'] not in seen:
+            batch.add(doc['_id'], rating_fields(0, 0))
+    batch.flush()
+
+    return {'examinees': len(seen), 'corrigees': batch.corrected, 'dry_run': dry_run}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Recalcul des agrégats de notes des méditations")
+    parser.add_argument('--meditation', action='append', default=[],
+                        help="ID de méditation à réparer (répétable, toutes par défaut)")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--dry-run', action='store_true', help="Compter les écarts sans écrire")
+    parser.add_argument('--skip-index', action='store_true',
+                        help="Ne pas créer l'index unique sur evaluations")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    invalid = [value for value in args.meditation if not ObjectId.is_valid(value)]
+    if invalid:
+        print(f"❌ ID invalide(s): {', '.join(invalid)}")
+        return False
+
+    db = get_db()
+    if db is None:
+        print("❌ Erreur: Impossible de se connecter à la base de données")
+        return False
+
+    started = time.perf_counter()
+    duplicates = dedupe_evaluations(db, args.batch_size, args.dry_run)
+    if duplicates:
+        print(f"🧹 {duplicates} évaluation(s) en double "
+              f"{'à supprimer' if args.dry_run else 'supprimée(s)'}")
+    if not args.skip_index and not args.dry_run:
+        ensure_rating_indexes(db)
+
+    stats = recompute_ratings(
+        db,
+        meditation_ids=[ObjectId(value) for value in args.meditation] or None,
+        batch_size=args.batch_size,
+        dry_run=args.dry_run
+    )
+    print(f"✅ {stats['examinees']} méditation(s) examinée(s), "
+          f"{stats['corrigees']} {'à corriger' if args.dry_run else 'corrigée(s)'} "
+          f"en {time.perf_counter() - started:.1f}s")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Planificateur de tâches périodiques, dans le processus de l'application
+
+Chaque worker fait tourner un thread qui exécute les tâches arrivées à
+échéance. L'état de chaque tâche est partagé dans la collection `jobs_etat` :
+- un verrou à durée limitée (find_one_and_update atomique) garantit qu'une
+  seule exécution a lieu à la fois, tous workers et serveurs confondus ;
+  les tâches longues le prolongent entre deux étapes (heartbeat) ;
+- le watermark (fin de la fenêtre déjà traitée) permet aux tâches
+  incrémentales de ne traiter que les nouvelles données ;
+- la dernière exécution (durée, statut, métriques) est visible des admins.
+
+Variables : SCHEDULER_ENABLED (true par défaut), SCHEDULER_POLL_INTERVAL,
+SCHEDULER_LEASE_SECONDS.
+
+L'exécution manuelle depuis l'API passe par la file de tâches
+(jobs/queue.py) : POST /analytics/jobs/<nom>/run répond sans attendre.
+
+Exemple (exécution ponctuelle, hors application) :
+    python -m jobs.scheduler --list
+    python -m jobs.scheduler --run analytics_quotidien
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+import socket
+import threading
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from jobs.queue import task
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATE_COLLECTION = 'jobs_etat'
+
+
+class LockLost(RuntimeError):
+    """Verrou expiré et repris par un autre worker pendant l'exécution"""
+
+
+class ScheduledJob:
+    """
+    Tâche périodique
+
+    Args:
+        run: run(db, since, until) -> dict de métriques ; `since` est le
+            watermark précédent (None au premier passage), `until` le début
+            de l'exécution, qui devient le nouveau watermark en cas de succès
+    """
+
+    def __init__(self, name, interval, run, description=''):
+        self.name = name
+        self.interval = interval
+        self.run = run
+        self.description = description
+
+
+class JobScheduler:
+    def __init__(self, poll_interval=15.0, lease_seconds=600):
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+        self._owner = None
+        self._db = None
+        # Tâche en cours dans le thread courant : (nom, propriétaire, dernier renouvellement)
+        self._local = threading.local()
+        # Métriques du worker : nom -> compteurs
+        self.metrics = {}
+
+    def register(self, job):
+        self.jobs[job.name] = job
+        self.metrics.setdefault(job.name, {
+            'runs': 0, 'failures': 0, 'skipped': 0,
+            'last_duration_ms': None, 'last_status': None, 'last_metrics': None
+        })
+        return job
+
+    def _database(self):
+        if self._db is None:
+            from config.database import get_db
+            self._db = get_db()
+        return self._db
+
+    def ensure_started(self):
+        # Un thread par processus, relancé après un fork
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._owner = f"{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:8]}"
+            self._db = None
+            self._thread = threading.Thread(target=self._loop, name='job-scheduler', daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.run_due()
+            except Exception as e:
+                logger.error(f"Planificateur: {e}")
+
+    def run_due(self):
+        """Exécuter les tâches arrivées à échéance (celles verrouillées ailleurs sont ignorées)"""
+        return {name: self.run_job(name) for name in self.jobs}
+
+    def _acquire(self, db, job, force):
+        now = datetime.utcnow()
+        query = {'_id': job.name,
+                 '$or': [{'verrou_jusqu_a': None}, {'verrou_jusqu_a': {'$lt': now}}]}
+        if not force:
+            query['$and'] = [{'$or': [{'prochaine_execution': None},
+                                      {'prochaine_execution': {'$lte': now}}]}]
+        try:
+            return db[STATE_COLLECTION].find_one_and_update(
+                query,
+                {'$set': {'verrou_jusqu_a': now + timedelta(seconds=self.lease_seconds),
+                          'proprietaire': self._owner or 'cli'}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Document existant mais verrouillé (ou pas encore à échéance)
+            return None
+
+    def run_job(self, name, force=False):
+        """
+        Exécuter une tâche si elle est à échéance (ou immédiatement avec force)
+
+        Returns:
+            dict: statut ('ok', 'error', 'skipped') et métriques
+        """
+        job = self.jobs[name]
+        metrics = self.metrics[name]
+        db = self._database()
+        state = self._acquire(db, job, force)
+        if state is None:
+            metrics['skipped'] += 1
+            return {'status': 'skipped'}
+
+        started = datetime.utcnow()
+        clock = time.perf_counter()
+        update = {'verrou_jusqu_a': None,
+                  'prochaine_execution': started + timedelta(seconds=job.interval)}
+        self._local.current = (name, self._owner or 'cli', time.monotonic())
+        try:
+            result = job.run(db, state.get('watermark'), started) or {}
+            status = 'ok'
+            update['watermark'] = started
+        except Exception as e:
+            logger.error(f"Tâche {name} en échec: {e}")
+            result = {'erreur': str(e)}
+            status = 'error'
+        finally:
+            self._local.current = None
+        duration_ms = (time.perf_counter() - clock) * 1000
+
+        update['derniere_execution'] = {
+            'debut': started, 'duree_ms': round(duration_ms, 1),
+            'statut': status, 'metriques': result, 'proprietaire': self._owner or 'cli'
+        }
+        db[STATE_COLLECTION].update_one(
+            {'_id': name, 'proprietaire': self._owner or 'cli'},
+            {'$set': update,
+             '$inc': {'executions': 1, 'echecs': 0 if status == 'ok' else 1}}
+        )
+
+        metrics['runs'] += 1
+        if status != 'ok':
+            metrics['failures'] += 1
+        metrics['last_duration_ms'] = duration_ms
+        metrics['last_status'] = status
+        metrics['last_metrics'] = result
+        return {'status': status, 'duration_ms': duration_ms, 'metrics': result}
+
+    def heartbeat(self):
+        """
+        Prolonger le verrou de la tâche exécutée par ce thread ; à appeler
+        entre deux étapes d'une tâche longue (sans effet hors d'une exécution)
+
+        Raises:
+            LockLost: le verrou a expiré et une autre exécution l'a pris
+        """
+        current = getattr(self._local, 'current', None)
+        if current is None:
+            return
+        name, owner, renewed = current
+        if time.monotonic() - renewed < self.lease_seconds / 10:
+            return
+        result = self._database()[STATE_COLLECTION].update_one(
+            {'_id': name, 'proprietaire': owner},
+            {'$set': {'verrou_jusqu_a': datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+        )
+        if not result.matched_count:
+            raise LockLost(f"Verrou de {name} repris par un autre worker")
+        self._local.current = (name, owner, time.monotonic())
+
+    def status(self):
+        """État partagé des tâches (tous workers), lu dans jobs_etat"""
+        now = datetime.utcnow()
+        states = {doc['_id']: doc for doc in self._database()[STATE_COLLECTION].find(
+            {'_id': {'$in': list(self.jobs)}})}
+        jobs = []
+        for name, job in self.jobs.items():
+            state = states.get(name, {})
+            watermark = state.get('watermark')
+            jobs.append({
+                'nom': name,
+                'description': job.description,
+                'intervalle': job.interval,
+                'watermark': watermark,
+                'retard_secondes': (now - watermark).total_seconds() if watermark else None,
+                'prochaine_execution': state.get('prochaine_execution'),
+                'en_cours': bool(state.get('verrou_jusqu_a') and state['verrou_jusqu_a'] > now),
+                'executions': state.get('executions', 0),
+                'echecs': state.get('echecs', 0),
+                'derniere_execution': state.get('derniere_execution')
+            })
+        return jobs
+
+    def get_stats(self):
+        return {
+            'running': self._pid == os.getpid(),
+            'poll_interval': self.poll_interval,
+            'jobs': {name: dict(metrics) for name, metrics in self.metrics.items()}
+        }
+
+
+# Instance globale
+scheduler = JobScheduler(
+    poll_interval=float(os.getenv('SCHEDULER_POLL_INTERVAL', '15')),
+    lease_seconds=int(os.getenv('SCHEDULER_LEASE_SECONDS', '600'))
+)
+
+
+def default_jobs():
+    """Tâches de l'application (import tardif : elles importent ce module)"""
+    from jobs.analytics import analytics_jobs
+    from jobs.user_deletion import deletion_jobs
+    return analytics_jobs + deletion_jobs
+
+
+@task('tache_planifiee', max_attempts=1)
+def run_scheduled_job(db, donnees):
+    """Handler de la file : exécution manuelle d'une tâche planifiée"""
+    if donnees['nom'] not in scheduler.jobs:
+        for job in default_jobs():
+            scheduler.register(job)
+    result = scheduler.run_job(donnees['nom'], force=True)
+    if result['status'] == 'error':
+        raise RuntimeError(result['metrics'].get('erreur'))
+    return result
+
+
+def init_scheduler(app, jobs):
+    """Enregistrer les tâches ; le thread démarre à la première requête de chaque worker"""
+
+    for job in jobs:
+        scheduler.register(job)
+
+    if os.getenv('SCHEDULER_ENABLED', 'true').lower() != 'true':
+        return app
+
+    @app.before_request
+    def start_scheduler():
+        scheduler.ensure_started()
+
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Exécution ponctuelle des tâches planifiées")
+    parser.add_argument('--run', action='append', default=[],
+                        help="Nom de la tâche à exécuter (répétable)")
+    parser.add_argument('--list', action='store_true', help="Afficher l'état des tâches")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    for job in default_jobs():
+        scheduler.register(job)
+
+    args = parse_args(argv)
+    unknown = [name for name in args.run if name not in scheduler.jobs]
+    if unknown:
+        print(f"❌ Tâche(s) inconnue(s): {', '.join(unknown)}")
+        return False
+
+    if args.list:
+        for job in scheduler.status():
+            print(f"- {job['nom']}: watermark={job['watermark']} "
+                  f"executions={job['executions']} echecs={job['echecs']}")
+
+    success = True
+    for name in args.run:
+        result = scheduler.run_job(name, force=True)
+        if result['status'] == 'ok':
+            print(f"✅ {name} en {result['duration_ms']:.0f}ms: {result['metrics']}")
+        elif result['status'] == 'skipped':
+            print(f"⏳ {name} déjà en cours d'exécution")
+        else:
+            print(f"❌ {name}: {result['metrics'].get('erreur')}")
+            success = False
+    return success
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
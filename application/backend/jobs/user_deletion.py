@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Suppression en cascade des comptes utilisateurs, en arrière-plan
+
+DELETE /users/<id> (et POST /users/bulk avec "delete") marque seulement le
+compte : est_actif à false, `suppression_demandee_le`, et un document de
+suivi dans `suppressions_utilisateurs` (_id = id de l'utilisateur). Une
+tâche mise en file par la requête (jobs/queue.py), puis la tâche planifiée
+`suppressions_utilisateurs` en reprise, suppriment ensuite ses données par lots de USER_DELETION_BATCH
+documents, avec une pause de USER_DELETION_PAUSE secondes entre deux lots
+pour ne pas saturer MongoDB :
+historique (collection active et archives), agrégats d'activité,
+évaluations (les agrégats de notes des méditations concernées sont
+recalculés), sessions, exports, puis le compte lui-même.
+
+Un seul worker traite un compte à la fois (bail renouvelé à chaque lot) ;
+la progression par collection reste visible des admins après la fin
+(GET /users/suppressions).
+
+Pendant une migration du stockage de l'historique (jobs/history_storage.py),
+les suppressions attendent sans consommer de tentative : la copie ne rejoue
+pas les suppressions de la source.
+
+Exemple :
+    python -m jobs.user_deletion
+    python -m jobs.user_deletion --user 6653ff0a3a6e8a2d4c1b8e11
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from jobs.scheduler import ScheduledJob
+from jobs.queue import task, enqueue
+from jobs.history_storage import (is_timeseries, ensure_no_migration, migration_in_progress,
+                                  MigrationInProgress)
+from jobs.ratings import recompute_ratings
+from utils.history_store import historiques
+from utils.archive import ARCHIVE_COLLECTION
+from utils.activity import DAILY_COLLECTION, SUMMARY_COLLECTION
+from utils.export import EXPORTS_COLLECTION
+from utils.auth_middleware import invalidate_principals
+import logging
+
+logger = logging.getLogger(__name__)
+
+DELETIONS_COLLECTION = 'suppressions_utilisateurs'
+BATCH_SIZE = int(os.getenv('USER_DELETION_BATCH', '500'))
+PAUSE = float(os.getenv('USER_DELETION_PAUSE', '0.05'))
+LEASE_SECONDS = int(os.getenv('USER_DELETION_LEASE_SECONDS', '300'))
+MAX_ATTEMPTS = int(os.getenv('USER_DELETION_MAX_ATTEMPTS', '5'))
+INTERVAL = int(os.getenv('USER_DELETION_INTERVAL', '60'))
+
+
+class LeaseLost(Exception):
+    """Un autre worker a repris la suppression (bail expiré)"""
+
+
+def request_deletion(db, user, requested_by=None):
+    """Marquer le compte (instantané) ; retourne le document de suivi"""
+    now = datetime.utcnow()
+    db.utilisateurs.update_one({'_id': user['_id']},
+                               {'$set': {'est_actif': False, 'suppression_demandee_le': now}})
+    return db[DELETIONS_COLLECTION].find_one_and_update(
+        {'_id': user['_id']},
+        {'$setOnInsert': {'email': user.get('email'),
+                          'nom': f"{user.get('prenom', '')} {user.get('nom', '')}".strip(),
+                          'statut': 'en_attente', 'progression': {}, 'tentatives': 0,
+                          'demandee_le': now, 'demandee_par': requested_by}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def start_deletion(db, user_id=None):
+    """
+    Mettre en file le traitement (un compte, ou toutes les suppressions en
+    attente) ; la tâche planifiée reprend en cas d'échec
+    """
+    return enqueue('suppression_utilisateurs', {'user_id': user_id} if user_id else {}, db=db)
+
+
+def claim(db, user_id=None):
+    """Prendre le bail d'une suppression en attente (ou abandonnée) ; None si aucune"""
+    now = datetime.utcnow()
+    query = {
+        'statut': {'$in': ['en_attente', 'en_cours', 'erreur']},
+        'tentatives': {'$lt': MAX_ATTEMPTS},
+        '$or': [{'bail_jusqu_a': None}, {'bail_jusqu_a': {'$lt': now}}]
+    }
+    if user_id is not None:
+        query['_id'] = user_id
+    return db[DELETIONS_COLLECTION].find_one_and_update(
+        query,
+        {'$set': {'statut': 'en_cours', 'bail': uuid.uuid4().hex,
+                  'bail_jusqu_a': now + timedelta(seconds=LEASE_SECONDS)},
+         '$min': {'debut': now},
+         '$inc': {'tentatives': 1}},
+        sort=[('demandee_le', 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+class Cascade:
+    """Suppression des données d'un compte dont on détient le bail"""
+
+    def __init__(self, db, deletion, batch_size=BATCH_SIZE, pause=PAUSE):
+        self.db = db
+        self.deletion = deletion
+        self.user_id = deletion['_id']
+        self.batch_size = batch_size
+        self.pause = pause
+        self.deleted = 0
+
+    def _progress(self, step, count):
+        """Comptabiliser un lot et renouveler le bail"""
+        self.deleted += count
+        result = self.db[DELETIONS_COLLECTION].update_one(
+            {'_id': self.user_id, 'bail': self.deletion['bail']},
+            {'$inc': {f'progression.{step}': count},
+             '$set': {'bail_jusqu_a': datetime.utcnow() + timedelta(seconds=LEASE_SECONDS)}}
+        )
+        if result.matched_count == 0:
+            raise LeaseLost(str(self.user_id))
+
+    def delete_batches(self, step, collection, query, on_batch=None):
+        """Supprimer par lots de _id, avec une pause entre deux lots"""
+        projection = {'_id': 1, 'meditation_id': 1} if on_batch else {'_id': 1}
+        while True:
+            batch = list(collection.find(query, projection).limit(self.batch_size))
+            if not batch:
+                return
+            if on_batch:
+                on_batch(batch)
+            result = collection.delete_many({'_id': {'$in': [doc['_id'] for doc in batch]}})
+            self._progress(step, result.deleted_count)
+            if self.pause:
+                time.sleep(self.pause)
+
+    def historiques(self):
+        ensure_no_migration(self.db)
+        collection = historiques(self.db)
+        query = {'id_utilisateur': self.user_id}
+        if is_timeseries(self.db, collection.name):
+            # Suppression par _id impossible avant MongoDB 7.0 ; un filtre sur le
+            # seul metaField supprime des buckets entiers (MongoDB 5.0+)
+            self._progress('historiques', collection.delete_many(query).deleted_count)
+        else:
+            self.delete_batches('historiques', collection, query)
+        self.delete_batches('historiques_archives', self.db[ARCHIVE_COLLECTION], query)
+
+    def evaluations(self):
+        meditations = set()
+        self.delete_batches(
+            'evaluations', self.db.evaluations,
+            {'user_id': {'$in': [self.user_id, str(self.user_id)]}},
+            on_batch=lambda batch: meditations.update(doc.get('meditation_id') for doc in batch)
+        )
+        meditations.discard(None)
+        if meditations:
+            # Agrégats de notes sans les évaluations supprimées
+            recompute_ratings(self.db, meditation_ids=list(meditations))
+
+    def exports(self):
+        for export in self.db[EXPORTS_COLLECTION].find({'id_utilisateur': self.user_id},
+                                                       {'chemin': 1}):
+            for path in (export.get('chemin'), f"{export.get('chemin')}.part"):
+                if path and os.path.exists(path):
+                    os.remove(path)
+        self.delete_batches('exports', self.db[EXPORTS_COLLECTION], {'id_utilisateur': self.user_id})
+
+    def activity(self):
+        """Historique et agrégats d'activité"""
+        self.historiques()
+        self.delete_batches('activite', self.db[DAILY_COLLECTION], {'id_utilisateur': self.user_id})
+        self.db[SUMMARY_COLLECTION].delete_one({'_id': self.user_id})
+
+    def run(self):
+        self.activity()
+        self.evaluations()
+        self.delete_batches('sessions', self.db.sessions,
+                            {'user_id': {'$in': [self.user_id, str(self.user_id)]}})
+        self.exports()
+        # Second passage juste avant le compte : lignes écrites pendant la
+        # cascade (requête acceptée avant le marquage du compte)
+        self.activity()
+        self.db.utilisateurs.delete_one({'_id': self.user_id})
+        invalidate_principals(self.user_id)
+        return self.deleted
+
+
+def process_pending(db, since=None, until=None, user_id=None, limit=100):
+    """Traiter les suppressions en attente (signature d'une tâche planifiée)"""
+    users = rows = failures = 0
+    while users + failures < limit:
+        if migration_in_progress(db):
+            logger.info("Suppressions suspendues pendant la migration de l'historique")
+            break
+        deletion = claim(db, user_id)
+        if deletion is None:
+            break
+        try:
+            rows += Cascade(db, deletion).run()
+            users += 1
+            db[DELETIONS_COLLECTION].update_one(
+                {'_id': deletion['_id'], 'bail': deletion['bail']},
+                {'$set': {'statut': 'termine', 'fin': datetime.utcnow()},
+                 '$unset': {'bail': '', 'bail_jusqu_a': '', 'erreur': ''}}
+            )
+        except LeaseLost:
+            logger.warning(f"Suppression de {deletion['_id']} reprise par un autre worker")
+            failures += 1
+        except MigrationInProgress:
+            # Migration commencée pendant la cascade : reprise après la bascule
+            logger.info(f"Suppression de {deletion['_id']} suspendue (migration de l'historique)")
+            db[DELETIONS_COLLECTION].update_one(
+                {'_id': deletion['_id'], 'bail': deletion['bail']},
+                {'$set': {'statut': 'en_attente'}, '$inc': {'tentatives': -1},
+                 '$unset': {'bail': '', 'bail_jusqu_a': ''}}
+            )
+            break
+        except Exception as e:
+            logger.error(f"Suppression de {deletion['_id']} en échec: {e}")
+            failures += 1
+            db[DELETIONS_COLLECTION].update_one(
+                {'_id': deletion['_id'], 'bail': deletion['bail']},
+                # Nouvelle tentative au plus tôt au passage suivant de la tâche
+                {'$set': {'statut': 'erreur', 'erreur': str(e),
+                          'bail_jusqu_a': datetime.utcnow() + timedelta(seconds=INTERVAL)},
+                 '$unset': {'bail': ''}}
+            )
+        if user_id is not None:
+            break
+    return {'utilisateurs': users, 'documents': rows, 'echecs': failures}
+
+
+@task('suppression_utilisateurs')
+def deletion_task(db, donnees):
+    """Handler de la file ; les échecs d'un compte sont repris par la tâche planifiée"""
+    return process_pending(db, user_id=donnees.get('user_id'))
+
+
+deletion_jobs = [
+    ScheduledJob('suppressions_utilisateurs', INTERVAL, process_pending,
+                 "Suppression en cascade des comptes marqués"),
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Suppression en cascade des comptes marqués")
+    parser.add_argument('--user', help="Traiter uniquement ce compte")
+    parser.add_argument('--limit', type=int, default=100)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from bson import ObjectId
+    from config.database import get_db
+
+    args = parse_args(argv)
+    if args.user and not ObjectId.is_valid(args.user):
+        print(f"❌ ID invalide: {args.user}")
+        return False
+
+    db = get_db()
+    if db is None:
+        print("❌ Erreur: Impossible de se connecter à la base de données")
+        return False
+
+    started = time.perf_counter()
+    stats = process_pending(db, user_id=ObjectId(args.user) if args.user else None,
+                            limit=args.limit)
+    print(f"✅ {stats['utilisateurs']} compte(s) supprimé(s), {stats['documents']} document(s), "
+          f"{stats['echecs']} échec(s) en {time.perf_counter() - started:.1f}s")
+    return stats['echecs'] == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
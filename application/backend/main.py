@@ -3,6 +3,16 @@ from flask_cors import CORS
 from config.database import get_db
 from utils.security_headers import add_security_headers
 from utils.performance import monitor_performance
+from utils.memory_profiler import monitor_memory
+from utils.slow_requests import capture_slow_requests
+from utils.invalidation import init_invalidation
+from utils.compression import compress_responses
+from utils.json_provider import init_json_provider
+from utils.identity_map import init_identity_map
+from jobs.scheduler import init_scheduler
+from jobs.queue import init_queue
+from jobs.analytics import analytics_jobs
+from jobs.user_deletion import deletion_jobs
 import os
 import datetime
 
@@ -11,9 +21,18 @@ from routes.users import users_bp
 from routes.exercices import exercices_bp
 from routes.historiques import historiques_bp
 from routes.informations_sante import informations_sante_bp
+from routes.search import search_bp
+from routes.analytics import analytics_bp
 
 app = Flask(__name__)
 
+# Taille maximale d'un corps de requête (avant décompression : voir
+# BULK_MAX_BYTES pour la limite après décompression des imports)
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', str(16 * 1024 * 1024)))
+
+# Sérialisation JSON native des types MongoDB (ObjectId, datetime, Decimal128)
+app = init_json_provider(app)
+
 # Configuration CORS améliorée
 cors_origins = os.getenv('CORS_ORIGINS', 'http://localhost:5173').split(',')
 CORS(app, 
@@ -27,6 +46,28 @@ app = add_security_headers(app)
 # Ajouter le monitoring de performance
 app = monitor_performance(app)
 
+# Ajouter le suivi des allocations mémoire (activable à chaud)
+app = monitor_memory(app)
+
+# Capturer les requêtes lentes (bundles rejouables)
+app = capture_slow_requests(app)
+
+# Identity map par requête : rapport des requêtes dupliquées évitées
+app = init_identity_map(app)
+
+# Propager les invalidations de cache entre workers
+app = init_invalidation(app)
+
+# Tâches planifiées (agrégats statistiques), un thread par worker
+app = init_scheduler(app, analytics_jobs + deletion_jobs)
+
+# File de tâches persistante (suppressions, opérations groupées, exports)
+app = init_queue(app)
+
+# Compression gzip/brotli (enregistrée en dernier : s'exécute avant les
+# autres after_request, dont la mesure du temps de réponse)
+app = compress_responses(app)
+
 print("Initializing database connection...")
 db = get_db()
 print("Database connection initialized")
@@ -36,8 +77,8 @@ print("Database connection initialized")
 def health_check():
     """Endpoint de vérification de santé pour Docker et monitoring"""
     try:
-        # Test de connexion à la base de données
-        db.command('ping')
+        # Test de connexion à la base de données (client du worker courant)
+        get_db().command('ping')
         db_status = "healthy"
     except Exception as e:
         db_status = f"unhealthy: {str(e)}"
@@ -74,8 +115,11 @@ app.register_blueprint(users_bp, url_prefix='/users')
 app.register_blueprint(exercices_bp, url_prefix='/exercices')
 app.register_blueprint(historiques_bp, url_prefix='/historiques')
 app.register_blueprint(informations_sante_bp, url_prefix='/informations-sante')
+app.register_blueprint(search_bp, url_prefix='/search')
+app.register_blueprint(analytics_bp, url_prefix='/analytics')
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
-    debug = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
+    # Debug uniquement sur demande explicite (jamais en production)
+    debug = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     app.run(debug=debug, host='0.0.0.0', port=port) 
\ No newline at end of file
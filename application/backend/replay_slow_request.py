@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Rejoue un bundle de requête lente capturé par utils/slow_requests.py
+
+Par défaut la requête est rejouée dans le processus (client de test Flask sur
+main.app, donc contre la base configurée localement) sous cProfile ; avec
+--target elle est envoyée en HTTP à une instance locale déjà démarrée.
+
+Exemples :
+    python replay_slow_request.py --latest --profile
+    python replay_slow_request.py logs/slow_requests/xxx.json --repeat 5
+    python replay_slow_request.py --latest --target http://localhost:5000
+"""
+
+import argparse
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+
+import jwt
+
+DEFAULT_DIR = os.getenv('SLOW_REQUEST_DIR', os.path.join('logs', 'slow_requests'))
+
+
+def load_bundle(path, latest, directory):
+    if latest:
+        files = sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+        if not files:
+            raise SystemExit(f"❌ Aucun bundle dans {directory}")
+        path = os.path.join(directory, files[-1])
+    if not path:
+        raise SystemExit("❌ Indiquez un bundle ou --latest")
+    with open(path, encoding='utf-8') as f:
+        return path, json.load(f)
+
+
+def build_request(bundle, secret_key):
+    """Reconstruit méthode, URL, en-têtes et corps à partir du bundle"""
+    req = bundle['request']
+    url = req['path'] + (f"?{req['query_string']}" if req.get('query_string') else '')
+    headers = {name: value for name, value in req.get('headers', {}).items()
+               if name != 'Content-Length'}
+    body = None
+    if req.get('body') and 'json' in req['body']:
+        body = json.dumps(req['body']['json']).encode('utf-8')
+        headers['Content-Type'] = 'application/json'
+    elif req.get('body'):
+        print("⚠️  Corps non JSON ou tronqué : rejoué sans corps")
+
+    cookies = {}
+    identity = bundle.get('identity') or {}
+    if identity.get('authenticated') and identity.get('user_id'):
+        # Token forgé avec la clé locale : à réserver aux instances de développement
+        token = jwt.encode({
+            'user_id': identity['user_id'],
+            'email': identity.get('email'),
+            'exp': datetime.utcnow() + timedelta(minutes=10)
+        }, secret_key, algorithm='HS256')
+        cookies['access_token'] = token
+    return req['method'], url, headers, body, cookies
+
+
+def replay_http(target, method, url, headers, body, cookies):
+    if cookies:
+        headers = dict(headers, Cookie='; '.join(f"{k}={v}" for k, v in cookies.items()))
+    http_request = urllib.request.Request(target.rstrip('/') + url, data=body,
+                                          headers=headers, method=method)
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(http_request) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - started, None
+
+
+def replay_in_process(method, url, headers, body, cookies, profiler):
+    from main import app
+    from utils.slow_requests import slow_request_recorder
+
+    client = app.test_client()
+    for name, value in cookies.items():
+        client.set_cookie(name, value)
+
+    captured = {}
+    original_end = slow_request_recorder.end
+
+    def capturing_end():
+        commands, phases = original_end()
+        captured.setdefault('commands', commands)
+        return commands, phases
+
+    slow_request_recorder.end = capturing_end
+    try:
+        started = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        response = client.open(url, method=method, headers=headers, data=body)
+        if profiler:
+            profiler.disable()
+        duration = time.perf_counter() - started
+    finally:
+        slow_request_recorder.end = original_end
+    return response.status_code, duration, captured.get('commands', [])
+
+
+def summarize_commands(commands):
+    total = sum(command['duration_ms'] for command in commands)
+    by_name = {}
+    for command in commands:
+        key = f"{command['command']} {command.get('collection') or ''}".strip()
+        by_name[key] = by_name.get(key, 0) + 1
+    return len(commands), total, by_name
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rejoue un bundle de requête lente")
+    parser.add_argument('bundle', nargs='?', help="Chemin du bundle JSON")
+    parser.add_argument('--latest', action='store_true', help="Rejouer le bundle le plus récent")
+    parser.add_argument('--dir', default=DEFAULT_DIR, help="Répertoire des bundles")
+    parser.add_argument('--target', help="URL d'une instance locale (mode HTTP)")
+    parser.add_argument('--repeat', type=int, default=1, help="Nombre de rejeux")
+    parser.add_argument('--profile', action='store_true', help="Profiler avec cProfile (mode local)")
+    parser.add_argument('--profile-output', help="Fichier .prof de sortie (snakeviz, pstats)")
+    parser.add_argument('--top', type=int, default=25, help="Nombre de fonctions affichées")
+    args = parser.parse_args(argv)
+
+    path, bundle = load_bundle(args.bundle, args.latest, args.dir)
+    from config.config import SECRET_KEY
+    method, url, headers, body, cookies = build_request(bundle, SECRET_KEY)
+
+    original = bundle['phases']
+    count, mongo_ms, by_name = summarize_commands(bundle.get('mongo_commands', []))
+    print(f"📦 {path}")
+    print(f"   {method} {url} -> {bundle['response']['status']} "
+          f"en {original['total']:.3f}s (mongo {original.get('mongo', 0):.3f}s, "
+          f"{count} commandes)")
+    for name, occurrences in sorted(by_name.items(), key=lambda item: -item[1]):
+        print(f"     {occurrences:4d} x {name}")
+
+    if args.profile and args.target:
+        print("⚠️  --profile ignoré en mode HTTP : le serveur n'est pas dans ce processus")
+    profiler = cProfile.Profile() if args.profile and not args.target else None
+
+    for attempt in range(1, args.repeat + 1):
+        if args.target:
+            status, duration, commands = replay_http(args.target, method, url, headers,
+                                                     body, cookies)
+        else:
+            status, duration, commands = replay_in_process(method, url, headers, body,
+                                                           cookies, profiler)
+        line = f"🔁 Rejeu {attempt}: {status} en {duration:.3f}s"
+        if commands is not None:
+            replay_count, replay_ms, _ = summarize_commands(commands)
+            line += f" (mongo {replay_ms / 1000:.3f}s, {replay_count} commandes)"
+        print(line)
+
+    if profiler:
+        if args.profile_output:
+            profiler.dump_stats(args.profile_output)
+            print(f"💾 Profil écrit dans {args.profile_output}")
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(args.top)
+        print(stream.getvalue())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+from flask import Blueprint, jsonify, request
+from datetime import datetime, timedelta
+from config.database import get_db
+from utils.auth_middleware import require_admin
+from bson import ObjectId
+from jobs.scheduler import scheduler
+from jobs.queue import job_queue, enqueue
+from jobs.analytics import (DAILY_COLLECTION, EXERCICES_COLLECTION,
+                            COHORTS_COLLECTION, RETENTION_COLLECTION)
+
+analytics_bp = Blueprint('analytics', __name__)
+
+MAX_JOURS = 366
+MAX_COHORTES = 52
+
+def _date_arg(name, default):
+    value = request.args.get(name)
+    if not value:
+        return default
+    return datetime.strptime(value, '%Y-%m-%d')
+
+def _int_arg(name, default, minimum, maximum):
+    try:
+        value = int(request.args.get(name, default))
+    except ValueError:
+        value = default
+    return max(minimum, min(value, maximum))
+
+@analytics_bp.route('', methods=['GET'])
+@require_admin
+def get_analytics():
+    """Statistiques globales, lues uniquement dans les collections d'agrégats"""
+    print("Received GET /analytics request")
+    try:
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        try:
+            jusqu_a = _date_arg('jusqu_a', today)
+            depuis = _date_arg('depuis', jusqu_a - timedelta(days=29))
+        except ValueError:
+            return jsonify({'error': 'Format de date invalide (AAAA-MM-JJ attendu)'}), 400
+        if depuis > jusqu_a or (jusqu_a - depuis).days >= MAX_JOURS:
+            return jsonify({'error': f'Période invalide ({MAX_JOURS} jours maximum)'}), 400
+        limit = _int_arg('limit', 10, 1, 100)
+        nombre_cohortes = _int_arg('cohortes', 12, 1, MAX_COHORTES)
+
+        db = get_db()
+        period = {'jour': {'$gte': depuis, '$lte': jusqu_a}}
+
+        # Utilisateurs actifs par jour
+        actifs = list(db[DAILY_COLLECTION].find(
+            period, {'_id': 0, 'jour': 1, 'utilisateurs_actifs': 1, 'exercices': 1}
+        ).sort('jour', 1))
+
+        # Exercices les plus pratiqués sur la période
+        exercices = list(db[EXERCICES_COLLECTION].aggregate([
+            {'$match': period},
+            {'$group': {'_id': '$id_exercice', 'pratiques': {'$sum': '$pratiques'}}},
+            {'$sort': {'pratiques': -1}},
+            {'$limit': limit},
+            {'$lookup': {'from': 'exercices', 'localField': '_id',
+                         'foreignField': '_id', 'as': 'exercice'}},
+            {'$project': {
+                '_id': 0,
+                'id_exercice': '$_id',
+                'nom': {'$ifNull': [{'$arrayElemAt': ['$exercice.nom', 0]}, None]},
+                'pratiques': 1
+            }}
+        ]))
+
+        # Rétention des dernières cohortes d'inscription
+        cohortes = list(db[COHORTS_COLLECTION].find().sort('_id', -1).limit(nombre_cohortes))
+        retention = {}
+        for doc in db[RETENTION_COLLECTION].find(
+                {'cohorte': {'$in': [cohorte['_id'] for cohorte in cohortes]}}):
+            retention.setdefault(doc['cohorte'], []).append(doc)
+        retention_list = []
+        for cohorte in cohortes:
+            inscrits = cohorte.get('inscrits', 0)
+            semaines = sorted(retention.get(cohorte['_id'], []),
+                              key=lambda doc: doc['semaines_depuis_inscription'])
+            retention_list.append({
+                'cohorte': cohorte['_id'],
+                'inscrits': inscrits,
+                'semaines': [{
+                    'semaine': doc['semaines_depuis_inscription'],
+                    'utilisateurs_actifs': doc['utilisateurs_actifs'],
+                    'taux': round(doc['utilisateurs_actifs'] / inscrits, 4) if inscrits else None
+                } for doc in semaines]
+            })
+
+        return jsonify({
+            'depuis': depuis.date().isoformat(),
+            'jusqu_a': jusqu_a.date().isoformat(),
+            'utilisateurs_actifs': actifs,
+            'exercices_populaires': exercices,
+            'retention': retention_list,
+            'taches': scheduler.status()
+        }), 200
+
+    except Exception as e:
+        print(f"Error in get_analytics: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@analytics_bp.route('/jobs', methods=['GET'])
+@require_admin
+def get_analytics_jobs():
+    """État des tâches planifiées (watermark, dernière exécution) et métriques du worker"""
+    try:
+        return jsonify({'taches': scheduler.status(), 'worker': scheduler.get_stats()}), 200
+    except Exception as e:
+        print(f"Error in get_analytics_jobs: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@analytics_bp.route('/jobs/<name>/run', methods=['POST'])
+@require_admin
+def run_analytics_job(name):
+    """Mettre en file l'exécution immédiate d'une tâche (suivi : GET /analytics/jobs)"""
+    if name not in scheduler.jobs:
+        return jsonify({'error': 'Tâche inconnue'}), 404
+    try:
+        task_id = enqueue('tache_planifiee', {'nom': name}, db=get_db())
+        return jsonify({'nom': name, 'tache': str(task_id), 'statut': 'en_attente'}), 202
+    except Exception as e:
+        print(f"Error in run_analytics_job: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@analytics_bp.route('/queue', methods=['GET'])
+@require_admin
+def get_job_queue():
+    """Profondeur de la file de tâches, dernières tâches en échec et métriques du worker"""
+    try:
+        db = get_db()
+        return jsonify({'file': job_queue.depth(db), 'echecs': job_queue.dead_letters(db),
+                        'worker': job_queue.get_stats()}), 200
+    except Exception as e:
+        print(f"Error in get_job_queue: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@analytics_bp.route('/queue/echecs/<task_id>/retry', methods=['POST'])
+@require_admin
+def retry_failed_task(task_id):
+    """Remettre en file une tâche en échec (tentatives remises à zéro)"""
+    try:
+        try:
+            task_id_obj = ObjectId(task_id)
+        except Exception:
+            return jsonify({'error': 'ID de tâche invalide'}), 400
+        if not job_queue.retry_dead(task_id_obj, get_db()):
+            return jsonify({'error': 'Tâche en échec non trouvée'}), 404
+        return jsonify({'id': task_id, 'statut': 'en_attente'}), 200
+    except Exception as e:
+        print(f"Error in retry_failed_task: {str(e)}")
+        return jsonify({'error': str(e)}), 500
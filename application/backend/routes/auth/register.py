@@ -60,6 +60,7 @@ def register():
         payload = {
             'user_id': str(user['_id']),
             'email': user['email'],
+            'role': user.get('role', 'utilisateur'),
             'exp': datetime.utcnow() + timedelta(seconds=JWT_EXPIRATION_DELTA)
         }
         
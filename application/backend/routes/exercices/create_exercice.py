@@ -3,6 +3,7 @@ from datetime import datetime
 from config.database import get_db
 from routes.exercices import exercices_bp
 from utils.auth_middleware import require_admin, get_current_user
+from utils.versions import bump_version
 
 @exercices_bp.route('', methods=['POST'])
 @require_admin
@@ -64,6 +65,7 @@ def create_exercice():
             result = db.exercices.insert_one(exercice_data)
             exercice_id = result.inserted_id
             print(f"Exercice created successfully with ID: {exercice_id}")
+            bump_version('exercices')
             
             # Retourner les informations de l'exercice créé
             created_exercice = {
@@ -2,38 +2,42 @@ from flask import request, jsonify
 from config.database import get_db
 from routes.exercices import exercices_bp
 from bson import ObjectId
+from utils.cache import cached_route
+from utils.versions import conditional_get
+from utils.snapshots import register_snapshot
+
+def _load_exercices(db):
+    """Catalogue complet des exercices, tel que renvoyé par GET /exercices"""
+    exercices_list = []
+    for exercice in db.exercices.find({}):
+        exercices_list.append({
+            'id': str(exercice['_id']),
+            'nom': exercice.get('nom', ''),
+            'description': exercice.get('description', ''),
+            'duree_inspiration': exercice.get('duree_inspiration', 0),
+            'duree_apnee': exercice.get('duree_apnee', 0),
+            'duree_expiration': exercice.get('duree_expiration', 0),
+            'cree_par_admin': exercice.get('nom_admin', 'Système'),
+            'date_creation': exercice.get('date_creation')
+        })
+    return exercices_list
+
+exercices_snapshot = register_snapshot('exercices', _load_exercices)
 
 @exercices_bp.route('', methods=['GET'])
+@conditional_get('exercices')
 def get_exercices():
-    print("Received GET /exercices request")
     try:
-        db = get_db()
-        
-        # Récupérer tous les exercices
-        exercices_cursor = db.exercices.find({})
-        exercices_list = []
-        
-        for exercice in exercices_cursor:
-            exercice_data = {
-                'id': str(exercice['_id']),
-                'nom': exercice.get('nom', ''),
-                'description': exercice.get('description', ''),
-                'duree_inspiration': exercice.get('duree_inspiration', 0),
-                'duree_apnee': exercice.get('duree_apnee', 0),
-                'duree_expiration': exercice.get('duree_expiration', 0),
-                'cree_par_admin': exercice.get('nom_admin', 'Système'),
-                'date_creation': exercice.get('date_creation')
-            }
-            exercices_list.append(exercice_data)
-        
-        print(f"Found {len(exercices_list)} exercices")
-        return jsonify(exercices_list), 200
+        # Octets pré-sérialisés, reconstruits seulement si la version change
+        return exercices_snapshot.response(), 200
         
     except Exception as e:
         print(f"Error in get_exercices: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @exercices_bp.route('/<exercice_id>', methods=['GET'])
+@conditional_get('exercices')
+@cached_route(ttl=300, tags=('exercices',))
 def get_exercice_by_id(exercice_id):
     print(f"Received GET /exercices/{exercice_id} request")
     try:
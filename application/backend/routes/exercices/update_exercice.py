@@ -1,9 +1,10 @@
 from flask import request, jsonify
 from datetime import datetime
 from bson import ObjectId
-from config.database import get_db
 from routes.exercices import exercices_bp
 from utils.auth_middleware import require_admin, get_current_user
+from utils.versions import bump_version
+from utils.identity_map import identity_map
 
 @exercices_bp.route('/<exercice_id>', methods=['PUT'])
 @require_admin
@@ -21,9 +22,10 @@ def update_exercice(exercice_id):
             print(f"Invalid exercice ID: {exercice_id}")
             return jsonify({'error': 'ID d\'exercice invalide'}), 400
         
-        # Vérifier que l'exercice existe
-        db = get_db()
-        exercice = db.exercices.find_one({'_id': exercice_id_obj})
+        # Vérifier que l'exercice existe (les lectures suivantes de la
+        # requête sont servies par l'identity map)
+        documents = identity_map()
+        exercice = documents.get('exercices', exercice_id_obj)
         if not exercice:
             print(f"Exercice {exercice_id} not found")
             return jsonify({'error': 'Exercice non trouvé'}), 404
@@ -42,7 +44,7 @@ def update_exercice(exercice_id):
         # Nom (optionnel)
         if 'nom' in data and data['nom']:
             # Vérifier si un autre exercice avec ce nom existe déjà
-            existing_exercice = db.exercices.find_one({
+            existing_exercice = documents.find_one('exercices', {
                 'nom': data['nom'],
                 '_id': {'$ne': exercice_id_obj}
             })
@@ -93,8 +95,9 @@ def update_exercice(exercice_id):
         
         # Mettre à jour l'exercice
         try:
-            result = db.exercices.update_one(
-                {'_id': exercice_id_obj},
+            result = documents.update_one(
+                'exercices',
+                exercice_id_obj,
                 {'$set': update_fields}
             )
             
@@ -102,9 +105,10 @@ def update_exercice(exercice_id):
                 return jsonify({'error': 'Aucune modification effectuée'}), 400
             
             print(f"Exercice updated successfully: {exercice_id}")
+            bump_version('exercices')
             
-            # Récupérer l'exercice mis à jour
-            updated_exercice = db.exercices.find_one({'_id': exercice_id_obj})
+            # Récupérer l'exercice mis à jour (déjà à jour en mémoire)
+            updated_exercice = documents.get('exercices', exercice_id_obj)
             
             # Retourner les informations de l'exercice mis à jour
             exercice_data = {
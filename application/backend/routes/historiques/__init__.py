@@ -2,4 +2,4 @@ from flask import Blueprint
 
 historiques_bp = Blueprint('historiques', __name__)
 
-from . import get_historiques, create_historique 
\ No newline at end of file
+from . import get_historiques, create_historique, get_historiques_stats, bulk_historiques
\ No newline at end of file
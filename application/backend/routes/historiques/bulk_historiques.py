@@ -0,0 +1,274 @@
+from flask import request, jsonify, current_app
+from datetime import datetime, timezone
+from collections import defaultdict
+import gzip
+import os
+import zlib
+import jwt
+from bson import ObjectId
+from werkzeug.exceptions import RequestEntityTooLarge
+from pymongo.errors import BulkWriteError, OperationFailure
+from config.database import get_db
+from config.config import SECRET_KEY
+from routes.historiques import historiques_bp
+from utils.activity import record_activity, cycle_seconds, utc_day
+from utils.history_store import historiques
+from utils.loaders import exercice_catalog
+from utils.auth_middleware import is_active_account
+
+# Limites d'un import (lignes et octets après décompression)
+BULK_MAX_LINES = int(os.getenv('BULK_MAX_LINES', '10000'))
+BULK_MAX_BYTES = int(os.getenv('BULK_MAX_BYTES', str(10 * 1024 * 1024)))
+BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', '500'))
+MAX_CLIENT_ID_LENGTH = 128
+
+# Collections dont l'index (utilisateur, id_client) a déjà été créé par ce worker
+_indexed_collections = set()
+
+class PayloadTooLarge(Exception):
+    pass
+
+def _user_id_from_token():
+    """ID utilisateur du token (cookie, sinon en-tête Bearer), comme POST /historiques"""
+    token = request.cookies.get('access_token')
+    if not token:
+        auth_header = request.headers.get('Authorization')
+        if auth_header and auth_header.startswith('Bearer '):
+            token = auth_header.split(' ')[1]
+    if not token:
+        return None
+    return jwt.decode(token, SECRET_KEY, algorithms=['HS256'])['user_id']
+
+def _lines():
+    """Lignes NDJSON du corps (gzip accepté), bornées en nombre et en taille"""
+    stream = request.stream
+    if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    total = 0
+    count = 0
+    while True:
+        # Lecture bornée : une ligne sans fin (ou une bombe gzip) n'est pas
+        # décompressée au-delà de la limite restante
+        raw = stream.readline(BULK_MAX_BYTES - total + 1)
+        if not raw:
+            return
+        total += len(raw)
+        if total > BULK_MAX_BYTES:
+            raise PayloadTooLarge(f'Import limité à {BULK_MAX_BYTES} octets')
+        line = raw.strip()
+        if not line:
+            continue
+        count += 1
+        if count > BULK_MAX_LINES:
+            raise PayloadTooLarge(f'Import limité à {BULK_MAX_LINES} lignes')
+        yield count, line
+
+def _parse_date(value):
+    if not value:
+        return datetime.utcnow()
+    moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+def _validate(line, user_id):
+    """Ligne NDJSON -> (document, None) ou (None, message d'erreur)"""
+    try:
+        data = current_app.json.loads(line)
+    except ValueError:
+        return None, 'JSON invalide'
+    if not isinstance(data, dict):
+        return None, 'Objet JSON attendu'
+
+    id_client = data.get('id_client')
+    if not isinstance(id_client, str) or not id_client or len(id_client) > MAX_CLIENT_ID_LENGTH:
+        return None, 'id_client obligatoire (chaîne de 128 caractères au plus)'
+
+    # Validation contre le catalogue d'exercices en mémoire (aucune requête par ligne)
+    exercice = exercice_catalog.get(data.get('id_exercice'))
+    if exercice is None:
+        return None, 'Exercice non trouvé'
+
+    try:
+        date_execution = _parse_date(data.get('date_execution'))
+    except ValueError:
+        return None, 'Format de date invalide'
+
+    try:
+        nombre_cycles = int(data.get('nombre_cycles') or 1)
+        if nombre_cycles < 1:
+            raise ValueError
+    except (TypeError, ValueError):
+        return None, 'Le nombre de cycles doit être un entier positif'
+
+    return {
+        '_id': ObjectId(),
+        'date_execution': date_execution,
+        'id_utilisateur': user_id,
+        'id_exercice': exercice['_id'],
+        'nombre_cycles': nombre_cycles,
+        'id_client': id_client,
+        # Retiré avant insertion : sert aux agrégats d'activité
+        '_secondes': nombre_cycles * cycle_seconds(exercice)
+    }, None
+
+def _ensure_client_index(collection):
+    """Unicité (utilisateur, id_client) ; simple index sur une time-series"""
+    if collection.name in _indexed_collections:
+        return
+    keys = [('id_utilisateur', 1), ('id_client', 1)]
+    try:
+        collection.create_index(keys, unique=True, name='historique_id_client',
+                                partialFilterExpression={'id_client': {'$exists': True}})
+    except OperationFailure:
+        # Les time-series n'acceptent pas les index uniques : la vérification
+        # préalable reste la seule protection contre les doublons
+        collection.create_index(keys, name='historique_id_client_ts')
+    _indexed_collections.add(collection.name)
+
+def _insert_batch(collection, user_id, batch, results):
+    """Insérer un lot ; retourne les documents effectivement insérés"""
+    # Doublons déjà en base (envoi précédent interrompu, rejeu)
+    existing = {doc['id_client'] for doc in collection.find(
+        {'id_utilisateur': user_id, 'id_client': {'$in': [doc['id_client'] for _, doc in batch]}},
+        {'id_client': 1})}
+    pending = []
+    for number, document in batch:
+        if document['id_client'] in existing:
+            results[number] = {'statut': 'doublon', 'id_client': document['id_client']}
+        else:
+            pending.append((number, document))
+    if not pending:
+        return []
+
+    documents = [{key: value for key, value in document.items() if key != '_secondes'}
+                 for _, document in pending]
+    failed = {}
+    try:
+        collection.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get('writeErrors', []):
+            failed[error['index']] = 'doublon' if error.get('code') == 11000 else error.get('errmsg')
+
+    inserted = []
+    for index, (number, document) in enumerate(pending):
+        result = {'id_client': document['id_client']}
+        if index not in failed:
+            result.update(statut='insere', id=str(document['_id']))
+            inserted.append(document)
+        elif failed[index] == 'doublon':
+            result['statut'] = 'doublon'
+        else:
+            result.update(statut='erreur', erreur=failed[index])
+        results[number] = result
+    return inserted
+
+def _record_rollups(db, user_id, documents):
+    """Un upsert d'agrégat par jour touché (et non par ligne), dans l'ordre chronologique"""
+    days = defaultdict(lambda: [0, 0])
+    for document in documents:
+        day = utc_day(document['date_execution'])
+        days[day][0] += 1
+        days[day][1] += document['_secondes']
+    for day in sorted(days):
+        exercices, secondes = days[day]
+        record_activity(db, user_id, day, secondes, exercices=exercices)
+
+@historiques_bp.route('/bulk', methods=['POST'])
+def bulk_historiques():
+    """
+    Import groupé d'historiques enregistrés hors ligne
+
+    Corps : NDJSON (une ligne {"id_client", "id_exercice", "date_execution",
+    "nombre_cycles"} par exercice), éventuellement compressé
+    (Content-Encoding: gzip). Les lignes dont l'id_client a déjà été importé
+    sont ignorées ; la réponse donne le statut de chaque ligne.
+    """
+    print("Received POST /historiques/bulk request")
+    try:
+        try:
+            user_id = _user_id_from_token()
+        except jwt.ExpiredSignatureError:
+            return jsonify({'error': 'Token expiré'}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({'error': 'Token invalide'}), 401
+        if not user_id:
+            return jsonify({'error': 'Non authentifié'}), 401
+
+        db = get_db()
+        try:
+            user_id_obj = ObjectId(user_id)
+        except Exception:
+            return jsonify({'error': 'ID utilisateur invalide'}), 400
+        # Une seule vérification de l'utilisateur pour tout l'import
+        user = db.utilisateurs.find_one({'_id': user_id_obj},
+                                        {'est_actif': 1, 'suppression_demandee_le': 1})
+        if not user:
+            return jsonify({'error': 'Utilisateur non trouvé'}), 404
+        # Compte désactivé ou en cours de suppression : plus d'écriture
+        if not is_active_account(user):
+            return jsonify({'error': 'Compte inactif ou en cours de suppression'}), 403
+
+        collection = historiques(db)
+        _ensure_client_index(collection)
+
+        results = {}
+        inserted = []
+        batch = []
+        seen = set()
+        total = 0
+        failure = None
+        try:
+            for number, line in _lines():
+                total = number
+                document, error = _validate(line, user_id_obj)
+                if error:
+                    results[number] = {'statut': 'invalide', 'erreur': error}
+                    continue
+                # Doublons à l'intérieur du même import
+                if document['id_client'] in seen:
+                    results[number] = {'statut': 'doublon', 'id_client': document['id_client']}
+                    continue
+                seen.add(document['id_client'])
+                batch.append((number, document))
+                if len(batch) >= BULK_BATCH_SIZE:
+                    inserted.extend(_insert_batch(collection, user_id_obj, batch, results))
+                    batch = []
+            if batch:
+                inserted.extend(_insert_batch(collection, user_id_obj, batch, results))
+        except PayloadTooLarge as e:
+            failure = ({'error': str(e)}, 413)
+        except RequestEntityTooLarge:
+            # Corps compressé au-delà de MAX_CONTENT_LENGTH (main.py)
+            failure = ({'error': 'Corps de requête trop volumineux'}, 413)
+        except (OSError, EOFError, zlib.error):
+            failure = ({'error': 'Corps gzip invalide'}, 400)
+
+        # Agrégats quotidiens et série, y compris pour les lots déjà insérés
+        # avant une erreur (le client renvoie tout : les id_client dédoublonnent)
+        try:
+            _record_rollups(db, user_id_obj, inserted)
+        except Exception as e:
+            print(f"Error updating activity rollups: {str(e)}")
+        if failure:
+            body, status = failure
+            body['inseres'] = len(inserted)
+            return jsonify(body), status
+
+        lines = [dict(results[number], ligne=number) for number in sorted(results)]
+        summary = defaultdict(int)
+        for result in lines:
+            summary[result['statut']] += 1
+        print(f"Bulk import: {total} lines, {dict(summary)}")
+        return jsonify({
+            'total': total,
+            'inseres': summary['insere'],
+            'doublons': summary['doublon'],
+            'invalides': summary['invalide'],
+            'erreurs': summary['erreur'],
+            'lignes': lines
+        }), 200
+
+    except Exception as e:
+        print(f"Error in bulk_historiques: {str(e)}")
+        return jsonify({'error': str(e)}), 500
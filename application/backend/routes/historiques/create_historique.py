@@ -4,6 +4,9 @@ import jwt
 from config.database import get_db
 from config.config import SECRET_KEY
 from routes.historiques import historiques_bp
+from utils.activity import record_activity, cycle_seconds
+from utils.history_store import historiques
+from utils.auth_middleware import is_active_account
 from bson import ObjectId
 
 @historiques_bp.route('', methods=['POST'])
@@ -69,6 +72,9 @@ def create_historique():
         except Exception as e:
             print(f"Invalid user ID: {user_id}")
             return jsonify({'error': 'ID utilisateur invalide'}), 400
+        # Compte désactivé ou en cours de suppression : plus d'écriture
+        if not is_active_account(user):
+            return jsonify({'error': 'Compte inactif ou en cours de suppression'}), 403
         
         # Préparer les données de l'historique
         historique_data = {
@@ -86,18 +92,37 @@ def create_historique():
                 print("Invalid date format")
                 return jsonify({'error': 'Format de date invalide'}), 400
         
+        # Nombre de cycles effectués (1 par défaut) : sert au calcul du temps de pratique
+        try:
+            nombre_cycles = int(data.get('nombre_cycles') or 1)
+            if nombre_cycles < 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Le nombre de cycles doit être un entier positif'}), 400
+        historique_data['nombre_cycles'] = nombre_cycles
+        duree_secondes = nombre_cycles * cycle_seconds(exercice)
+        
         # Insérer l'historique dans la base de données
         try:
-            result = db.historiques_exercices.insert_one(historique_data)
+            result = historiques(db).insert_one(historique_data)
             historique_id = result.inserted_id
             print(f"Historique created successfully with ID: {historique_id}")
             
+            # Agrégats quotidiens et série : un échec n'annule pas l'enregistrement
+            # (jobs/activity.py permet de les reconstruire)
+            try:
+                record_activity(db, user_id_obj, historique_data['date_execution'], duree_secondes)
+            except Exception as e:
+                print(f"Error updating activity rollups: {str(e)}")
+            
             # Retourner les informations de l'historique créé
             created_historique = {
                 'id': str(historique_id),
                 'date_execution': historique_data['date_execution'].isoformat(),
                 'id_utilisateur': str(historique_data['id_utilisateur']),
                 'id_exercice': str(historique_data['id_exercice']),
+                'nombre_cycles': nombre_cycles,
+                'duree_secondes': duree_secondes,
                 'exercice': {
                     'nom': exercice.get('nom', ''),
                     'duree_inspiration': exercice.get('duree_inspiration', 0),
@@ -1,10 +1,64 @@
 from flask import request, jsonify
+from datetime import datetime, timezone
 import jwt
 from config.database import get_db
 from config.config import SECRET_KEY
 from routes.historiques import historiques_bp
+from utils.history_store import historiques
+from utils.archive import archive_horizon, read_archived
 from bson import ObjectId
 
+EXERCICE_FIELDS = ('nom', 'duree_inspiration', 'duree_apnee', 'duree_expiration')
+
+def _first_joined(field, shape):
+    """Premier document d'un $lookup mis en forme, ou null si la jointure est vide"""
+    return {
+        '$let': {
+            'vars': {'doc': {'$arrayElemAt': [field, 0]}},
+            'in': {'$cond': [{'$ifNull': ['$$doc', False]}, shape, None]}
+        }
+    }
+
+def _date_arg(name):
+    """Paramètre de date ISO 8601 -> datetime UTC naïf (comme stocké par pymongo)"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+def _shape_archived(db, rows):
+    """Lignes archivées mises dans la forme de la réponse (mêmes jointures que le pipeline)"""
+    exercices = {doc['_id']: doc for doc in db.exercices.find(
+        {'_id': {'$in': list({row.get('id_exercice') for row in rows})}},
+        {field: 1 for field in EXERCICE_FIELDS})}
+    utilisateurs = {doc['_id']: doc for doc in db.utilisateurs.find(
+        {'_id': {'$in': list({row.get('id_utilisateur') for row in rows})}},
+        {'nom': 1, 'prenom': 1})}
+    shaped = []
+    for row in rows:
+        exercice = exercices.get(row.get('id_exercice'))
+        utilisateur = utilisateurs.get(row.get('id_utilisateur'))
+        shaped.append({
+            'id': row['_id'],
+            'date_execution': row.get('date_execution'),
+            'exercice': {
+                'id': exercice['_id'],
+                'nom': exercice.get('nom', ''),
+                'duree_inspiration': exercice.get('duree_inspiration', 0),
+                'duree_apnee': exercice.get('duree_apnee', 0),
+                'duree_expiration': exercice.get('duree_expiration', 0)
+            } if exercice else None,
+            'utilisateur': {
+                'id': utilisateur['_id'],
+                'nom': utilisateur.get('nom', ''),
+                'prenom': utilisateur.get('prenom', '')
+            } if utilisateur else None
+        })
+    return shaped
+
 @historiques_bp.route('', methods=['GET'])
 def get_historiques():
     print("Received GET /historiques request")
@@ -25,6 +79,7 @@ def get_historiques():
         
         # Si un utilisateur est connecté, filtrer par son ID
         query = {}
+        user_id_obj = None
         if user_id:
             try:
                 user_id_obj = ObjectId(user_id)
@@ -32,9 +87,25 @@ def get_historiques():
             except Exception:
                 pass
         
-        # Récupérer les historiques avec jointure sur exercices et utilisateurs
+        # Période optionnelle (?depuis=...&jusqu_a=..., ISO 8601)
+        try:
+            depuis = _date_arg('depuis')
+            jusqu_a = _date_arg('jusqu_a')
+        except ValueError:
+            return jsonify({'error': 'Format de date invalide'}), 400
+        if depuis or jusqu_a:
+            query['date_execution'] = {}
+            if depuis:
+                query['date_execution']['$gte'] = depuis
+            if jusqu_a:
+                query['date_execution']['$lte'] = jusqu_a
+        
+        # Récupérer les historiques avec jointure sur exercices et utilisateurs,
+        # projetés directement dans la forme de la réponse (ObjectId et dates
+        # sont sérialisés par le provider JSON)
         pipeline = [
             {'$match': query},
+            {'$sort': {'date_execution': -1}},  # Trier par date descendante
             {
                 '$lookup': {
                     'from': 'exercices',
@@ -51,33 +122,43 @@ def get_historiques():
                     'as': 'utilisateur'
                 }
             },
-            {'$sort': {'date_execution': -1}}  # Trier par date descendante
+            {
+                '$project': {
+                    '_id': 0,
+                    'id': '$_id',
+                    'date_execution': {'$ifNull': ['$date_execution', None]},
+                    'exercice': _first_joined('$exercice', {
+                        'id': '$$doc._id',
+                        'nom': {'$ifNull': ['$$doc.nom', '']},
+                        'duree_inspiration': {'$ifNull': ['$$doc.duree_inspiration', 0]},
+                        'duree_apnee': {'$ifNull': ['$$doc.duree_apnee', 0]},
+                        'duree_expiration': {'$ifNull': ['$$doc.duree_expiration', 0]}
+                    }),
+                    'utilisateur': _first_joined('$utilisateur', {
+                        'id': '$$doc._id',
+                        'nom': {'$ifNull': ['$$doc.nom', '']},
+                        'prenom': {'$ifNull': ['$$doc.prenom', '']}
+                    })
+                }
+            }
         ]
         
-        historiques_cursor = db.historiques_exercices.aggregate(pipeline)
-        historiques_list = []
+        historiques_list = list(historiques(db).aggregate(pipeline))
         
-        for historique in historiques_cursor:
-            exercice = historique.get('exercice', [{}])[0] if historique.get('exercice') else {}
-            utilisateur = historique.get('utilisateur', [{}])[0] if historique.get('utilisateur') else {}
-            
-            historique_data = {
-                'id': str(historique['_id']),
-                'date_execution': historique.get('date_execution').isoformat() if historique.get('date_execution') else None,
-                'exercice': {
-                    'id': str(exercice['_id']) if exercice.get('_id') else None,
-                    'nom': exercice.get('nom', ''),
-                    'duree_inspiration': exercice.get('duree_inspiration', 0),
-                    'duree_apnee': exercice.get('duree_apnee', 0),
-                    'duree_expiration': exercice.get('duree_expiration', 0)
-                } if exercice else None,
-                'utilisateur': {
-                    'id': str(utilisateur['_id']) if utilisateur.get('_id') else None,
-                    'nom': utilisateur.get('nom', ''),
-                    'prenom': utilisateur.get('prenom', '')
-                } if utilisateur else None
-            }
-            historiques_list.append(historique_data)
+        # Seule une période explicite qui remonte avant l'horizon d'archivage
+        # lit les archives (bornées, voir utils/archive.py) ; sans `depuis`,
+        # seule la collection active est lue
+        horizon = archive_horizon(db) if depuis is not None else None
+        if horizon and depuis < horizon:
+            # Lignes en cours d'archivage présentes des deux côtés : dédoublonnées par _id
+            seen = {historique['id'] for historique in historiques_list}
+            archived = [row for row in read_archived(db, user_id_obj, depuis, jusqu_a)
+                        if row['_id'] not in seen]
+            if archived:
+                print(f"Read {len(archived)} archived historiques")
+                historiques_list.extend(_shape_archived(db, archived))
+                historiques_list.sort(key=lambda historique: historique['date_execution'] or datetime.min,
+                                      reverse=True)
         
         print(f"Found {len(historiques_list)} historiques")
         return jsonify(historiques_list), 200
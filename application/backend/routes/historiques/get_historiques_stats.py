@@ -0,0 +1,29 @@
+from flask import request, jsonify
+from config.database import get_db
+from routes.historiques import historiques_bp
+from utils.auth_middleware import require_auth, get_current_user
+from utils.activity import user_stats
+
+MAX_JOURS = 366
+
+@historiques_bp.route('/stats', methods=['GET'])
+@require_auth
+def get_historiques_stats():
+    print("Received GET /historiques/stats request")
+    try:
+        current_user = get_current_user()
+
+        # Fenêtre du détail jour par jour (30 jours par défaut)
+        try:
+            jours = int(request.args.get('jours', 30))
+        except ValueError:
+            return jsonify({'error': 'Le paramètre jours doit être un entier'}), 400
+        jours = max(1, min(jours, MAX_JOURS))
+
+        # Lecture des seuls agrégats : coût indépendant de la taille de l'historique
+        stats = user_stats(get_db(), current_user['_id'], jours)
+        return jsonify(stats), 200
+
+    except Exception as e:
+        print(f"Error in get_historiques_stats: {str(e)}")
+        return jsonify({'error': str(e)}), 500
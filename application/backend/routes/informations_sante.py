@@ -3,38 +3,41 @@ from config.database import get_db
 from bson import ObjectId
 from datetime import datetime
 from utils.auth_middleware import require_admin
+from utils.versions import conditional_get, bump_version
+from utils.snapshots import register_snapshot
 
 informations_sante_bp = Blueprint('informations_sante', __name__)
 
+def _as_contenu(document):
+    """Document contenus -> forme de la réponse (_id exposé sous "id" ;
+    ObjectId et dates sont sérialisés par le provider JSON)"""
+    document['id'] = document.pop('_id')
+    return document
+
+def _load_contenus(db):
+    """Tous les contenus de santé triés par date de création"""
+    return list(db.contenus.aggregate([
+        {'$sort': {'date_creation': 1}},
+        {'$addFields': {'id': '$_id'}},
+        {'$project': {'_id': 0}}
+    ]))
+
+contenus_snapshot = register_snapshot('contenus', _load_contenus)
+
 @informations_sante_bp.route('/', methods=['GET'])
+@conditional_get('contenus')
 def get_informations_sante():
     """Récupérer tous les contenus de santé"""
     try:
-        db = get_db()
-        if db is None:
-            return jsonify({'error': 'Connexion à la base de données échouée'}), 500
-
-        # Récupérer tous les contenus triés par date de création
-        contenus = list(db.contenus.find({}).sort('date_creation', 1))
-        
-        # Convertir les ObjectId en string pour la sérialisation JSON
-        for contenu in contenus:
-            contenu['id'] = str(contenu['_id'])
-            del contenu['_id']
-            
-            # Formater les dates pour l'affichage
-            if 'date_creation' in contenu and contenu['date_creation']:
-                contenu['date_creation'] = contenu['date_creation'].isoformat()
-            if 'date_mise_a_jour' in contenu and contenu['date_mise_a_jour']:
-                contenu['date_mise_a_jour'] = contenu['date_mise_a_jour'].isoformat()
-
-        return jsonify(contenus), 200
+        # Octets pré-sérialisés, reconstruits seulement si la version change
+        return contenus_snapshot.response(), 200
 
     except Exception as e:
         print(f"Erreur lors de la récupération des contenus: {e}")
         return jsonify({'error': 'Erreur lors de la récupération des contenus'}), 500
 
 @informations_sante_bp.route('/<string:contenu_id>', methods=['GET'])
+@conditional_get('contenus')
 def get_contenu_by_id(contenu_id):
     """Récupérer un contenu spécifique par son ID"""
     try:
@@ -54,17 +57,7 @@ def get_contenu_by_id(contenu_id):
         if not contenu:
             return jsonify({'error': 'Contenu non trouvé'}), 404
 
-        # Convertir l'ObjectId en string
-        contenu['id'] = str(contenu['_id'])
-        del contenu['_id']
-        
-        # Formater les dates
-        if 'date_creation' in contenu and contenu['date_creation']:
-            contenu['date_creation'] = contenu['date_creation'].isoformat()
-        if 'date_mise_a_jour' in contenu and contenu['date_mise_a_jour']:
-            contenu['date_mise_a_jour'] = contenu['date_mise_a_jour'].isoformat()
-
-        return jsonify(contenu), 200
+        return jsonify(_as_contenu(contenu)), 200
 
     except Exception as e:
         print(f"Erreur lors de la récupération du contenu: {e}")
@@ -95,12 +88,10 @@ def create_contenu():
         }
 
         result = db.contenus.insert_one(nouveau_contenu)
+        bump_version('contenus')
         
         # Retourner le contenu créé
-        nouveau_contenu['id'] = str(result.inserted_id)
-        del nouveau_contenu['_id']
-        nouveau_contenu['date_creation'] = nouveau_contenu['date_creation'].isoformat()
-        nouveau_contenu['date_mise_a_jour'] = nouveau_contenu['date_mise_a_jour'].isoformat()
+        _as_contenu(nouveau_contenu)
 
         print(f"Contenu créé par admin: {nouveau_contenu['titre']}")
         return jsonify(nouveau_contenu), 201
@@ -147,17 +138,12 @@ def update_contenu(contenu_id):
 
         if result.matched_count == 0:
             return jsonify({'error': 'Contenu non trouvé'}), 404
+        bump_version('contenus')
 
         # Récupérer le contenu mis à jour
         contenu_modifie = db.contenus.find_one({'_id': object_id})
         if contenu_modifie:
-            contenu_modifie['id'] = str(contenu_modifie['_id'])
-            del contenu_modifie['_id']
-            
-            if 'date_creation' in contenu_modifie and contenu_modifie['date_creation']:
-                contenu_modifie['date_creation'] = contenu_modifie['date_creation'].isoformat()
-            if 'date_mise_a_jour' in contenu_modifie and contenu_modifie['date_mise_a_jour']:
-                contenu_modifie['date_mise_a_jour'] = contenu_modifie['date_mise_a_jour'].isoformat()
+            _as_contenu(contenu_modifie)
 
         print(f"Contenu modifié par admin: {contenu_modifie.get('titre', 'N/A')}")
         return jsonify(contenu_modifie), 200
@@ -192,6 +178,7 @@ def delete_contenu(contenu_id):
 
         if result.deleted_count == 0:
             return jsonify({'error': 'Erreur lors de la suppression'}), 500
+        bump_version('contenus')
 
         print(f"Contenu supprimé par admin: {contenu_existant.get('titre', 'N/A')}")
         return jsonify({'message': 'Contenu supprimé avec succès'}), 200
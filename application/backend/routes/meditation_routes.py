@@ -1,10 +1,64 @@
 from flask import Blueprint, request, jsonify
 from models.meditation import Meditation
 from utils.auth import token_required
+from utils.versions import bump_version
+from utils.identity_map import identity_map
+from utils.search import search_index
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime
+import time
 
 meditation_routes = Blueprint('meditations', __name__)
 
+# Index unique des évaluations, créé une fois par processus ; en cas d'échec
+# (doublons à dédupliquer par jobs.ratings), nouvel essai après ce délai
+RATING_INDEX_RETRY_SECONDS = 600
+_rating_index_ready = False
+_rating_index_failed_at = None
+
+def _ensure_rating_index(collection):
+    """
+    Index unique (meditation_id, user_id) dont dépend l'upsert de rate_meditation
+
+    Sans l'index (doublons existants), l'évaluation est tout de même
+    enregistrée : la réparation se fait par python -m jobs.ratings.
+    """
+    global _rating_index_ready, _rating_index_failed_at
+    if _rating_index_ready:
+        return
+    if _rating_index_failed_at is not None and \
+            time.monotonic() - _rating_index_failed_at < RATING_INDEX_RETRY_SECONDS:
+        return
+    from jobs.ratings import ensure_rating_indexes
+    try:
+        ensure_rating_indexes(collection.database)
+    except Exception as e:
+        _rating_index_failed_at = time.monotonic()
+        print(f"Index unique des évaluations non créé (lancer python -m jobs.ratings): {e}")
+        return
+    _rating_index_ready = True
+
+def _upsert_evaluation(collection, user_id, meditation_id, note, now):
+    """Enregistrer l'évaluation ; retourne la précédente (None si nouvelle)"""
+    for attempt in range(2):
+        try:
+            return collection.find_one_and_update(
+                {"user_id": user_id, "meditation_id": meditation_id},
+                {
+                    "$set": {"note": note, "date_modification": now},
+                    "$setOnInsert": {"date_creation": now}
+                },
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            # Première évaluation concurrente : l'autre insertion a gagné,
+            # la nouvelle tentative met à jour son document
+            if attempt:
+                raise
+
 @meditation_routes.route('/', methods=['GET'])
 def get_meditations():
     """Récupère toutes les méditations avec filtres optionnels"""
@@ -120,6 +174,7 @@ def create_meditation(current_user):
         
         # Créer la méditation
         meditation = Meditation.create_meditation(data)
+        bump_version('meditations')
         
         meditation_dict = meditation.to_dict()
         meditation_dict['_id'] = str(meditation_dict['_id'])
@@ -180,25 +235,23 @@ def search_meditations():
         if not query:
             return jsonify({'message': 'Terme de recherche requis'}), 400
         
+        page = max(1, request.args.get('page', 1, type=int) or 1)
+        per_page = min(50, max(1, request.args.get('per_page', 20, type=int) or 20))
+        
+        # Index inversé en mémoire (accents, racinisation, classement BM25)
+        found = search_index.search(query, ['meditations'], page, per_page)
+        ids = [ObjectId(result['id']) for result in found['results']]
+        
         from config.database import db_instance
         collection = db_instance.get_collection('meditations')
+        by_id = {doc['_id']: doc for doc in collection.find({'_id': {'$in': ids}})}
         
-        # Recherche textuelle simple
-        search_results = collection.find({
-            "$and": [
-                {"is_active": True},
-                {
-                    "$or": [
-                        {"titre": {"$regex": query, "$options": "i"}},
-                        {"description": {"$regex": query, "$options": "i"}},
-                        {"tags": {"$regex": query, "$options": "i"}}
-                    ]
-                }
-            ]
-        }).sort("note_moyenne", -1)
-        
+        # Conserver l'ordre de pertinence
         meditations_data = []
-        for meditation_data in search_results:
+        for meditation_id in ids:
+            meditation_data = by_id.get(meditation_id)
+            if meditation_data is None:
+                continue
             meditation = Meditation.__new__(Meditation)
             meditation.__dict__.update(meditation_data)
             meditation_dict = meditation.to_dict()
@@ -207,7 +260,9 @@ def search_meditations():
         
         return jsonify({
             'meditations': meditations_data,
-            'total': len(meditations_data),
+            'total': found['total'],
+            'page': page,
+            'per_page': per_page,
             'query': query
         }), 200
         
@@ -232,16 +287,15 @@ def rate_meditation(current_user, meditation_id):
         if not isinstance(note, (int, float)) or not 1 <= note <= 5:
             return jsonify({'message': 'La note doit être entre 1 et 5'}), 400
         
-        # Vérifier que la méditation existe
-        meditation = Meditation.find_by_id(meditation_id)
+        # Vérifier que la méditation existe (documents servis par l'identity
+        # map pour le reste de la requête)
+        documents = identity_map()
+        meditation = documents.get('meditations', ObjectId(meditation_id))
         if not meditation:
             return jsonify({'message': 'Méditation non trouvée'}), 404
         
         # Vérifier que l'utilisateur a bien fait une session de cette méditation
-        from config.database import db_instance
-        sessions_collection = db_instance.get_collection('sessions')
-        
-        user_session = sessions_collection.find_one({
+        user_session = documents.find_one('sessions', {
             "user_id": current_user._id,
             "meditation_id": ObjectId(meditation_id),
             "statut": "completee"
@@ -250,49 +304,53 @@ def rate_meditation(current_user, meditation_id):
         if not user_session:
             return jsonify({'message': 'Vous devez avoir complété une session pour évaluer cette méditation'}), 400
         
-        # Compter le nombre d'évaluations existantes
+        from config.database import db_instance
         evaluations_collection = db_instance.get_collection('evaluations')
+        meditations_collection = db_instance.get_collection('meditations')
+        now = datetime.utcnow()
+        
+        # Enregistrer l'évaluation et récupérer l'éventuelle note précédente
+        # en une seule opération (index unique meditation_id/user_id, voir jobs/ratings.py)
+        _ensure_rating_index(evaluations_collection)
+        previous_evaluation = _upsert_evaluation(
+            evaluations_collection, current_user._id, ObjectId(meditation_id), note, now
+        )
+        documents.evict('evaluations')
         
-        # Vérifier si l'utilisateur a déjà évalué cette méditation
-        existing_evaluation = evaluations_collection.find_one({
-            "user_id": current_user._id,
-            "meditation_id": ObjectId(meditation_id)
-        })
-        
-        if existing_evaluation:
-            # Mettre à jour l'évaluation existante
-            evaluations_collection.update_one(
-                {"_id": existing_evaluation["_id"]},
-                {"$set": {"note": note, "date_modification": datetime.utcnow()}}
-            )
+        # Ajuster les agrégats de la méditation par le delta, en O(1)
+        if previous_evaluation:
+            delta_somme, delta_nombre = note - previous_evaluation.get("note", 0), 0
         else:
-            # Créer une nouvelle évaluation
-            from datetime import datetime
-            evaluations_collection.insert_one({
-                "user_id": current_user._id,
-                "meditation_id": ObjectId(meditation_id),
-                "note": note,
-                "date_creation": datetime.utcnow()
-            })
-        
-        # Recalculer la note moyenne
-        pipeline = [
-            {"$match": {"meditation_id": ObjectId(meditation_id)}},
-            {"$group": {"_id": None, "moyenne": {"$avg": "$note"}, "count": {"$sum": 1}}}
-        ]
-        
-        result = list(evaluations_collection.aggregate(pipeline))
-        if result:
-            nouvelle_moyenne = result[0]["moyenne"]
-            nombre_evaluations = result[0]["count"]
-            
-            # Mettre à jour la méditation
-            meditation.update_rating(nouvelle_moyenne, nombre_evaluations)
+            delta_somme, delta_nombre = note, 1
+        
+        # Pipeline de mise à jour : $inc de la somme et du nombre puis recalcul
+        # de la moyenne dans la même écriture atomique. Une méditation notée
+        # avant l'ajout de somme_notes repart de moyenne x nombre.
+        somme_actuelle = {"$ifNull": ["$somme_notes", {"$multiply": [
+            {"$ifNull": ["$note_moyenne", 0]}, {"$ifNull": ["$nombre_evaluations", 0]}
+        ]}]}
+        somme = {"$add": [somme_actuelle, delta_somme]}
+        nombre = {"$add": [{"$ifNull": ["$nombre_evaluations", 0]}, delta_nombre]}
+        updated_meditation = meditations_collection.find_one_and_update(
+            {"_id": ObjectId(meditation_id)},
+            [
+                {"$set": {"somme_notes": somme, "nombre_evaluations": nombre}},
+                {"$set": {"note_moyenne": {"$cond": [
+                    {"$gt": ["$nombre_evaluations", 0]},
+                    {"$divide": ["$somme_notes", "$nombre_evaluations"]},
+                    0
+                ]}}}
+            ],
+            projection={"note_moyenne": 1, "nombre_evaluations": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        updated_meditation = documents.merge('meditations', updated_meditation)
         
         return jsonify({
             'message': 'Évaluation enregistrée avec succès',
             'note': note,
-            'nouvelle_moyenne': meditation.note_moyenne
+            'nouvelle_moyenne': updated_meditation["note_moyenne"],
+            'nombre_evaluations': updated_meditation["nombre_evaluations"]
         }), 200
         
     except Exception as e:
@@ -0,0 +1,61 @@
+from flask import Blueprint, jsonify, request
+from utils.search import search_index
+from utils.trie import autocomplete_index
+
+search_bp = Blueprint('search', __name__)
+
+MAX_PER_PAGE = 50
+MAX_SUGGESTIONS = 10
+
+def _catalogs(available):
+    """?types=exercices,contenus -> (catalogues, inconnus)"""
+    catalogs = [name.strip() for name in request.args.get('types', '').split(',') if name.strip()]
+    return catalogs, [name for name in catalogs if name not in available]
+
+def _int_arg(name, default, minimum, maximum):
+    try:
+        value = int(request.args.get(name, default))
+    except ValueError:
+        value = default
+    return max(minimum, min(value, maximum))
+
+@search_bp.route('', methods=['GET'])
+def search():
+    """Recherche plein texte dans les méditations, exercices et contenus"""
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'Terme de recherche requis'}), 400
+
+        # Catalogues interrogés (tous par défaut)
+        catalogs, unknown = _catalogs(search_index.sources)
+        if unknown:
+            return jsonify({'error': f"Type(s) inconnu(s): {', '.join(unknown)}"}), 400
+
+        page = _int_arg('page', 1, 1, 10000)
+        per_page = _int_arg('per_page', 20, 1, MAX_PER_PAGE)
+
+        result = search_index.search(query, catalogs or None, page, per_page)
+        result['query'] = query
+        return jsonify(result), 200
+
+    except Exception as e:
+        print(f"Error in search: {str(e)}")
+        return jsonify({'error': 'Erreur lors de la recherche'}), 500
+
+@search_bp.route('/autocomplete', methods=['GET'])
+def autocomplete():
+    """Suggestions par préfixe sur les noms d'exercices et titres de contenus"""
+    try:
+        prefix = request.args.get('q', '')
+        catalogs, unknown = _catalogs(autocomplete_index.sources)
+        if unknown:
+            return jsonify({'error': f"Type(s) inconnu(s): {', '.join(unknown)}"}), 400
+        limit = _int_arg('limit', 8, 1, MAX_SUGGESTIONS)
+
+        suggestions = autocomplete_index.complete(prefix, catalogs or None, limit)
+        return jsonify({'query': prefix, 'suggestions': suggestions}), 200
+
+    except Exception as e:
+        print(f"Error in autocomplete: {str(e)}")
+        return jsonify({'error': 'Erreur lors de l\'autocomplétion'}), 500
@@ -3,6 +3,8 @@ from models.session import Session
 from models.meditation import Meditation
 from models.user import User
 from utils.auth import token_required
+from utils.counters import hot_counters
+from utils.loaders import meditation_summaries, summary
 from bson import ObjectId
 
 session_routes = Blueprint('sessions', __name__)
@@ -47,13 +49,10 @@ def start_session(current_user):
         if humeur_avant is not None:
             session.set_mood_before(humeur_avant)
         
-        # Incrémenter le compteur de sessions de la méditation
-        meditation.increment_session_count()
+        # Incrémenter le compteur de sessions de la méditation (écrit par lots)
+        hot_counters.incr('meditations', ObjectId(meditation_id), 'nombre_sessions')
         
         session_dict = session.to_dict()
-        session_dict['_id'] = str(session_dict['_id'])
-        session_dict['user_id'] = str(session_dict['user_id'])
-        session_dict['meditation_id'] = str(session_dict['meditation_id'])
         
         return jsonify({
             'message': 'Session démarrée avec succès',
@@ -116,9 +115,6 @@ def complete_session(current_user, session_id):
         session.complete_session(duree_reelle, note, commentaire, humeur_apres)
         
         session_dict = session.to_dict()
-        session_dict['_id'] = str(session_dict['_id'])
-        session_dict['user_id'] = str(session_dict['user_id'])
-        session_dict['meditation_id'] = str(session_dict['meditation_id'])
         
         return jsonify({
             'message': 'Session complétée avec succès',
@@ -163,9 +159,6 @@ def interrupt_session(current_user, session_id):
         session.interrupt_session(duree_reelle)
         
         session_dict = session.to_dict()
-        session_dict['_id'] = str(session_dict['_id'])
-        session_dict['user_id'] = str(session_dict['user_id'])
-        session_dict['meditation_id'] = str(session_dict['meditation_id'])
         
         return jsonify({
             'message': 'Session interrompue',
@@ -192,22 +185,17 @@ def get_session_history(current_user):
         # Récupérer les sessions
         sessions = Session.find_by_user(current_user._id, limit)
         
-        # Enrichir avec les informations de méditation
+        # Enrichir avec les informations de méditation (une seule requête $in)
+        sessions = list(sessions)
+        meditations = meditation_summaries.load_many(session.meditation_id for session in sessions)
         sessions_data = []
         for session in sessions:
             session_dict = session.to_dict()
-            session_dict['_id'] = str(session_dict['_id'])
-            session_dict['user_id'] = str(session_dict['user_id'])
-            session_dict['meditation_id'] = str(session_dict['meditation_id'])
             
-            # Récupérer les infos de la méditation
-            meditation = Meditation.find_by_id(str(session.meditation_id))
+            meditation = meditations.get(session.meditation_id)
             if meditation:
-                session_dict['meditation'] = {
-                    'titre': meditation.titre,
-                    'type_meditation': meditation.type_meditation,
-                    'niveau_difficulte': meditation.niveau_difficulte
-                }
+                session_dict['meditation'] = summary(
+                    meditation, ('titre', 'type_meditation', 'niveau_difficulte'))
             
             sessions_data.append(session_dict)
         
@@ -237,20 +225,14 @@ def get_session(current_user, session_id):
             return jsonify({'message': 'Accès non autorisé à cette session'}), 403
         
         session_dict = session.to_dict()
-        session_dict['_id'] = str(session_dict['_id'])
-        session_dict['user_id'] = str(session_dict['user_id'])
-        session_dict['meditation_id'] = str(session_dict['meditation_id'])
         
-        # Ajouter les informations de la méditation
-        meditation = Meditation.find_by_id(str(session.meditation_id))
+        # Ajouter les informations de la méditation (résumé en cache)
+        meditation = meditation_summaries.load(session.meditation_id)
         if meditation:
-            session_dict['meditation'] = {
-                'titre': meditation.titre,
-                'description': meditation.description,
-                'type_meditation': meditation.type_meditation,
-                'niveau_difficulte': meditation.niveau_difficulte,
-                'duree_minutes': meditation.duree_minutes
-            }
+            session_dict['meditation'] = summary(
+                meditation,
+                ('titre', 'description', 'type_meditation', 'niveau_difficulte', 'duree_minutes')
+            )
         
         return jsonify({
             'session': session_dict
@@ -284,19 +266,12 @@ def get_current_session(current_user):
         session.__dict__.update(current_session_data)
         
         session_dict = session.to_dict()
-        session_dict['_id'] = str(session_dict['_id'])
-        session_dict['user_id'] = str(session_dict['user_id'])
-        session_dict['meditation_id'] = str(session_dict['meditation_id'])
         
-        # Ajouter les informations de la méditation
-        meditation = Meditation.find_by_id(str(session.meditation_id))
+        # Ajouter les informations de la méditation (résumé en cache)
+        meditation = meditation_summaries.load(session.meditation_id)
         if meditation:
-            session_dict['meditation'] = {
-                'titre': meditation.titre,
-                'type_meditation': meditation.type_meditation,
-                'duree_minutes': meditation.duree_minutes,
-                'instructions': meditation.instructions
-            }
+            session_dict['meditation'] = summary(
+                meditation, ('titre', 'type_meditation', 'duree_minutes', 'instructions'))
         
         return jsonify({
             'current_session': session_dict
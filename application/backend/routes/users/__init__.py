@@ -2,4 +2,4 @@ from flask import Blueprint
 
 users_bp = Blueprint('users', __name__)
 
-from . import get_user_profile, create_user, get_all_users, delete_user, update_user_profile 
\ No newline at end of file
+from . import get_user_profile, create_user, get_all_users, delete_user, update_user_profile, export_user_data, bulk_users 
\ No newline at end of file
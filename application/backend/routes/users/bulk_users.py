@@ -0,0 +1,64 @@
+from flask import request, jsonify
+from bson import ObjectId
+from config.database import get_db
+from routes.users import users_bp
+from utils.auth_middleware import require_admin, get_current_user
+from utils.user_operations import (OperationError, OPERATIONS_COLLECTION, build_query,
+                                   preflight, start_operation)
+
+def _operation_data(operation):
+    data = {key: value for key, value in operation.items() if key != '_id'}
+    data['id'] = str(operation['_id'])
+    return data
+
+@users_bp.route('/bulk', methods=['POST'])
+@require_admin
+def bulk_users():
+    """
+    Désactiver, réactiver ou supprimer plusieurs comptes
+
+    Body : {"action": "deactivate"|"reactivate"|"delete", "ids": [...]}
+    ou {"action": ..., "filtre": {"role", "est_actif", "email_domaine",
+    "cree_apres", "cree_avant"}}. "dry_run": true renvoie seulement la
+    pré-vérification ; sinon 202 et l'id de suivi (GET /users/bulk/<id>).
+    """
+    print("Received POST /users/bulk request")
+    try:
+        admin_user = get_current_user()
+        data = request.get_json(silent=True) or {}
+        action = data.get('action')
+        db = get_db()
+        try:
+            query = build_query(data.get('ids'), data.get('filtre'), admin_user)
+            summary = preflight(db, action, query)
+        except OperationError as e:
+            return jsonify({'error': str(e)}), 400
+
+        print(f"Bulk {action} by {admin_user['email']}: {summary}")
+        if data.get('dry_run') or summary['a_traiter'] == 0:
+            return jsonify({'preverification': summary}), 200
+
+        operation = start_operation(db, action, summary, admin_user,
+                                    data.get('ids'), data.get('filtre'))
+        return jsonify(_operation_data(operation)), 202
+
+    except Exception as e:
+        print(f"Error in bulk_users: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@users_bp.route('/bulk/<operation_id>', methods=['GET'])
+@require_admin
+def get_bulk_operation(operation_id):
+    """Progression d'une opération groupée (traites / total)"""
+    try:
+        try:
+            operation_id_obj = ObjectId(operation_id)
+        except Exception:
+            return jsonify({'error': 'ID d\'opération invalide'}), 400
+        operation = get_db()[OPERATIONS_COLLECTION].find_one({'_id': operation_id_obj})
+        if not operation:
+            return jsonify({'error': 'Opération non trouvée'}), 404
+        return jsonify(_operation_data(operation)), 200
+    except Exception as e:
+        print(f"Error in get_bulk_operation: {str(e)}")
+        return jsonify({'error': str(e)}), 500
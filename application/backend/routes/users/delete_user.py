@@ -1,8 +1,15 @@
-from flask import jsonify
+from flask import request, jsonify
 from bson import ObjectId
 from config.database import get_db
 from routes.users import users_bp
-from utils.auth_middleware import require_admin, get_current_user
+from utils.auth_middleware import require_admin, get_current_user, invalidate_principals
+from jobs.user_deletion import DELETIONS_COLLECTION, request_deletion, start_deletion
+
+def _deletion_data(deletion):
+    data = {key: value for key, value in deletion.items()
+            if key not in ('_id', 'bail', 'bail_jusqu_a')}
+    data['id_utilisateur'] = str(deletion['_id'])
+    return data
 
 @users_bp.route('/<user_id>', methods=['DELETE'])
 @require_admin
@@ -35,31 +42,20 @@ def delete_user(user_id):
         if user.get('role') == 'admin' and admin_user.get('role') != 'super-admin':
             return jsonify({'error': 'Seul un super-administrateur peut supprimer un autre administrateur'}), 403
         
-        # Vérifier s'il y a des historiques associés à cet utilisateur
-        historiques_count = db.historiques.count_documents({'id_utilisateur': user_id_obj})
-        if historiques_count > 0:
-            print(f"User has {historiques_count} history records")
-            # On peut soit empêcher la suppression, soit supprimer en cascade
-            # Pour cette démo, on va empêcher la suppression
-            return jsonify({
-                'error': f'Impossible de supprimer cet utilisateur car il a {historiques_count} enregistrement(s) d\'historique associé(s)',
-                'historiques_count': historiques_count
-            }), 400
-        
-        # Supprimer l'utilisateur
+        # Marquer le compte (instantané) : ses données sont supprimées en
+        # arrière-plan par lots (jobs/user_deletion.py)
         try:
-            result = db.utilisateurs.delete_one({'_id': user_id_obj})
-            
-            if result.deleted_count == 0:
-                return jsonify({'error': 'Erreur lors de la suppression de l\'utilisateur'}), 500
-            
-            print(f"User deleted successfully: {user_id}")
+            deletion = request_deletion(db, user, admin_user['_id'])
+            invalidate_principals(user_id_obj)
+            start_deletion(db, user_id_obj)
+            print(f"User {user_id} marked for deletion")
             
             return jsonify({
-                'message': 'Utilisateur supprimé avec succès',
+                'message': 'Suppression de l\'utilisateur en cours',
                 'email': user.get('email'),
-                'nom': f"{user.get('prenom', '')} {user.get('nom', '')}"
-            }), 200
+                'nom': f"{user.get('prenom', '')} {user.get('nom', '')}",
+                'suivi': _deletion_data(deletion)
+            }), 202
             
         except Exception as e:
             print(f"Error deleting user: {str(e)}")
@@ -67,4 +63,34 @@ def delete_user(user_id):
     
     except Exception as e:
         print(f"Error in delete_user: {str(e)}")
-        return jsonify({'error': str(e)}), 500 
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500 
+
+@users_bp.route('/suppressions', methods=['GET'])
+@require_admin
+def get_user_deletions():
+    """Suppressions de comptes (en attente, en cours, terminées) et leur progression"""
+    try:
+        query = {}
+        if request.args.get('statut'):
+            query['statut'] = request.args['statut']
+        deletions = get_db()[DELETIONS_COLLECTION].find(query).sort('demandee_le', -1).limit(200)
+        return jsonify([_deletion_data(deletion) for deletion in deletions]), 200
+    except Exception as e:
+        print(f"Error in get_user_deletions: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@users_bp.route('/<user_id>/suppression', methods=['GET'])
+@require_admin
+def get_user_deletion(user_id):
+    try:
+        try:
+            user_id_obj = ObjectId(user_id)
+        except Exception:
+            return jsonify({'error': 'ID d\'utilisateur invalide'}), 400
+        deletion = get_db()[DELETIONS_COLLECTION].find_one({'_id': user_id_obj})
+        if not deletion:
+            return jsonify({'error': 'Aucune suppression pour cet utilisateur'}), 404
+        return jsonify(_deletion_data(deletion)), 200
+    except Exception as e:
+        print(f"Error in get_user_deletion: {str(e)}")
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,130 @@
+from flask import request, jsonify, Response, send_file
+import os
+import re
+from bson import ObjectId
+from config.database import get_db
+from routes.users import users_bp
+from utils.auth_middleware import require_auth, require_admin, get_current_user
+from utils.export import UserExport, start_export_job, EXPORTS_COLLECTION
+
+# Reprise d'un export interrompu : unité "lines" (numéro de ligne, à partir de 0)
+LINES_RANGE = re.compile(r'^lines=(\d+)-$')
+
+def _export_response(db, user_id):
+    fmt = request.args.get('format', 'ndjson')
+    try:
+        export = UserExport(db, user_id, fmt, request.args.get('section'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    total = export.total_lines
+    etag = export.etag
+    start = 0
+    status = 200
+    headers = {'ETag': f'"{etag}"', 'Accept-Ranges': 'lines', 'X-Total-Lines': str(total),
+               'Cache-Control': 'no-store'}
+
+    range_header = request.headers.get('Range')
+    if range_header:
+        match = LINES_RANGE.match(range_header.strip())
+        if_range = request.headers.get('If-Range', '').strip('"')
+        # Données modifiées depuis le début de l'export : tout renvoyer
+        if match and (not if_range or if_range == etag):
+            start = int(match.group(1))
+            if start >= total:
+                return Response(status=416, headers={'Content-Range': f'lines */{total}'})
+            status = 206
+            headers['Content-Range'] = f'lines {start}-{total - 1}/{total}'
+
+    extension = 'ndjson' if fmt == 'ndjson' else 'csv'
+    headers['Content-Disposition'] = f'attachment; filename="export-{user_id}.{extension}"'
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'text/csv'
+    print(f"Streaming export of user {user_id} ({fmt}, {total} lines from {start})")
+    return Response(export.chunks(start), status=status, mimetype=mimetype, headers=headers)
+
+@users_bp.route('/profile/export', methods=['GET'])
+@require_auth
+def export_own_data():
+    """
+    Export complet des données de l'utilisateur connecté (NDJSON par défaut)
+
+    Paramètres : format=ndjson|csv, section=profil|historiques|evaluations|
+    sessions|activite (obligatoire en CSV, historiques par défaut).
+    Reprise : Range: lines=N- et If-Range: <ETag>.
+    """
+    print("Received GET /users/profile/export request")
+    try:
+        return _export_response(get_db(), get_current_user()['_id'])
+    except Exception as e:
+        print(f"Error in export_own_data: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@users_bp.route('/<user_id>/export', methods=['GET'])
+@require_admin
+def export_user_data(user_id):
+    print(f"Received GET /users/{user_id}/export request")
+    try:
+        try:
+            user_id_obj = ObjectId(user_id)
+        except Exception:
+            return jsonify({'error': 'ID d\'utilisateur invalide'}), 400
+        db = get_db()
+        if not db.utilisateurs.find_one({'_id': user_id_obj}, {'_id': 1}):
+            return jsonify({'error': 'Utilisateur non trouvé'}), 404
+        return _export_response(db, user_id_obj)
+    except Exception as e:
+        print(f"Error in export_user_data: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def _job_data(job):
+    data = {key: value for key, value in job.items() if key not in ('_id', 'chemin')}
+    data['id'] = str(job['_id'])
+    if job.get('statut') == 'termine':
+        data['telechargement'] = f"/users/exports/{job['_id']}?telecharger=1"
+    return data
+
+@users_bp.route('/<user_id>/export/fichier', methods=['POST'])
+@require_admin
+def start_user_export(user_id):
+    """Export en arrière-plan vers un fichier gzip (comptes volumineux)"""
+    print(f"Received POST /users/{user_id}/export/fichier request")
+    try:
+        try:
+            user_id_obj = ObjectId(user_id)
+        except Exception:
+            return jsonify({'error': 'ID d\'utilisateur invalide'}), 400
+        db = get_db()
+        if not db.utilisateurs.find_one({'_id': user_id_obj}, {'_id': 1}):
+            return jsonify({'error': 'Utilisateur non trouvé'}), 404
+        data = request.get_json(silent=True) or {}
+        try:
+            job = start_export_job(db, user_id_obj, data.get('format', 'ndjson'),
+                                   data.get('section'), get_current_user()['_id'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(_job_data(job)), 202
+    except Exception as e:
+        print(f"Error in start_user_export: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@users_bp.route('/exports/<export_id>', methods=['GET'])
+@require_admin
+def get_user_export(export_id):
+    """Suivi d'un export en fichier ; ?telecharger=1 renvoie le fichier terminé"""
+    try:
+        try:
+            export_id_obj = ObjectId(export_id)
+        except Exception:
+            return jsonify({'error': 'ID d\'export invalide'}), 400
+        job = get_db()[EXPORTS_COLLECTION].find_one({'_id': export_id_obj})
+        if not job:
+            return jsonify({'error': 'Export non trouvé'}), 404
+        if request.args.get('telecharger'):
+            if job.get('statut') != 'termine' or not os.path.exists(job['chemin']):
+                return jsonify({'error': 'Export non disponible'}), 409
+            return send_file(job['chemin'], mimetype='application/gzip', as_attachment=True,
+                             download_name=os.path.basename(job['chemin']))
+        return jsonify(_job_data(job)), 200
+    except Exception as e:
+        print(f"Error in get_user_export: {str(e)}")
+        return jsonify({'error': str(e)}), 500
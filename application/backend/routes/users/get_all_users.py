@@ -10,21 +10,23 @@ def get_all_users():
     try:
         db = get_db()
         
-        # Récupérer tous les utilisateurs
-        users_cursor = db.utilisateurs.find({})
-        users_list = []
-        
-        for user in users_cursor:
-            user_data = {
-                'id': str(user['_id']),
-                'nom': user.get('nom', ''),
-                'prenom': user.get('prenom', ''),
-                'email': user.get('email', ''),
-                'role': user.get('role', 'utilisateur'),
-                'est_actif': user.get('est_actif', True),
-                'date_creation': user.get('date_creation')
+        # Récupérer tous les utilisateurs, projetés dans la forme de la réponse
+        # (ObjectId et dates sont sérialisés par le provider JSON)
+        users_list = list(db.utilisateurs.aggregate([
+            {
+                '$project': {
+                    '_id': 0,
+                    'id': '$_id',
+                    'nom': {'$ifNull': ['$nom', '']},
+                    'prenom': {'$ifNull': ['$prenom', '']},
+                    'email': {'$ifNull': ['$email', '']},
+                    'role': {'$ifNull': ['$role', 'utilisateur']},
+                    'est_actif': {'$ifNull': ['$est_actif', True]},
+                    'date_creation': {'$ifNull': ['$date_creation', None]},
+                    'suppression_demandee_le': {'$ifNull': ['$suppression_demandee_le', None]}
+                }
             }
-            users_list.append(user_data)
+        ]))
         
         print(f"Found {len(users_list)} users")
         return jsonify(users_list), 200
@@ -2,7 +2,7 @@ from flask import request, jsonify
 from bson import ObjectId
 from config.database import get_db
 from routes.users import users_bp
-from utils.auth_middleware import require_auth, get_current_user
+from utils.auth_middleware import require_auth, get_current_user, invalidate_principals
 
 @users_bp.route('/profile', methods=['PUT'])
 @require_auth
@@ -63,6 +63,7 @@ def update_user_profile():
                 return jsonify({'error': 'Aucune modification effectuée'}), 400
             
             print(f"User profile updated successfully: {current_user['_id']}")
+            invalidate_principals(user_id_obj)
             
             # Récupérer l'utilisateur mis à jour
             updated_user = db.utilisateurs.find_one({'_id': user_id_obj})
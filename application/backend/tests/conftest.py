@@ -0,0 +1,22 @@
+"""
+Configuration commune des tests unitaires (lancés depuis application/backend)
+
+Aucun serveur MongoDB n'est nécessaire : la connexion réelle échoue vite,
+les tests qui ont besoin d'une base utilisent mongomock.
+"""
+
+import os
+import sys
+
+os.environ.setdefault('MONGO_URI', 'mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=100')
+os.environ.setdefault('DISABLE_RESPONSE_CACHE', 'true')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def mongo():
+    """Base MongoDB en mémoire"""
+    mongomock = pytest.importorskip('mongomock')
+    return mongomock.MongoClient().db
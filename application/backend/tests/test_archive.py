@@ -0,0 +1,44 @@
+from datetime import datetime
+from bson import ObjectId
+from utils.archive import store_month, read_archived, month_of
+
+USER = ObjectId()
+
+
+def _rows(mongo, days):
+    """Une ligne par jour donné, archivée dans son mois"""
+    months = {}
+    for day in days:
+        months.setdefault(month_of(day), []).append(
+            {'_id': ObjectId(), 'id_utilisateur': USER, 'date_execution': day})
+    for month, rows in months.items():
+        store_month(mongo, USER, month, rows)
+
+
+def test_read_archived_filters_on_bounds(mongo):
+    _rows(mongo, [datetime(2023, 1, 5), datetime(2023, 1, 25), datetime(2023, 2, 10),
+                  datetime(2023, 3, 1)])
+    rows = read_archived(mongo, USER, depuis=datetime(2023, 1, 10), jusqu_a=datetime(2023, 2, 28))
+    assert sorted(row['date_execution'] for row in rows) == [datetime(2023, 1, 25),
+                                                             datetime(2023, 2, 10)]
+
+
+def test_read_archived_limit_keeps_most_recent_rows(mongo):
+    _rows(mongo, [datetime(2023, 1, day) for day in (1, 2, 3)]
+          + [datetime(2023, 2, day) for day in (1, 2, 3)])
+    rows = read_archived(mongo, USER, limit=4)
+    # Février en entier, puis les lignes les plus récentes de janvier
+    assert sorted(row['date_execution'] for row in rows) == [
+        datetime(2023, 1, 3), datetime(2023, 2, 1), datetime(2023, 2, 2), datetime(2023, 2, 3)]
+
+
+def test_read_archived_without_limit_and_other_user(mongo):
+    _rows(mongo, [datetime(2023, 1, 1), datetime(2023, 2, 1)])
+    assert len(read_archived(mongo, USER, limit=None)) == 2
+    assert read_archived(mongo, ObjectId()) == []
+
+
+def test_store_month_merges_by_id(mongo):
+    row = {'_id': ObjectId(), 'id_utilisateur': USER, 'date_execution': datetime(2023, 1, 1)}
+    store_month(mongo, USER, datetime(2023, 1, 1), [row])
+    assert store_month(mongo, USER, datetime(2023, 1, 1), [row])[0] == 1
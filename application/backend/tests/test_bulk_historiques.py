@@ -0,0 +1,88 @@
+import gzip
+import pytest
+from bson import ObjectId
+from flask import Flask
+from routes.historiques import bulk_historiques
+
+EXERCICE = {'_id': ObjectId(), 'duree_inspiration': 4, 'duree_apnee': 2, 'duree_expiration': 6}
+
+
+@pytest.fixture
+def app():
+    return Flask(__name__)
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    class Catalog:
+        def get(self, document_id):
+            return EXERCICE if str(document_id) == str(EXERCICE['_id']) else None
+    monkeypatch.setattr(bulk_historiques, 'exercice_catalog', Catalog())
+
+
+def _read(app, body, headers=None):
+    with app.test_request_context('/historiques/bulk', method='POST', data=body,
+                                  headers=headers or {}):
+        return list(bulk_historiques._lines())
+
+
+def test_lines_skip_blank_lines_and_number_the_others(app):
+    assert _read(app, b'{"a": 1}\n\n  \n{"b": 2}') == [(1, b'{"a": 1}'), (2, b'{"b": 2}')]
+
+
+def test_lines_accept_gzip(app):
+    body = gzip.compress(b'{"a": 1}\n{"b": 2}\n')
+    assert len(_read(app, body, {'Content-Encoding': 'gzip'})) == 2
+
+
+def test_lines_limit_count(app, monkeypatch):
+    monkeypatch.setattr(bulk_historiques, 'BULK_MAX_LINES', 2)
+    with pytest.raises(bulk_historiques.PayloadTooLarge):
+        _read(app, b'1\n2\n3\n')
+
+
+def test_lines_limit_decompressed_bytes(app, monkeypatch):
+    monkeypatch.setattr(bulk_historiques, 'BULK_MAX_BYTES', 100)
+    # Bombe gzip : une seule ligne sans fin, lue dans la limite restante
+    body = gzip.compress(b'a' * 10 ** 6)
+    with pytest.raises(bulk_historiques.PayloadTooLarge):
+        _read(app, body, {'Content-Encoding': 'gzip'})
+
+
+def _validate(app, line, user_id='u1'):
+    with app.app_context():
+        return bulk_historiques._validate(line, user_id)
+
+
+def test_validate_builds_the_document(app, catalog):
+    line = (b'{"id_client": "c1", "id_exercice": "%s", "nombre_cycles": 3, '
+            b'"date_execution": "2024-05-01T10:00:00+02:00"}' % str(EXERCICE['_id']).encode())
+    document, error = _validate(app, line)
+    assert error is None
+    assert document['id_exercice'] == EXERCICE['_id']
+    assert document['date_execution'].isoformat() == '2024-05-01T08:00:00'
+    assert document['_secondes'] == 3 * 12
+    assert document['id_utilisateur'] == 'u1'
+
+
+@pytest.mark.parametrize('line, message', [
+    (b'{', 'JSON invalide'),
+    (b'[1]', 'Objet JSON attendu'),
+    (b'{"id_exercice": "x"}', 'id_client obligatoire'),
+    (b'{"id_client": "%s"}' % (b'x' * 129), 'id_client obligatoire'),
+    (b'{"id_client": "c1", "id_exercice": "inconnu"}', 'Exercice non trouvé'),
+])
+def test_validate_rejects(app, catalog, line, message):
+    document, error = _validate(app, line)
+    assert document is None and error.startswith(message)
+
+
+@pytest.mark.parametrize('extra, message', [
+    (b'"date_execution": "hier"', 'Format de date invalide'),
+    (b'"nombre_cycles": -2', 'Le nombre de cycles'),
+    (b'"nombre_cycles": "deux"', 'Le nombre de cycles'),
+])
+def test_validate_rejects_fields(app, catalog, extra, message):
+    line = b'{"id_client": "c1", "id_exercice": "%s", %s}' % (str(EXERCICE['_id']).encode(), extra)
+    document, error = _validate(app, line)
+    assert document is None and error.startswith(message)
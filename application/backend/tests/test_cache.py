@@ -0,0 +1,55 @@
+import time
+from utils.cache import LRUCache, ENTRY_OVERHEAD
+
+
+def test_get_returns_value_and_counts_hits():
+    cache = LRUCache(10 * ENTRY_OVERHEAD)
+    assert cache.set('a', 'A', 60, 10)
+    assert cache.get('a') == 'A'
+    assert cache.get('b') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(2 * (ENTRY_OVERHEAD + 10))
+    cache.set('a', 'A', 60, 10)
+    cache.set('b', 'B', 60, 10)
+    cache.get('a')
+    cache.set('c', 'C', 60, 10)
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A' and cache.get('c') == 'C'
+    assert cache.evictions == 1
+    assert cache.current_bytes == 2 * (ENTRY_OVERHEAD + 10)
+
+
+def test_expired_entry_is_removed():
+    cache = LRUCache(10 * ENTRY_OVERHEAD)
+    cache.set('a', 'A', 0, 10)
+    time.sleep(0.01)
+    assert cache.get('a') is None
+    assert cache.current_bytes == 0
+
+
+def test_oversized_replacement_drops_previous_value():
+    cache = LRUCache(2 * ENTRY_OVERHEAD)
+    cache.set('a', 'ancienne', 60, 10)
+    assert not cache.set('a', 'nouvelle', 60, 10 * ENTRY_OVERHEAD)
+    assert cache.get('a') is None
+    assert cache.current_bytes == 0
+
+
+def test_replacing_a_key_keeps_size_accounting():
+    cache = LRUCache(10 * ENTRY_OVERHEAD)
+    cache.set('a', 'A', 60, 10)
+    cache.set('a', 'AA', 60, 20)
+    assert cache.get('a') == 'AA'
+    assert cache.current_bytes == ENTRY_OVERHEAD + 20
+
+
+def test_invalidate_tag_only_removes_tagged_entries():
+    cache = LRUCache(10 * ENTRY_OVERHEAD)
+    cache.set('a', 'A', 60, 10, tags=('exercices',))
+    cache.set('b', 'B', 60, 10, tags=('meditations',))
+    assert cache.invalidate_tag('exercices') == 1
+    assert cache.get('a') is None
+    assert cache.get('b') == 'B'
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+import pytest
+from jobs.queue import JobQueue, QUEUE_COLLECTION, DEAD_COLLECTION
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(backoff_seconds=10)
+    queue.calls = []
+
+    def record(db, donnees):
+        queue.calls.append(donnees)
+        return {'ok': True}
+
+    def fail(db, donnees):
+        raise RuntimeError('boom')
+
+    queue.register('ok', record)
+    queue.register('echec', fail, max_attempts=2)
+    return queue
+
+
+def _task(mongo, task_id):
+    return mongo[QUEUE_COLLECTION].find_one({'_id': task_id})
+
+
+def test_claim_takes_highest_priority_then_oldest(mongo, queue):
+    first = queue.enqueue('ok', {'n': 1}, db=mongo)
+    queue.enqueue('ok', {'n': 2}, db=mongo)
+    urgent = queue.enqueue('ok', {'n': 3}, priority=5, db=mongo)
+    assert queue.claim(mongo)['_id'] == urgent
+    assert queue.claim(mongo)['_id'] == first
+
+
+def test_claim_ignores_delayed_and_unknown_tasks(mongo, queue):
+    queue.enqueue('ok', delay=60, db=mongo)
+    mongo[QUEUE_COLLECTION].insert_one({'type': 'autre', 'statut': 'en_attente',
+                                        'priorite': 0, 'disponible_le': datetime.utcnow()})
+    assert queue.claim(mongo) is None
+
+
+def test_success_marks_task_done(mongo, queue):
+    task_id = queue.enqueue('ok', {'n': 1}, db=mongo)
+    assert queue.work_once(mongo)
+    task = _task(mongo, task_id)
+    assert task['statut'] == 'termine' and task['resultat'] == {'ok': True}
+    assert 'bail' not in task
+    assert queue.calls == [{'n': 1}]
+
+
+def test_failure_is_rescheduled_with_backoff(mongo, queue):
+    task_id = queue.enqueue('echec', db=mongo)
+    before = datetime.utcnow()
+    queue.work_once(mongo)
+    task = _task(mongo, task_id)
+    assert task['statut'] == 'en_attente' and task['erreur'] == 'boom'
+    assert before + timedelta(seconds=7) < task['disponible_le'] < before + timedelta(seconds=13)
+
+
+def test_backoff_doubles_with_jitter_and_is_capped(queue):
+    for attempts, base in ((1, 10), (2, 20), (3, 40)):
+        assert base * 0.8 <= queue._backoff(attempts) <= base * 1.2
+    assert queue._backoff(30) <= 3600 * 1.2
+
+
+def test_last_attempt_moves_task_to_dead_letters(mongo, queue):
+    task_id = queue.enqueue('echec', db=mongo)
+    queue.work_once(mongo)
+    mongo[QUEUE_COLLECTION].update_one({'_id': task_id},
+                                       {'$set': {'disponible_le': datetime.utcnow()}})
+    queue.work_once(mongo)
+    assert _task(mongo, task_id) is None
+    dead = mongo[DEAD_COLLECTION].find_one({'_id': task_id})
+    assert dead['statut'] == 'echec' and dead['tentatives'] == 2
+
+    assert queue.retry_dead(task_id, db=mongo)
+    task = _task(mongo, task_id)
+    assert task['statut'] == 'en_attente' and task['tentatives'] == 0
+    assert mongo[DEAD_COLLECTION].count_documents({}) == 0
+
+
+def _expire(mongo, task_id, attempts):
+    mongo[QUEUE_COLLECTION].update_one({'_id': task_id}, {'$set': {
+        'statut': 'en_cours', 'tentatives': attempts, 'bail': 'ancien',
+        'bail_jusqu_a': datetime.utcnow() - timedelta(seconds=1)}})
+
+
+def test_expired_lease_is_reclaimed_while_attempts_remain(mongo, queue):
+    task_id = queue.enqueue('echec', db=mongo)
+    _expire(mongo, task_id, 1)
+    task = queue.claim(mongo)
+    assert task['_id'] == task_id and task['tentatives'] == 2 and task['bail'] != 'ancien'
+
+
+def test_expired_lease_without_attempts_left_is_reaped(mongo, queue):
+    task_id = queue.enqueue('echec', db=mongo)
+    _expire(mongo, task_id, 2)
+    assert queue.claim(mongo) is None
+    assert queue.reap(mongo) == 1
+    assert _task(mongo, task_id) is None
+    assert mongo[DEAD_COLLECTION].find_one({'_id': task_id})['erreur'].startswith('Bail expiré')
@@ -0,0 +1,19 @@
+from utils.search import fold, stem, analyze
+
+
+def test_fold_lowercases_and_strips_accents():
+    assert fold('Cohérence Émotionnelle') == 'coherence emotionnelle'
+
+
+def test_stem_removes_suffix_but_keeps_minimum_length():
+    assert stem('respirations') == 'respir'
+    assert stem('exercices') == 'exercic'
+    assert stem('yes') == 'yes'
+
+
+def test_analyze_drops_stopwords_and_punctuation():
+    assert analyze("La respiration et les émotions !") == ['respir', 'emotion']
+
+
+def test_analyze_singular_and_plural_share_a_term():
+    assert analyze('méditation') == analyze('Méditations')
@@ -0,0 +1,49 @@
+from utils.trie import RadixTrie
+
+
+def _suggestion(identifier, texte):
+    return {'type': 'exercice', 'id': identifier, 'texte': texte}
+
+
+def _texts(results):
+    return [suggestion['texte'] for _, suggestion in results]
+
+
+def test_complete_after_edge_split():
+    trie = RadixTrie()
+    trie.insert('coherence cardiaque', _suggestion('1', 'Cohérence cardiaque'), 2)
+    trie.insert('carre', _suggestion('2', 'Carré'), 2)
+    trie.insert('coeur', _suggestion('3', 'Coeur'), 2)
+    assert _texts(trie.complete('co')) == ['Coeur', 'Cohérence cardiaque']
+    assert _texts(trie.complete('coh')) == ['Cohérence cardiaque']
+    assert _texts(trie.complete('ca')) == ['Carré']
+    assert trie.complete('x') == []
+    assert trie.complete('coherence z') == []
+
+
+def test_prefix_inside_an_edge_label():
+    trie = RadixTrie()
+    trie.insert('respiration', _suggestion('1', 'Respiration'), 2)
+    assert _texts(trie.complete('resp')) == ['Respiration']
+    assert _texts(trie.complete('respiration')) == ['Respiration']
+    assert trie.complete('respirations') == []
+
+
+def test_name_start_ranks_before_word_start_and_keeps_best_rank():
+    trie = RadixTrie()
+    name = _suggestion('1', 'Cohérence cardiaque')
+    trie.insert('coherence cardiaque', name, 2)
+    trie.insert('cardiaque', name, 1)
+    trie.insert('cardio', _suggestion('2', 'Cardio'), 2)
+    ranked = trie.complete('card')
+    assert _texts(ranked) == ['Cardio', 'Cohérence cardiaque']
+    # Une suggestion n'apparaît qu'une fois par nœud
+    assert len(trie.complete('')) == 2
+
+
+def test_top_k_bounds_suggestions():
+    trie = RadixTrie(top_k=2)
+    for index, texte in enumerate(['abc', 'abcd', 'abcde']):
+        trie.insert(texte, _suggestion(str(index), texte), 2)
+    assert _texts(trie.complete('ab')) == ['abc', 'abcd']
+    assert _texts(trie.complete('ab', limit=1)) == ['abc']
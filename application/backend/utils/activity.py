@@ -0,0 +1,150 @@
+"""
+Agrégats d'activité par utilisateur, maintenus à l'écriture
+
+Chaque historique créé met à jour, sans relire l'historique :
+- `activite_quotidienne` : un document par (utilisateur, jour UTC) avec le
+  nombre d'exercices et les secondes de respiration ($inc en upsert) ;
+- `activite_utilisateurs` : un document par utilisateur avec les totaux et la
+  série de jours consécutifs (mise à jour O(1) par un pipeline atomique).
+
+GET /historiques/stats ne lit que ces documents. jobs/activity.py les
+reconstruit depuis historiques_exercices si nécessaire.
+"""
+
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+DAILY_COLLECTION = 'activite_quotidienne'
+SUMMARY_COLLECTION = 'activite_utilisateurs'
+
+# Index (utilisateur, jour) créé une fois par processus, au premier accès
+_indexes_ready = False
+
+
+def cycle_seconds(exercice):
+    """Durée d'un cycle inspiration / apnée / expiration"""
+    return (int(exercice.get('duree_inspiration', 0) or 0)
+            + int(exercice.get('duree_apnee', 0) or 0)
+            + int(exercice.get('duree_expiration', 0) or 0))
+
+
+def utc_day(moment):
+    """Minuit UTC (datetime naïf) du jour d'un instant"""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return datetime(moment.year, moment.month, moment.day)
+
+
+def ensure_activity_indexes(db):
+    """Un document par (utilisateur, jour) : requis par les upserts et le $merge"""
+    db[DAILY_COLLECTION].create_index(
+        [('id_utilisateur', ASCENDING), ('jour', ASCENDING)],
+        unique=True,
+        name='activite_unique_par_jour'
+    )
+
+
+def _daily(db):
+    """Collection quotidienne, avec son index unique garanti"""
+    global _indexes_ready
+    if not _indexes_ready:
+        ensure_activity_indexes(db)
+        _indexes_ready = True
+    return db[DAILY_COLLECTION]
+
+
+def streak_update(day, exercices, secondes, new_day):
+    """
+    Pipeline de mise à jour du résumé utilisateur
+
+    La série n'est prolongée que par le jour suivant le dernier jour actif ;
+    une activité antidatée compte dans les totaux sans modifier la série.
+    """
+    previous_day = day - timedelta(days=1)
+    return [
+        {'$set': {
+            'total_exercices': {'$add': [{'$ifNull': ['$total_exercices', 0]}, exercices]},
+            'total_secondes': {'$add': [{'$ifNull': ['$total_secondes', 0]}, secondes]},
+            'jours_actifs': {'$add': [{'$ifNull': ['$jours_actifs', 0]}, 1 if new_day else 0]},
+            'serie_actuelle': {'$switch': {
+                'branches': [
+                    {'case': {'$eq': [{'$ifNull': ['$dernier_jour', None]}, None]}, 'then': 1},
+                    {'case': {'$eq': ['$dernier_jour', day]}, 'then': '$serie_actuelle'},
+                    {'case': {'$eq': ['$dernier_jour', previous_day]},
+                     'then': {'$add': ['$serie_actuelle', 1]}},
+                    {'case': {'$lt': ['$dernier_jour', previous_day]}, 'then': 1}
+                ],
+                'default': '$serie_actuelle'
+            }},
+            'dernier_jour': {'$max': ['$dernier_jour', day]},
+            'modifie_le': datetime.utcnow()
+        }},
+        {'$set': {
+            'meilleure_serie': {'$max': [{'$ifNull': ['$meilleure_serie', 0]}, '$serie_actuelle']}
+        }}
+    ]
+
+
+def record_activity(db, user_id, moment, secondes, exercices=1):
+    """À appeler après l'insertion d'un historique"""
+    day = utc_day(moment)
+    collection = _daily(db)
+    query = {'id_utilisateur': user_id, 'jour': day}
+    # modifie_le : version de la section activité de l'export (utils/export.py)
+    increment = {'$inc': {'exercices': exercices, 'secondes': secondes},
+                 '$set': {'modifie_le': datetime.utcnow()}}
+    try:
+        daily = collection.update_one(query, increment, upsert=True)
+    except DuplicateKeyError:
+        # Premier historique du jour écrit en même temps par une autre
+        # requête : le document existe, le jour n'est plus nouveau
+        daily = collection.update_one(query, increment)
+    db[SUMMARY_COLLECTION].update_one(
+        {'_id': user_id},
+        streak_update(day, exercices, secondes, new_day=daily.upserted_id is not None),
+        upsert=True
+    )
+
+
+def current_streak(summary, today=None):
+    """Série en cours : rompue si le dernier jour actif est avant-hier ou plus ancien"""
+    if not summary or not summary.get('dernier_jour'):
+        return 0
+    today = today or utc_day(datetime.utcnow())
+    if summary['dernier_jour'] < today - timedelta(days=1):
+        return 0
+    return summary.get('serie_actuelle', 0)
+
+
+def user_stats(db, user_id, days=30):
+    """Tableau de bord d'un utilisateur, lu uniquement depuis les agrégats"""
+    today = utc_day(datetime.utcnow())
+    start = today - timedelta(days=days - 1)
+    summary = db[SUMMARY_COLLECTION].find_one({'_id': user_id}) or {}
+    daily = {
+        doc['jour']: doc for doc in _daily(db).find(
+            {'id_utilisateur': user_id, 'jour': {'$gte': start, '$lte': today}},
+            {'_id': 0, 'jour': 1, 'exercices': 1, 'secondes': 1}
+        )
+    }
+    par_jour = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        doc = daily.get(day, {})
+        par_jour.append({
+            'jour': day.date().isoformat(),
+            'exercices': doc.get('exercices', 0),
+            'secondes': doc.get('secondes', 0)
+        })
+    total_secondes = summary.get('total_secondes', 0)
+    return {
+        'total_exercices': summary.get('total_exercices', 0),
+        'total_secondes': total_secondes,
+        'total_minutes': round(total_secondes / 60, 1),
+        'jours_actifs': summary.get('jours_actifs', 0),
+        'serie_actuelle': current_streak(summary, today),
+        'meilleure_serie': summary.get('meilleure_serie', 0),
+        'dernier_jour': summary['dernier_jour'].date().isoformat()
+        if summary.get('dernier_jour') else None,
+        'par_jour': par_jour
+    }
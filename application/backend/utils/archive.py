@@ -0,0 +1,130 @@
+"""
+Archives froides de l'historique des exercices
+
+Les lignes anciennes (jobs/archive_history.py) sont regroupées par
+(utilisateur, mois) en un document de `historiques_archives` : NDJSON
+(JSON étendu MongoDB, types ObjectId/date conservés) compressé en zstd
+(`zstandard`, dans requirements.txt) ; zlib seulement si le paquet est
+absent. Le codec est enregistré par archive : les deux restent lisibles. Le manifeste (`archives_manifeste`)
+donne l'horizon : les lignes antérieures peuvent se trouver dans les archives.
+
+Seules les lectures dont le début explicite (`depuis`) précède l'horizon
+lisent aussi les archives (read_archived), des mois les plus récents aux
+plus anciens et dans la limite de ARCHIVE_READ_MAX_ROWS lignes ; les
+doublons avec la collection active (archivage en cours) sont éliminés par _id.
+"""
+
+import os
+import zlib
+from datetime import datetime
+from bson import Binary, json_util
+from bson.json_util import JSONOptions, JSONMode
+from pymongo import ASCENDING, DESCENDING
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    zstandard = None
+
+ARCHIVE_COLLECTION = 'historiques_archives'
+MANIFEST_COLLECTION = 'archives_manifeste'
+MANIFEST_KEY = 'historiques'
+# Plafond des lignes décompressées par lecture d'archives
+READ_MAX_ROWS = int(os.getenv('ARCHIVE_READ_MAX_ROWS', '5000'))
+
+# Types BSON conservés à l'aller-retour (ObjectId, date)
+JSON_OPTIONS = JSONOptions(json_mode=JSONMode.CANONICAL, tz_aware=False)
+
+
+def default_codec():
+    return 'zstd' if zstandard is not None else 'zlib'
+
+
+def encode_rows(rows, codec=None):
+    """Lignes -> NDJSON compressé ; retourne (codec, octets)"""
+    codec = codec or default_codec()
+    payload = b''.join(json_util.dumps(row, json_options=JSON_OPTIONS).encode('utf-8') + b'\n'
+                       for row in rows)
+    if codec == 'zstd':
+        return codec, zstandard.ZstdCompressor(level=10).compress(payload)
+    return codec, zlib.compress(payload, 9)
+
+
+def decode_rows(codec, data):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Archive zstd illisible : paquet zstandard absent")
+        payload = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        payload = zlib.decompress(data)
+    return [json_util.loads(line, json_options=JSON_OPTIONS)
+            for line in payload.decode('utf-8').splitlines() if line]
+
+
+def month_of(moment):
+    return datetime(moment.year, moment.month, 1)
+
+
+def ensure_archive_indexes(db):
+    db[ARCHIVE_COLLECTION].create_index([('id_utilisateur', ASCENDING), ('mois', ASCENDING)],
+                                        unique=True, name='archive_unique_par_mois')
+    db[ARCHIVE_COLLECTION].create_index([('mois', ASCENDING)])
+
+
+def archive_horizon(db):
+    """Date avant laquelle des lignes peuvent être archivées (None : aucune archive)"""
+    manifest = db[MANIFEST_COLLECTION].find_one({'_id': MANIFEST_KEY}, {'horizon': 1})
+    return manifest.get('horizon') if manifest else None
+
+
+def store_month(db, user_id, month, rows):
+    """Ajouter des lignes à l'archive (utilisateur, mois), fusionnées par _id"""
+    existing = db[ARCHIVE_COLLECTION].find_one({'id_utilisateur': user_id, 'mois': month})
+    merged = {row['_id']: row for row in
+              (decode_rows(existing['codec'], existing['donnees']) if existing else [])}
+    merged.update((row['_id'], row) for row in rows)
+    ordered = sorted(merged.values(), key=lambda row: row['date_execution'])
+    codec, data = encode_rows(ordered)
+    db[ARCHIVE_COLLECTION].update_one(
+        {'id_utilisateur': user_id, 'mois': month},
+        {'$set': {'codec': codec, 'donnees': Binary(data), 'lignes': len(ordered),
+                  'octets': len(data), 'premier': ordered[0]['date_execution'],
+                  'dernier': ordered[-1]['date_execution'], 'archive_le': datetime.utcnow()}},
+        upsert=True
+    )
+    return len(ordered), len(data)
+
+
+def read_archived(db, user_id=None, depuis=None, jusqu_a=None, limit=READ_MAX_ROWS):
+    """
+    Lignes archivées d'un utilisateur (ou de tous) dans [depuis, jusqu_a]
+
+    Les archives sont décompressées mois par mois, du plus récent au plus
+    ancien, jusqu'à `limit` lignes (None : sans limite).
+    """
+    query = {}
+    if user_id is not None:
+        query['id_utilisateur'] = user_id
+    if depuis is not None:
+        query['dernier'] = {'$gte': depuis}
+    if jusqu_a is not None:
+        query['premier'] = {'$lte': jusqu_a}
+    rows = []
+    archives = db[ARCHIVE_COLLECTION].find(query, {'codec': 1, 'donnees': 1}).sort('mois', DESCENDING)
+    for archive in archives:
+        month = []
+        for row in decode_rows(archive['codec'], archive['donnees']):
+            moment = row.get('date_execution')
+            if depuis is not None and moment < depuis:
+                continue
+            if jusqu_a is not None and moment > jusqu_a:
+                continue
+            month.append(row)
+        if limit is not None and len(rows) + len(month) >= limit:
+            # Lignes les plus récentes du dernier mois lu
+            month.sort(key=lambda row: row['date_execution'], reverse=True)
+            rows.extend(month[:limit - len(rows)])
+            archives.close()
+            break
+        rows.extend(month)
+    return rows
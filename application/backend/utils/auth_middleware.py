@@ -1,9 +1,123 @@
+import os
+import time
+import threading
+from collections import OrderedDict
 from functools import wraps
 from flask import request, jsonify
 import jwt
 from config.config import SECRET_KEY
-from config.database import get_db
 from bson import ObjectId
+from utils.identity_map import identity_map
+from utils.versions import collection_versions, bump_version
+import logging
+
+logger = logging.getLogger(__name__)
+
+PRINCIPALS_COLLECTION = 'utilisateurs'
+
+
+class PrincipalCache:
+    """
+    Utilisateurs authentifiés gardés en mémoire entre les requêtes (par worker)
+
+    Chaque entrée porte la version de `utilisateurs` (utils/versions.py) sous
+    laquelle elle a été lue : une écriture qui passe par invalidate_principals
+    incrémente cette version, ce qui périme les entrées de tous les workers
+    (relecture de la version au plus une fois par VERSION_REFRESH_SECONDS).
+    """
+
+    def __init__(self, ttl=30.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # _id -> (document, version, expire_a)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get(self, user_id, version):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] != version or entry[2] < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            # Copie : la requête peut modifier son utilisateur sans toucher au cache
+            return dict(entry[0])
+
+    def put(self, user_id, document, version):
+        with self._lock:
+            self._entries[user_id] = (dict(document), version, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                if self._entries.pop(user_id, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def get_stats(self):
+        total = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'entries': len(self._entries),
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else None,
+            'invalidations': self.invalidations
+        }
+
+
+# Instance globale
+principal_cache = PrincipalCache(
+    ttl=float(os.getenv('PRINCIPAL_CACHE_TTL', '30')),
+    max_entries=int(os.getenv('PRINCIPAL_CACHE_MAX_ENTRIES', '10000'))
+)
+
+
+def invalidate_principals(*user_ids):
+    """À appeler après une écriture sur des utilisateurs (rôle, statut, profil)"""
+    principal_cache.discard(*user_ids)
+    # Les autres workers voient la nouvelle version et relisent leurs entrées
+    bump_version(PRINCIPALS_COLLECTION)
+
+
+def _load_principal(user_id):
+    """Utilisateur du token : cache inter-requêtes, sinon identity map"""
+    version = None
+    if principal_cache.enabled:
+        try:
+            version = collection_versions.token(PRINCIPALS_COLLECTION)
+        except Exception as e:
+            logger.warning(f"Version des utilisateurs indisponible: {e}")
+    if version is not None:
+        user = principal_cache.get(user_id, version)
+        if user is not None:
+            return identity_map().register('utilisateurs', user)
+    user = identity_map().get('utilisateurs', user_id)
+    if user is not None and version is not None:
+        principal_cache.put(user_id, user, version)
+    return user
+
+
+def is_active_account(user):
+    """Compte utilisable : actif et sans suppression demandée"""
+    return bool(user) and user.get('est_actif', False) and not user.get('suppression_demandee_le')
+
 
 def require_auth(f):
     """Décorateur qui vérifie que l'utilisateur est authentifié"""
@@ -17,11 +131,10 @@ def require_auth(f):
             # Décoder le token JWT
             payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
             
-            # Récupérer l'utilisateur depuis la base de données
-            db = get_db()
-            user = db.utilisateurs.find_one({'_id': ObjectId(payload['user_id'])})
+            # Récupérer l'utilisateur (cache inter-requêtes, sinon base de données)
+            user = _load_principal(ObjectId(payload['user_id']))
             
-            if not user or not user.get('est_actif', False):
+            if not is_active_account(user):
                 return jsonify({'error': 'Utilisateur non trouvé ou inactif'}), 401
             
             # Ajouter l'utilisateur à la requête
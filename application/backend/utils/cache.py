@@ -0,0 +1,326 @@
+"""
+Cache de réponses pour l'application Flask
+
+Deux niveaux :
+- un LRU par worker, borné en octets ;
+- un niveau partagé optionnel (collection MongoDB avec index TTL), activé par
+  CACHE_SHARED_TIER=mongo, commun à tous les workers et instances.
+
+Les clés combinent l'endpoint, ses paramètres d'URL, les query args normalisés,
+la portée d'authentification (anonymous / user / admin) et le jeton de version
+de chaque collection dont dépend la réponse : un corps lu avant une écriture
+est rangé sous l'ancienne version et n'est plus servi après elle, quel que
+soit le niveau qui le conserve encore.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, make_response
+import jwt
+from config.config import SECRET_KEY
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Surcoût approximatif d'une entrée (clé, tuple, métadonnées)
+ENTRY_OVERHEAD = 256
+
+
+def _parse_ttls(raw):
+    """Format: "endpoint=secondes,endpoint2=secondes" """
+    ttls = {}
+    for item in filter(None, (part.strip() for part in raw.split(','))):
+        endpoint, _, value = item.partition('=')
+        try:
+            ttls[endpoint.strip()] = int(value)
+        except ValueError:
+            logger.warning(f"TTL de cache ignoré: {item}")
+    return ttls
+
+
+class LRUCache:
+    """LRU thread-safe borné par la taille totale des valeurs"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, size, _ = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl, size, tags=()):
+        size += ENTRY_OVERHEAD
+        with self._lock:
+            # L'ancienne valeur est retirée même si la nouvelle est trop grande
+            # pour être gardée : elle ne doit plus être servie
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return False
+            self._entries[key] = (value, time.time() + ttl, size, frozenset(tags))
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return True
+
+    def invalidate_tag(self, tag):
+        """Supprimer toutes les entrées portant le tag (ex: 'exercices')"""
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if tag in entry[3]]
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.current_bytes -= entry[2]
+
+    def get_stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+            'evictions': self.evictions
+        }
+
+
+class MongoSharedCache:
+    """Niveau partagé stocké dans MongoDB (expiration par index TTL)"""
+
+    def __init__(self, collection_name='cache_reponses'):
+        self.collection_name = collection_name
+        self._collection = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            with self._lock:
+                if self._collection is None:
+                    from config.database import get_db
+                    collection = get_db()[self.collection_name]
+                    collection.create_index('expire_le', expireAfterSeconds=0)
+                    collection.create_index('tags')
+                    self._collection = collection
+        return self._collection
+
+    def get(self, key):
+        try:
+            doc = self.collection.find_one({'_id': key, 'expire_le': {'$gt': datetime.utcnow()}})
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache partagé indisponible: {e}")
+            return None
+        if doc is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        ttl_restant = (doc['expire_le'] - datetime.utcnow()).total_seconds()
+        value = (doc['status'], doc['content_type'], bytes(doc['body']))
+        return value, ttl_restant, doc.get('tags', [])
+
+    def set(self, key, value, ttl, tags=()):
+        status, content_type, body = value
+        try:
+            self.collection.replace_one({'_id': key}, {
+                '_id': key,
+                'status': status,
+                'content_type': content_type,
+                'body': body,
+                'tags': list(tags),
+                'expire_le': datetime.utcnow() + timedelta(seconds=ttl)
+            }, upsert=True)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Écriture du cache partagé impossible: {e}")
+
+    def invalidate_tag(self, tag):
+        try:
+            return self.collection.delete_many({'tags': tag}).deleted_count
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Invalidation du cache partagé impossible: {e}")
+            return 0
+
+    def get_stats(self):
+        return {'backend': 'mongo', 'collection': self.collection_name,
+                'hits': self.hits, 'misses': self.misses, 'errors': self.errors}
+
+
+class ResponseCache:
+    """Cache de réponses à deux niveaux (local puis partagé)"""
+
+    def __init__(self, local, shared=None, ttl_overrides=None):
+        self.local = local
+        self.shared = shared
+        self.ttl_overrides = ttl_overrides or {}
+
+    def ttl_for(self, endpoint, default):
+        return self.ttl_overrides.get(endpoint, default)
+
+    def get(self, key):
+        """Retourne (valeur, niveau) ou (None, None)"""
+        value = self.local.get(key)
+        if value is not None:
+            return value, 'local'
+        if self.shared is not None:
+            found = self.shared.get(key)
+            if found is not None:
+                value, ttl_restant, tags = found
+                self.local.set(key, value, ttl_restant, len(value[2]), tags)
+                return value, 'shared'
+        return None, None
+
+    def set(self, key, value, ttl, tags=()):
+        self.local.set(key, value, ttl, len(value[2]), tags)
+        if self.shared is not None:
+            self.shared.set(key, value, ttl, tags)
+
+    def invalidate_tag(self, tag, local_only=False):
+        removed = self.local.invalidate_tag(tag)
+        if self.shared is not None and not local_only:
+            removed += self.shared.invalidate_tag(tag)
+        return removed
+
+    def clear(self):
+        self.local.clear()
+
+    def get_stats(self):
+        return {
+            'local': self.local.get_stats(),
+            'shared': self.shared.get_stats() if self.shared is not None else None
+        }
+
+
+def _build_response_cache():
+    shared = None
+    if os.getenv('CACHE_SHARED_TIER', '').lower() == 'mongo':
+        shared = MongoSharedCache(os.getenv('CACHE_SHARED_COLLECTION', 'cache_reponses'))
+    return ResponseCache(
+        LRUCache(int(os.getenv('CACHE_MAX_BYTES', str(32 * 1024 * 1024)))),
+        shared,
+        _parse_ttls(os.getenv('CACHE_TTLS', ''))
+    )
+
+
+# Instance globale (une par worker)
+response_cache = _build_response_cache()
+
+
+def auth_scope():
+    """Portée d'authentification de la requête : anonymous, user ou admin"""
+    token = request.cookies.get('access_token')
+    auth_header = request.headers.get('Authorization', '')
+    if not token and auth_header.startswith('Bearer '):
+        token = auth_header.split(' ', 1)[1]
+    if not token:
+        return 'anonymous'
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return 'anonymous'
+    return 'admin' if payload.get('role') == 'admin' else 'user'
+
+
+def normalized_query():
+    """Query args triés, sans valeurs vides, valeurs multiples triées"""
+    items = []
+    for key in sorted(request.args.keys()):
+        values = sorted(v.strip() for v in request.args.getlist(key) if v.strip())
+        if values:
+            items.append(f"{key}={','.join(values)}")
+    return '&'.join(items)
+
+
+def cache_key(scope, versions=''):
+    view_args = '&'.join(f"{k}={v}" for k, v in sorted((request.view_args or {}).items()))
+    return f"{request.endpoint}|{view_args}|{normalized_query()}|{scope}|{versions}"
+
+
+def cached_route(ttl=300, tags=()):
+    """
+    Décorateur de mise en cache des réponses GET réussies
+
+    Args:
+        ttl: Durée de vie par défaut en secondes (surchargeable via CACHE_TTLS)
+        tags: Collections dont dépend la réponse, pour l'invalidation
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != 'GET' or os.getenv('DISABLE_RESPONSE_CACHE') == 'true':
+                return f(*args, **kwargs)
+
+            # Versions lues avant le handler : une écriture concurrente rend la
+            # clé obsolète au lieu d'y ranger un corps périmé (une version plus
+            # récente évince aussi les entrées locales de la collection)
+            try:
+                from utils.versions import collection_versions
+                versions = ','.join(f"{tag}.{collection_versions.token(tag)}" for tag in tags)
+            except Exception as e:
+                logger.warning(f"Versions indisponibles, cache ignoré: {e}")
+                return f(*args, **kwargs)
+
+            key = cache_key(auth_scope(), versions)
+            cached, tier = response_cache.get(key)
+            if cached is not None:
+                status, content_type, body = cached
+                response = make_response(body, status)
+                response.headers['Content-Type'] = content_type
+                response.headers['X-Cache'] = f"HIT-{tier.upper()}"
+                return response
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                response_cache.set(
+                    key,
+                    (response.status_code, response.content_type, response.get_data()),
+                    response_cache.ttl_for(request.endpoint, ttl),
+                    tags
+                )
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return decorated_function
+    return decorator
+
+
+def invalidate_cache(*tags):
+    """À appeler après une écriture sur les collections concernées"""
+    for tag in tags:
+        removed = response_cache.invalidate_tag(tag)
+        logger.info(f"Cache invalidé pour {tag}: {removed} entrée(s)")
@@ -0,0 +1,184 @@
+"""
+Compression des réponses HTTP (gzip, brotli) pour l'application Flask
+
+- négociation de Accept-Encoding (q-values, q=0, *) ;
+- compression au-delà de COMPRESSION_MIN_BYTES des types textuels uniquement ;
+- réponses déjà encodées, streamées, 204/304 et HEAD laissées intactes ;
+- variantes compressées des réponses cacheables (ETag ou X-Cache) gardées en
+  mémoire pour ne compresser qu'une fois ;
+- ratio et coût CPU par endpoint exposés dans /metrics/performance.
+
+brotli est optionnel : sans le paquet `brotli`, seul gzip est proposé.
+"""
+
+import os
+import gzip
+import time
+import hashlib
+import threading
+from flask import request
+from utils.cache import LRUCache
+import logging
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/javascript', 'application/xml',
+    'application/x-ndjson', 'image/svg+xml'
+}
+# En dessous de cette taille, le gain ne compense pas le coût CPU
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '5'))
+
+
+def available_encodings():
+    """Encodages proposés, par ordre de préférence serveur"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(accept_encoding, available=None):
+    """Choisit l'encodage selon Accept-Encoding (None si aucun acceptable)"""
+    if available is None:
+        available = available_encodings()
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            weights[coding] = q
+    best, best_q = None, 0.0
+    for coding in available:
+        q = weights.get(coding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress_bytes(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, GZIP_LEVEL)
+
+
+class CompressionStats:
+    def __init__(self):
+        self.by_endpoint = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, encoding, size_in, size_out, cpu_seconds, cached):
+        with self._lock:
+            stats = self.by_endpoint.setdefault(endpoint, {
+                'responses': 0, 'bytes_in': 0, 'bytes_out': 0,
+                'cpu_seconds': 0.0, 'variant_cache_hits': 0, 'encodings': {}
+            })
+            stats['responses'] += 1
+            stats['bytes_in'] += size_in
+            stats['bytes_out'] += size_out
+            stats['cpu_seconds'] += cpu_seconds
+            stats['variant_cache_hits'] += 1 if cached else 0
+            stats['encodings'][encoding] = stats['encodings'].get(encoding, 0) + 1
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                endpoint: {
+                    **stats,
+                    'ratio': stats['bytes_out'] / stats['bytes_in'] if stats['bytes_in'] else None,
+                    'avg_cpu_ms': stats['cpu_seconds'] * 1000 / stats['responses']
+                }
+                for endpoint, stats in self.by_endpoint.items()
+            }
+
+
+# Instances globales
+compression_stats = CompressionStats()
+compressed_variants = LRUCache(int(os.getenv('COMPRESSION_CACHE_BYTES', str(8 * 1024 * 1024))))
+
+
+def _is_compressible(response):
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_MIMETYPES
+
+
+def _variant_key(response, data, encoding):
+    """Clé de variante pour les réponses cacheables, None sinon"""
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        return f"{request.endpoint}|etag:{etag}|{encoding}"
+    if 'X-Cache' in response.headers:
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        return f"{request.endpoint}|body:{digest}|{encoding}"
+    return None
+
+
+def compress_response_object(response, min_bytes=None, force=False):
+    """Compresse la réponse en place si le client et le contenu s'y prêtent"""
+    min_bytes = COMPRESSION_MIN_BYTES if min_bytes is None else min_bytes
+    if (request.method == 'HEAD'
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or (not force and not _is_compressible(response))):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < min_bytes:
+        return response
+
+    key = _variant_key(response, data, encoding)
+    compressed = compressed_variants.get(key) if key else None
+    cached = compressed is not None
+    cpu_start = time.thread_time()
+    if not cached:
+        compressed = compress_bytes(data, encoding)
+        if key:
+            compressed_variants.set(key, compressed, 3600, len(compressed))
+    cpu_seconds = time.thread_time() - cpu_start
+    if len(compressed) >= len(data):
+        return response
+
+    from utils.versions import encoded_etag
+    etag, weak = response.get_etag()
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    if etag and not weak:
+        response.headers['ETag'] = encoded_etag(f'"{etag}"', encoding)
+    compression_stats.record(request.endpoint or 'unknown', encoding, len(data),
+                             len(compressed), cpu_seconds, cached)
+    return response
+
+
+def compress_responses(app):
+    """Middleware de compression de toutes les réponses éligibles"""
+
+    if os.getenv('DISABLE_COMPRESSION') == 'true':
+        return app
+
+    @app.after_request
+    def compress_after_request(response):
+        try:
+            return compress_response_object(response)
+        except Exception as e:
+            logger.error(f"Compression impossible: {e}")
+            return response
+
+    return app
@@ -0,0 +1,163 @@
+"""
+Compteurs "chauds" bufferisés par worker
+
+Incrémenter un compteur à chaque requête (ex: nombre de sessions d'une
+méditation populaire) concentre les écritures sur un seul document. Les
+incréments sont cumulés en mémoire puis écrits périodiquement en un seul
+bulk_write de $inc par collection.
+
+Perte maximale en cas de crash : les incréments des COUNTER_FLUSH_INTERVAL
+dernières secondes (ou COUNTER_MAX_PENDING clés si atteint avant). Le buffer
+est vidé à l'arrêt du processus (atexit) et peut l'être explicitement via
+flush(). Le retard de flush est exposé dans /metrics/performance.
+"""
+
+import os
+import time
+import atexit
+import threading
+from collections import defaultdict
+from pymongo import UpdateOne
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedCounters:
+    def __init__(self, flush_interval=5.0, max_pending=10000):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        # (collection, _id, champ) -> incrément cumulé
+        self._pending = defaultdict(int)
+        # Date du plus ancien incrément non écrit (pour le retard de flush)
+        self._oldest_pending = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self._thread = None
+        self._db = None
+        self.increments = 0
+        self.flushes = 0
+        self.flushed_operations = 0
+        self.failures = 0
+        self.last_flush_at = None
+        self.last_flush_duration = None
+        self.max_flush_lag = 0.0
+
+    def incr(self, collection, doc_id, field, amount=1):
+        """Cumuler un incrément (écrit au prochain flush)"""
+        self._ensure_started()
+        with self._lock:
+            if self._oldest_pending is None:
+                self._oldest_pending = time.time()
+            self._pending[(collection, doc_id, field)] += amount
+            self.increments += 1
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def _ensure_started(self):
+        # Un thread par processus, relancé après un fork
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Processus forké : les incréments hérités appartiennent au parent
+                self._pending = defaultdict(int)
+                self._oldest_pending = None
+            self._pid = os.getpid()
+            self._db = None
+            self._thread = threading.Thread(target=self._run, name='counter-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Thread de flush des compteurs: {e}")
+
+    def _database(self):
+        if self._db is None:
+            from config.database import get_db
+            self._db = get_db()
+        return self._db
+
+    def flush(self):
+        """Écrire les incréments en attente ; retourne le nombre d'opérations"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, defaultdict(int)
+                oldest, self._oldest_pending = self._oldest_pending, None
+            if not pending:
+                return 0
+
+            started = time.time()
+            by_collection = defaultdict(lambda: defaultdict(dict))
+            for (collection, doc_id, field), amount in pending.items():
+                if amount:
+                    by_collection[collection][doc_id][field] = amount
+
+            written = 0
+            for collection, documents in by_collection.items():
+                operations = [UpdateOne({'_id': doc_id}, {'$inc': fields})
+                              for doc_id, fields in documents.items()]
+                try:
+                    self._database()[collection].bulk_write(operations, ordered=False)
+                    written += len(operations)
+                except Exception as e:
+                    # Réinjecter les incréments de cette collection pour le prochain flush
+                    self.failures += 1
+                    logger.error(f"Flush des compteurs {collection} impossible: {e}")
+                    self._requeue(collection, documents, oldest)
+
+            finished = time.time()
+            self.flushes += 1
+            self.flushed_operations += written
+            self.last_flush_at = finished
+            self.last_flush_duration = finished - started
+            self.max_flush_lag = max(self.max_flush_lag, finished - oldest)
+            return written
+
+    def _requeue(self, collection, documents, oldest):
+        with self._lock:
+            for doc_id, fields in documents.items():
+                for field, amount in fields.items():
+                    self._pending[(collection, doc_id, field)] += amount
+            if self._oldest_pending is None or oldest < self._oldest_pending:
+                self._oldest_pending = oldest
+
+    def flush_lag(self):
+        """Âge (s) du plus ancien incrément pas encore écrit"""
+        oldest = self._oldest_pending
+        return time.time() - oldest if oldest is not None else 0.0
+
+    def get_stats(self):
+        return {
+            'pending_keys': len(self._pending),
+            'flush_lag': self.flush_lag(),
+            'max_flush_lag': self.max_flush_lag,
+            'flush_interval': self.flush_interval,
+            'increments': self.increments,
+            'flushes': self.flushes,
+            'flushed_operations': self.flushed_operations,
+            'failures': self.failures,
+            'last_flush_at': self.last_flush_at,
+            'last_flush_ms': self.last_flush_duration * 1000
+            if self.last_flush_duration is not None else None
+        }
+
+
+# Instance globale
+hot_counters = BufferedCounters(
+    flush_interval=float(os.getenv('COUNTER_FLUSH_INTERVAL', '5.0')),
+    max_pending=int(os.getenv('COUNTER_MAX_PENDING', '10000'))
+)
+
+# Vider le buffer à l'arrêt normal du processus
+atexit.register(hot_counters.flush)
@@ -0,0 +1,294 @@
+"""
+Export des données d'un utilisateur (portabilité), en mémoire constante
+
+Le profil, l'historique (archives comprises), les évaluations, les sessions
+et les agrégats d'activité sont lus par curseurs triés par _id et encodés
+ligne par ligne en NDJSON ({"type": ..., ...document}) ou en CSV (une section
+à la fois) ; les lignes sont regroupées en morceaux d'au plus
+EXPORT_CHUNK_BYTES avant d'être envoyées, le tampon ne grossit jamais.
+
+Reprise : le plan de l'export (nombre de lignes par section, dernier _id)
+est figé au début et donne l'ETag, avec la date de modification la plus
+récente des sections modifiées en place (profil, évaluations, sessions,
+activité) ; l'historique n'est jamais modifié, seulement ajouté ou
+supprimé. Une requête `Range: lines=N-` avec `If-Range: <etag>` reprend à
+la ligne N (saut par cursor.skip dans la section concernée) tant que les
+données n'ont pas changé.
+
+Pour les très gros comptes, start_export_job met en file (jobs/queue.py)
+l'écriture de l'export dans un fichier gzip (EXPORT_DIR), avec la
+progression dans `exports`.
+"""
+
+import os
+import csv
+import io
+import gzip
+import hashlib
+from datetime import datetime
+from bson import ObjectId
+from utils.json_provider import encode, mongo_default
+from utils.history_store import historiques
+from utils.archive import ARCHIVE_COLLECTION, decode_rows
+from jobs.queue import task, enqueue
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHUNK_BYTES = int(os.getenv('EXPORT_CHUNK_BYTES', str(64 * 1024)))
+CURSOR_BATCH = int(os.getenv('EXPORT_CURSOR_BATCH', '500'))
+EXPORT_DIR = os.getenv('EXPORT_DIR', '/tmp/cesizen-exports')
+EXPORTS_COLLECTION = 'exports'
+
+FORMATS = ('ndjson', 'csv')
+
+# Colonnes CSV par section
+CSV_COLUMNS = {
+    'profil': ('_id', 'nom', 'prenom', 'email', 'role', 'est_actif', 'date_creation'),
+    'historiques': ('_id', 'date_execution', 'id_exercice', 'nombre_cycles', 'id_client'),
+    'evaluations': ('_id', 'meditation_id', 'note', 'date_creation', 'date_modification'),
+    'sessions': ('_id', 'meditation_id', 'statut', 'duree_prevue', 'humeur_avant',
+                 'humeur_apres', 'date_debut', 'date_fin'),
+    'activite': ('jour', 'exercices', 'secondes'),
+}
+
+
+class ExportSection:
+    """
+    Section exportée : collection, filtre, projection, type des lignes NDJSON,
+    et champ de date de modification des documents modifiés en place
+    """
+
+    def __init__(self, name, record_type, collection, query, projection=None, modified=None):
+        self.name = name
+        self.record_type = record_type
+        self.collection = collection
+        self.query = query
+        self.projection = projection
+        self.modified = modified
+
+    def version(self):
+        """Date de modification la plus récente (None si la section n'est qu'ajoutée)"""
+        if self.modified is None:
+            return None
+        latest = self.collection.find_one({**self.query, self.modified: {'$ne': None}},
+                                          {self.modified: 1}, sort=[(self.modified, -1)])
+        return latest and latest.get(self.modified)
+
+    def plan(self):
+        """(lignes, dernier _id) figés au début de l'export"""
+        last = self.collection.find_one(self.query, {'_id': 1}, sort=[('_id', -1)])
+        if last is None:
+            return 0, None
+        return self.collection.count_documents({**self.query, '_id': {'$lte': last['_id']}}), last['_id']
+
+    def documents(self, last_id, skip=0):
+        if last_id is None:
+            return iter(())
+        query = {**self.query, '_id': {'$lte': last_id}}
+        # allow_disk_use : tri côté serveur sans limite mémoire (time-series sans index _id)
+        return self.collection.find(query, self.projection).sort('_id', 1) \
+            .skip(skip).batch_size(CURSOR_BATCH).allow_disk_use(True)
+
+
+class ProfileSection(ExportSection):
+    """Profil : un seul document, modifié par plusieurs routes sans date commune"""
+
+    def version(self):
+        profile = self.collection.find_one(self.query, self.projection)
+        return profile and hashlib.blake2b(encode(profile), digest_size=8).hexdigest()
+
+
+class ArchiveSection(ExportSection):
+    """Lignes d'historique archivées (utils/archive.py), mois par mois"""
+
+    def plan(self):
+        archives = list(self.collection.find(self.query, {'_id': 1, 'lignes': 1}).sort('_id', 1))
+        if not archives:
+            return 0, None
+        return sum(archive.get('lignes', 0) for archive in archives), archives[-1]['_id']
+
+    def documents(self, last_id, skip=0):
+        if last_id is None:
+            return
+        archives = self.collection.find(self.query, {'codec': 1, 'donnees': 1, 'lignes': 1}) \
+            .sort('_id', 1).batch_size(1)
+        for archive in archives:
+            if archive['_id'] > last_id:
+                return
+            # Archives entièrement sautées sans être décompressées
+            if skip >= archive.get('lignes', 0):
+                skip -= archive.get('lignes', 0)
+                continue
+            rows = decode_rows(archive['codec'], archive['donnees'])
+            for row in rows[skip:]:
+                yield row
+            skip = 0
+
+
+def _user_keys(user_id):
+    # Les anciens modèles stockent parfois user_id en chaîne
+    return {'$in': [user_id, str(user_id)]}
+
+
+class UserExport:
+    def __init__(self, db, user_id, fmt='ndjson', section=None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Format inconnu: {fmt}")
+        self.db = db
+        self.user_id = user_id
+        self.format = fmt
+        sections = [
+            ProfileSection('profil', 'profil', db.utilisateurs, {'_id': user_id},
+                           {'mot_de_passe': 0}),
+            ArchiveSection('historiques_archives', 'historique', db[ARCHIVE_COLLECTION],
+                           {'id_utilisateur': user_id}),
+            ExportSection('historiques', 'historique', historiques(db), {'id_utilisateur': user_id}),
+            ExportSection('evaluations', 'evaluation', db.evaluations, {'user_id': _user_keys(user_id)},
+                          modified='date_modification'),
+            # Une session n'est modifiée qu'à sa fin (statut, humeur_apres, date_fin)
+            ExportSection('sessions', 'session', db.sessions, {'user_id': _user_keys(user_id)},
+                          modified='date_fin'),
+            ExportSection('activite', 'activite', db.activite_quotidienne,
+                          {'id_utilisateur': user_id}, {'_id': 0, 'id_utilisateur': 0, 'modifie_le': 0},
+                          modified='modifie_le'),
+        ]
+        if fmt == 'csv':
+            # Le CSV n'a qu'un jeu de colonnes : une section (historiques par défaut)
+            section = section or 'historiques'
+            if section not in CSV_COLUMNS:
+                raise ValueError(f"Section inconnue: {section}")
+            self.columns = CSV_COLUMNS[section]
+        elif section is not None and section not in CSV_COLUMNS:
+            raise ValueError(f"Section inconnue: {section}")
+        if section is not None:
+            wanted = ('historiques_archives', 'historiques') if section == 'historiques' else (section,)
+            sections = [s for s in sections if s.name in wanted]
+        self.sections = sections
+        self._plan = None
+        self._versions = None
+
+    def plan(self):
+        """[(section, lignes, dernier _id)] calculé une fois"""
+        if self._plan is None:
+            self._versions = [section.version() for section in self.sections]
+            self._plan = [(section,) + section.plan() for section in self.sections]
+        return self._plan
+
+    @property
+    def total_lines(self):
+        return sum(lines for _, lines, _ in self.plan()) + (1 if self.format == 'csv' else 0)
+
+    @property
+    def etag(self):
+        digest = hashlib.blake2b(digest_size=12)
+        digest.update(f"{self.user_id}:{self.format}".encode())
+        for (section, lines, last_id), version in zip(self.plan(), self._versions):
+            digest.update(f"|{section.name}:{lines}:{last_id}:{version}".encode())
+        return digest.hexdigest()
+
+    def _encode(self, section, document):
+        if self.format == 'ndjson':
+            return encode({'type': section.record_type, **document}) + b'\n'
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow([_csv_value(document.get(column))
+                                     for column in self.columns])
+        return buffer.getvalue().encode('utf-8')
+
+    def lines(self, start=0):
+        """Lignes encodées à partir de la ligne `start` (0 = début)"""
+        if self.format == 'csv':
+            if start == 0:
+                yield (','.join(self.columns) + '\r\n').encode('utf-8')
+            else:
+                start -= 1
+        for section, count, last_id in self.plan():
+            if start >= count:
+                start -= count
+                continue
+            for document in section.documents(last_id, start):
+                yield self._encode(section, document)
+            start = 0
+
+    def chunks(self, start=0, chunk_bytes=CHUNK_BYTES):
+        """Lignes regroupées en morceaux bornés (tampon de taille constante)"""
+        buffer = bytearray()
+        for line in self.lines(start):
+            buffer += line
+            if len(buffer) >= chunk_bytes:
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return mongo_default(value)
+
+
+def write_export_file(export, path, progress=None, every=10000):
+    """Écrire l'export dans un fichier gzip ; retourne (lignes, octets non compressés)"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    lines = size = 0
+    with gzip.open(path + '.part', 'wb') as output:
+        for line in export.lines():
+            output.write(line)
+            lines += 1
+            size += len(line)
+            if progress and lines % every == 0:
+                progress(lines, size)
+    os.replace(path + '.part', path)
+    return lines, size
+
+
+def start_export_job(db, user_id, fmt='ndjson', section=None, requested_by=None):
+    """Export en arrière-plan vers EXPORT_DIR (file de tâches) ; retourne le document de suivi"""
+    export = UserExport(db, user_id, fmt, section)
+    export_id = ObjectId()
+    extension = 'ndjson' if fmt == 'ndjson' else 'csv'
+    job = {
+        '_id': export_id,
+        'id_utilisateur': user_id,
+        'format': fmt,
+        'section': section,
+        'statut': 'en_attente',
+        'chemin': os.path.join(EXPORT_DIR, f"{user_id}-{export_id}.{extension}.gz"),
+        'lignes_total': export.total_lines,
+        'lignes': 0,
+        'demande_par': requested_by,
+        'demande_le': datetime.utcnow()
+    }
+    db[EXPORTS_COLLECTION].insert_one(job)
+    job['tache'] = enqueue('export_utilisateur', {'export_id': export_id}, db=db)
+    return job
+
+
+@task('export_utilisateur', priority=10)
+def run_export(db, donnees):
+    """Écrire le fichier d'un export demandé ; une exception laisse la file réessayer"""
+    exports = db[EXPORTS_COLLECTION]
+    job = exports.find_one({'_id': donnees['export_id']})
+    if job is None:
+        return {'ignore': 'export introuvable'}
+    export = UserExport(db, job['id_utilisateur'], job['format'], job.get('section'))
+    exports.update_one({'_id': job['_id']}, {'$set': {
+        'statut': 'en_cours', 'debut': datetime.utcnow(), 'lignes_total': export.total_lines}})
+
+    def progress(lines, size):
+        exports.update_one({'_id': job['_id']}, {'$set': {'lignes': lines, 'octets': size}})
+
+    try:
+        lines, size = write_export_file(export, job['chemin'], progress)
+    except Exception as e:
+        logger.error(f"Export {job['_id']} en échec: {e}")
+        exports.update_one({'_id': job['_id']}, {'$set': {'statut': 'erreur', 'erreur': str(e)}})
+        raise
+    exports.update_one({'_id': job['_id']}, {'$set': {
+        'statut': 'termine', 'lignes': lines, 'octets': size,
+        'octets_fichier': os.path.getsize(job['chemin']), 'fin': datetime.utcnow()},
+        '$unset': {'erreur': ''}})
+    return {'lignes': lines, 'octets': size}
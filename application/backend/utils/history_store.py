@@ -0,0 +1,78 @@
+"""
+Collection de stockage de l'historique des exercices
+
+L'historique peut être stocké dans la collection classique
+`historiques_exercices` ou dans une collection time-series (MongoDB 5.0+,
+timeField `date_execution`, metaField `id_utilisateur`). Le nom de la
+collection active est lu dans un document pointeur
+({_id: 'historiques', collection: <nom>} dans `stockage_collections`) :
+jobs/history_storage.py migre les données puis bascule ce pointeur en une
+seule écriture, que chaque worker relit au plus toutes les
+HISTORY_STORE_REFRESH_SECONDS secondes.
+
+Les routes et tâches accèdent à l'historique via historiques(db) plutôt que
+db.historiques_exercices.
+"""
+
+import os
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+POINTER_COLLECTION = 'stockage_collections'
+HISTORY_KEY = 'historiques'
+DEFAULT_COLLECTION = 'historiques_exercices'
+
+
+class HistoryStore:
+    def __init__(self, refresh_interval=5.0):
+        self.refresh_interval = refresh_interval
+        self._name = DEFAULT_COLLECTION
+        self._seen_at = None
+        self._lock = threading.Lock()
+        self.switches = 0
+
+    def collection_name(self, db):
+        """Nom de la collection active (relu au plus une fois par refresh_interval)"""
+        now = time.monotonic()
+        if self._seen_at is not None and now - self._seen_at < self.refresh_interval:
+            return self._name
+        with self._lock:
+            if self._seen_at is None or now - self._seen_at >= self.refresh_interval:
+                try:
+                    pointer = db[POINTER_COLLECTION].find_one({'_id': HISTORY_KEY})
+                except Exception as e:
+                    # Base indisponible : conserver la dernière collection connue
+                    logger.error(f"Lecture du pointeur d'historique impossible: {e}")
+                    pointer = {'collection': self._name}
+                name = (pointer or {}).get('collection') or DEFAULT_COLLECTION
+                if name != self._name:
+                    logger.info(f"Historique: bascule de {self._name} vers {name}")
+                    self.switches += 1
+                self._name = name
+                self._seen_at = now
+        return self._name
+
+    def collection(self, db):
+        return db[self.collection_name(db)]
+
+    def invalidate(self):
+        """Forcer la relecture du pointeur (après une bascule locale)"""
+        self._seen_at = None
+
+    def get_stats(self):
+        return {'collection': self._name, 'switches': self.switches,
+                'refresh_interval': self.refresh_interval}
+
+
+# Instance globale
+history_store = HistoryStore(
+    refresh_interval=float(os.getenv('HISTORY_STORE_REFRESH_SECONDS', '5.0'))
+)
+
+
+def historiques(db):
+    """Collection active de l'historique des exercices"""
+    return history_store.collection(db)
@@ -0,0 +1,195 @@
+"""
+Identity map par requête
+
+Un document chargé une fois pendant une requête (par _id ou par un filtre
+déjà exécuté) est ensuite servi depuis la mémoire pour le reste de la
+requête. Les écritures passées par la map mettent à jour (ou évincent) les
+documents concernés, ce qui évite de relire un document juste après l'avoir
+modifié.
+
+La map vit dans flask.g : elle disparaît à la fin de la requête. En debug
+(ou IDENTITY_MAP_DEBUG=true), l'en-tête X-Identity-Map et les logs indiquent
+les requêtes dupliquées évitées.
+"""
+
+import os
+import copy
+import threading
+from flask import g, has_app_context, current_app, request
+from bson import ObjectId
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _freeze(value):
+    """Représentation hashable d'un filtre MongoDB"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class IdentityMap:
+    def __init__(self, db=None):
+        self._db = db
+        # (collection, _id) -> document (None : absent en base)
+        self._documents = {}
+        # (collection, filtre figé) -> _id du résultat (None : aucun résultat)
+        self._queries = {}
+        self.loads = 0
+        self.hits = 0
+        self.duplicates = {}
+
+    @property
+    def db(self):
+        if self._db is None:
+            from config.database import get_db
+            self._db = get_db()
+        return self._db
+
+    def _hit(self, label):
+        self.hits += 1
+        self.duplicates[label] = self.duplicates.get(label, 0) + 1
+
+    def get(self, collection, document_id):
+        """Document par _id, chargé au plus une fois par requête"""
+        if isinstance(document_id, str) and ObjectId.is_valid(document_id):
+            document_id = ObjectId(document_id)
+        key = (collection, document_id)
+        if key in self._documents:
+            self._hit(f"{collection}._id")
+            return self._documents[key]
+        self.loads += 1
+        document = self.db[collection].find_one({'_id': document_id})
+        self._documents[key] = document
+        return document
+
+    def find_one(self, collection, filter):
+        """find_one mémorisé : un même filtre n'est exécuté qu'une fois"""
+        if set(filter) == {'_id'} and not isinstance(filter['_id'], dict):
+            return self.get(collection, filter['_id'])
+        query_key = (collection, _freeze(filter))
+        if query_key in self._queries:
+            self._hit(f"{collection}.{','.join(sorted(filter))}")
+            document_id = self._queries[query_key]
+            return None if document_id is None else self._documents.get((collection, document_id))
+        self.loads += 1
+        document = self.db[collection].find_one(filter)
+        self._queries[query_key] = document['_id'] if document else None
+        if document is not None:
+            # Le document chargé par filtre est aussi servi par _id
+            self._documents.setdefault((collection, document['_id']), document)
+        return document
+
+    def register(self, collection, document):
+        """Ajouter un document chargé ailleurs (ex: utilisateur authentifié)"""
+        if document is not None and '_id' in document:
+            self._documents[(collection, document['_id'])] = document
+        return document
+
+    def update_one(self, collection, document_id, update):
+        """update_one par _id ; le document en mémoire reflète l'écriture"""
+        result = self.db[collection].update_one({'_id': document_id}, update)
+        self._forget_queries(collection)
+        key = (collection, document_id)
+        document = self._documents.get(key)
+        simple_set = set(update) == {'$set'} and not any('.' in field for field in update['$set'])
+        if document is not None and simple_set and result.matched_count:
+            document.update(copy.deepcopy(update['$set']))
+        else:
+            # Opérateurs non rejoués localement : relecture au prochain accès
+            self._documents.pop(key, None)
+        return result
+
+    def merge(self, collection, document):
+        """Intégrer un document renvoyé par une écriture (find_one_and_update, ...)"""
+        if document is None:
+            return None
+        self._forget_queries(collection)
+        current = self._documents.get((collection, document['_id']))
+        if current is not None:
+            current.update(document)
+            return current
+        return self.register(collection, document)
+
+    def evict(self, collection, document_id=None):
+        self._forget_queries(collection)
+        if document_id is None:
+            for key in [key for key in self._documents if key[0] == collection]:
+                del self._documents[key]
+        else:
+            self._documents.pop((collection, document_id), None)
+
+    def _forget_queries(self, collection):
+        # Une écriture peut changer le résultat de n'importe quel filtre de la collection
+        for key in [key for key in self._queries if key[0] == collection]:
+            del self._queries[key]
+
+    def report(self):
+        return {'loads': self.loads, 'duplicates_avoided': self.hits,
+                'by_query': dict(self.duplicates)}
+
+
+class IdentityMapStats:
+    """Totaux sur toutes les requêtes du worker"""
+
+    def __init__(self):
+        self.requests = 0
+        self.loads = 0
+        self.duplicates_avoided = 0
+        self.by_endpoint = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, identity_map):
+        with self._lock:
+            self.requests += 1
+            self.loads += identity_map.loads
+            self.duplicates_avoided += identity_map.hits
+            if identity_map.hits:
+                self.by_endpoint[endpoint] = self.by_endpoint.get(endpoint, 0) + identity_map.hits
+
+    def get_stats(self):
+        return {
+            'requests': self.requests,
+            'loads': self.loads,
+            'duplicates_avoided': self.duplicates_avoided,
+            'duplicates_avoided_by_endpoint': dict(self.by_endpoint)
+        }
+
+
+# Instance globale
+identity_map_stats = IdentityMapStats()
+
+
+def identity_map():
+    """Identity map de la requête courante (nouvelle map hors contexte Flask)"""
+    if not has_app_context():
+        return IdentityMap()
+    if '_identity_map' not in g:
+        g._identity_map = IdentityMap()
+    return g._identity_map
+
+
+def init_identity_map(app):
+    """Rapport des requêtes dupliquées évitées (en-tête en debug, métriques)"""
+
+    debug_report = os.getenv('IDENTITY_MAP_DEBUG') == 'true'
+
+    @app.after_request
+    def identity_map_report(response):
+        current = g.get('_identity_map')
+        if current is None:
+            return response
+        endpoint = request.endpoint or 'unknown'
+        identity_map_stats.record(endpoint, current)
+        if (debug_report or current_app.debug) and current.hits:
+            report = current.report()
+            response.headers['X-Identity-Map'] = (
+                f"loads={report['loads']}; duplicates-avoided={report['duplicates_avoided']}"
+            )
+            logger.info(f"Identity map {endpoint}: {report}")
+        return response
+
+    return app
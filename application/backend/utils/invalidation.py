@@ -0,0 +1,245 @@
+"""
+Bus d'invalidation inter-workers pour les caches de catalogue
+
+Quand un admin modifie un catalogue, le worker qui a servi l'écriture
+publie (collection, version, epoch) ; chaque worker abonné met à jour sa
+version locale, ce qui évince ses entrées de cache. Backends disponibles
+(INVALIDATION_BACKEND) :
+- changestream : change stream MongoDB sur versions_collections (replica set requis)
+- polling : relecture périodique de versions_collections
+- unix : datagrammes sur sockets Unix entre workers d'une même machine
+- auto (défaut) : changestream si disponible, sinon polling
+- none : pas de propagation (un seul processus)
+
+Quel que soit le backend, les versions sont relues au plus tard après
+INVALIDATION_MAX_STALENESS secondes (voir utils/versions.py) : c'est la
+borne garantie de durée de vie d'une entrée périmée.
+"""
+
+import os
+import json
+import time
+import socket
+import threading
+from collections import deque
+from datetime import datetime
+from pymongo.errors import OperationFailure, PyMongoError
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationBus:
+    def __init__(self, backend='auto', collection_name='versions_collections',
+                 max_staleness=5.0, socket_dir='/tmp/cesizen-invalidation'):
+        self.backend = backend
+        self.collection_name = collection_name
+        self.max_staleness = max_staleness
+        self.poll_interval = max(0.1, max_staleness / 2)
+        self.socket_dir = socket_dir
+        self.active_backend = None
+        self._subscribers = []
+        self._pid = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._socket = None
+        self._start_lock = threading.Lock()
+        self._last_seen = {}
+        self.last_heartbeat = None
+        self.received = 0
+        self.published = 0
+        self.latencies = deque(maxlen=500)
+
+    def subscribe(self, callback):
+        """callback(name, version, epoch) appelé à chaque version reçue"""
+        self._subscribers.append(callback)
+
+    # ---- Démarrage (une fois par processus, y compris après un fork) ----
+
+    def ensure_started(self):
+        if self._pid == os.getpid() or self.backend == 'none':
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            self._last_seen = {}
+            self._thread = threading.Thread(target=self._run, name='invalidation-bus',
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._socket is not None:
+            try:
+                self._socket.close()
+                os.unlink(self._socket_path(os.getpid()))
+            except OSError:
+                pass
+            self._socket = None
+
+    def _collection(self):
+        from config.database import get_db
+        return get_db()[self.collection_name]
+
+    def _run(self):
+        backend = self.backend
+        if backend in ('auto', 'changestream'):
+            try:
+                self._run_change_stream()
+                return
+            except OperationFailure as e:
+                # Code 40573 : change streams indisponibles hors replica set
+                logger.warning(f"Change streams indisponibles ({e.code}), repli sur polling")
+                backend = 'polling'
+            except PyMongoError as e:
+                logger.warning(f"Change stream interrompu: {e}, repli sur polling")
+                backend = 'polling'
+        if backend == 'unix':
+            self._run_unix_socket()
+        else:
+            self._run_polling()
+
+    # ---- Backends ----
+
+    def _run_change_stream(self):
+        collection = self._collection()
+        pipeline = [{'$match': {'operationType': {'$in': ['insert', 'update', 'replace']}}}]
+        with collection.watch(pipeline, full_document='updateLookup',
+                              max_await_time_ms=int(self.poll_interval * 1000)) as stream:
+            self.active_backend = 'changestream'
+            logger.info("Bus d'invalidation: change stream actif")
+            while not self._stop.is_set():
+                change = stream.try_next()
+                self.last_heartbeat = time.time()
+                if change and change.get('fullDocument'):
+                    self._deliver_document(change['fullDocument'])
+
+    def _run_polling(self):
+        self.active_backend = 'polling'
+        logger.info(f"Bus d'invalidation: polling toutes les {self.poll_interval:.2f}s")
+        while not self._stop.is_set():
+            try:
+                for doc in self._collection().find({}):
+                    # Premier passage : état initial, pas une propagation mesurable
+                    self._deliver_document(doc, measure=doc['_id'] in self._last_seen)
+                self.last_heartbeat = time.time()
+            except PyMongoError as e:
+                logger.warning(f"Polling des versions impossible: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def _socket_path(self, pid):
+        return os.path.join(self.socket_dir, f"{pid}.sock")
+
+    def _run_unix_socket(self):
+        os.makedirs(self.socket_dir, exist_ok=True)
+        path = self._socket_path(os.getpid())
+        if os.path.exists(path):
+            os.unlink(path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(path)
+        sock.settimeout(self.poll_interval)
+        self._socket = sock
+        self.active_backend = 'unix'
+        logger.info(f"Bus d'invalidation: socket Unix {path}")
+        while not self._stop.is_set():
+            self.last_heartbeat = time.time()
+            try:
+                data = sock.recv(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                message = json.loads(data)
+            except ValueError:
+                continue
+            self._deliver(message['name'], message['version'], message['epoch'],
+                          message.get('published_at'))
+
+    # ---- Publication / réception ----
+
+    def publish(self, name, version, epoch):
+        """Diffuser une nouvelle version aux autres workers"""
+        self.published += 1
+        if self.active_backend != 'unix':
+            # changestream / polling : l'écriture dans versions_collections suffit
+            return
+        message = json.dumps({'name': name, 'version': version, 'epoch': epoch,
+                              'published_at': time.time()}).encode('utf-8')
+        own = self._socket_path(os.getpid())
+        for entry in os.listdir(self.socket_dir):
+            path = os.path.join(self.socket_dir, entry)
+            if not entry.endswith('.sock') or path == own:
+                continue
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+                    sender.sendto(message, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Worker disparu : nettoyer sa socket
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except OSError as e:
+                logger.warning(f"Publication vers {path} impossible: {e}")
+
+    def _deliver_document(self, doc, measure=True):
+        published_at = doc.get('modifie_le') if measure else None
+        if isinstance(published_at, datetime):
+            published_at = (published_at - datetime(1970, 1, 1)).total_seconds()
+        self._deliver(doc['_id'], doc.get('version', 0), doc.get('epoch', ''), published_at)
+
+    def _deliver(self, name, version, epoch, published_at=None):
+        if self._last_seen.get(name) == (version, epoch):
+            return
+        self._last_seen[name] = (version, epoch)
+        self.received += 1
+        if published_at:
+            self.latencies.append(max(0.0, time.time() - published_at))
+        for callback in self._subscribers:
+            try:
+                callback(name, version, epoch)
+            except Exception as e:
+                logger.error(f"Abonné d'invalidation en erreur: {e}")
+
+    def is_healthy(self):
+        if self.backend == 'none':
+            return True
+        return (self.last_heartbeat is not None
+                and time.time() - self.last_heartbeat < self.max_staleness)
+
+    def get_stats(self):
+        latencies = sorted(self.latencies)
+        return {
+            'backend': self.active_backend or self.backend,
+            'healthy': self.is_healthy(),
+            'max_staleness': self.max_staleness,
+            'published': self.published,
+            'received': self.received,
+            'propagation_latency': {
+                'samples': len(latencies),
+                'avg': sum(latencies) / len(latencies) if latencies else None,
+                'p95': latencies[int(len(latencies) * 0.95)] if latencies else None,
+                'max': latencies[-1] if latencies else None
+            }
+        }
+
+
+# Instance globale
+invalidation_bus = InvalidationBus(
+    backend=os.getenv('INVALIDATION_BACKEND', 'auto').lower(),
+    max_staleness=float(os.getenv('INVALIDATION_MAX_STALENESS', '5.0')),
+    socket_dir=os.getenv('INVALIDATION_SOCKET_DIR', '/tmp/cesizen-invalidation')
+)
+
+
+def init_invalidation(app):
+    """Démarre le bus dans chaque worker (paresseusement, fork-safe)"""
+
+    @app.before_request
+    def ensure_invalidation_bus():
+        invalidation_bus.ensure_started()
+
+    return app
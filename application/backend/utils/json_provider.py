@@ -0,0 +1,103 @@
+"""
+Fournisseur JSON Flask adapté aux documents MongoDB
+
+Sérialise directement ObjectId (chaîne hexadécimale), datetime / date
+(ISO 8601 ; les datetime naïfs de pymongo sont en UTC et reçoivent
++00:00) et Decimal128 / Decimal (chaîne, sans perte). Les routes peuvent
+renvoyer les documents (avec projection) sans copie champ par champ.
+
+orjson est utilisé s'il est installé ; sinon, ou pour les valeurs qu'il ne
+sait pas encoder (entiers > 64 bits), repli sur le json standard.
+"""
+
+import json
+import decimal
+from datetime import date, datetime, timezone
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    orjson = None
+
+
+def mongo_default(o):
+    """Conversion des types non JSON natifs (commune à orjson et json)"""
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, datetime):
+        if o.tzinfo is None:
+            o = o.replace(tzinfo=timezone.utc)
+        return o.isoformat()
+    if isinstance(o, date):
+        return o.isoformat()
+    if isinstance(o, Decimal128):
+        return str(o.to_decimal())
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class _StdlibEncoder(json.JSONEncoder):
+    def default(self, o):
+        return mongo_default(o)
+
+
+def _orjson_option(indent=None, sort_keys=False):
+    option = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return option
+
+
+def encode(obj, indent=None, sort_keys=False):
+    """Sérialisation en octets UTF-8, utilisable hors contexte Flask (exports, tâches)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=mongo_default, option=_orjson_option(indent, sort_keys))
+        except TypeError:
+            # orjson.JSONEncodeError : repli sur le json standard
+            pass
+    kwargs = {'indent': indent} if indent else {'separators': (',', ':')}
+    return json.dumps(obj, cls=_StdlibEncoder, ensure_ascii=False,
+                      sort_keys=sort_keys, **kwargs).encode('utf-8')
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """Provider Flask (app.json) : orjson si disponible, json sinon"""
+
+    def dumps_bytes(self, obj, indent=None, sort_keys=None):
+        """Sérialisation en octets UTF-8 (sans passer par str avec orjson)"""
+        return encode(obj, indent, self.sort_keys if sort_keys is None else sort_keys)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and set(kwargs) <= {'indent', 'sort_keys'}:
+            return self.dumps_bytes(obj, **kwargs).decode('utf-8')
+        kwargs.setdefault('cls', _StdlibEncoder)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = 2 if (self.compact is None and self._app.debug) or self.compact is False else None
+        return self._app.response_class(
+            self.dumps_bytes(obj, indent=indent) + b"\n", mimetype=self.mimetype
+        )
+
+
+def init_json_provider(app):
+    """Installer le provider sur l'application"""
+    app.json = MongoJSONProvider(app)
+    return app
@@ -0,0 +1,164 @@
+"""
+Chargement groupé de documents référencés (anti N+1)
+
+Une réponse qui référence N documents d'une autre collection (ex: les
+méditations de l'historique des sessions) les résout en une seule requête
+$in au lieu de N find_one. Un résumé projeté de chaque document est gardé
+dans un petit cache par worker (TTL court, invalidé quand la version de la
+collection change).
+"""
+
+import os
+import threading
+from bson import ObjectId
+from utils.cache import LRUCache
+from utils.versions import collection_versions
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentLoader:
+    def __init__(self, collection_name, fields, ttl=60, max_bytes=2 * 1024 * 1024):
+        """
+        Args:
+            collection_name: Collection des documents référencés
+            fields: Champs du résumé mis en cache
+            ttl: Durée de vie (s) d'un résumé dans le cache
+        """
+        self.collection_name = collection_name
+        self.projection = {field: 1 for field in fields}
+        self.ttl = ttl
+        self.cache = LRUCache(max_bytes)
+        self._collection = None
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.documents_loaded = 0
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            with self._lock:
+                if self._collection is None:
+                    from config.database import get_db
+                    self._collection = get_db()[self.collection_name]
+        return self._collection
+
+    def load_many(self, ids):
+        """
+        Résumés des documents demandés, en une requête au plus
+
+        Returns:
+            dict: id (tel que fourni, ObjectId ou chaîne) -> résumé ;
+            les ids introuvables ou invalides sont absents
+        """
+        requested = {}
+        for value in ids:
+            key = ObjectId(value) if isinstance(value, str) and ObjectId.is_valid(value) else value
+            if isinstance(key, ObjectId):
+                requested[value] = key
+
+        summaries = {}
+        missing = []
+        for key in set(requested.values()):
+            cached = self.cache.get(key)
+            if cached is None:
+                missing.append(key)
+            else:
+                summaries[key] = cached
+
+        if missing:
+            self.queries += 1
+            for document in self.collection.find({'_id': {'$in': missing}}, self.projection):
+                self.documents_loaded += 1
+                summaries[document['_id']] = document
+                size = sum(len(str(value)) for value in document.values())
+                self.cache.set(document['_id'], document, self.ttl, size)
+
+        return {value: summaries[key] for value, key in requested.items() if key in summaries}
+
+    def load(self, document_id):
+        found = self.load_many([document_id])
+        return next(iter(found.values()), None)
+
+    def invalidate(self):
+        self.cache.clear()
+
+    def get_stats(self):
+        return {
+            'collection': self.collection_name,
+            'queries': self.queries,
+            'documents_loaded': self.documents_loaded,
+            'cache': self.cache.get_stats()
+        }
+
+
+class CatalogIndex:
+    """
+    Résumés de tous les documents d'un petit catalogue (ex: exercices)
+
+    Rechargé en une requête quand la version de la collection change : valider
+    des milliers d'ids référencés ne coûte alors aucun accès à la base.
+    """
+
+    def __init__(self, collection_name, fields):
+        self.collection_name = collection_name
+        self.projection = {field: 1 for field in fields}
+        self._documents = {}
+        self._token = None
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.lookups = 0
+
+    def documents(self):
+        """_id -> résumé, à jour de la version courante du catalogue"""
+        token = collection_versions.token(self.collection_name)
+        if token != self._token:
+            with self._lock:
+                if token != self._token:
+                    from config.database import get_db
+                    self._documents = {document['_id']: document for document in
+                                       get_db()[self.collection_name].find({}, self.projection)}
+                    self._token = token
+                    self.reloads += 1
+        return self._documents
+
+    def get(self, document_id):
+        """Résumé d'un id (ObjectId ou chaîne), None s'il est invalide ou inconnu"""
+        self.lookups += 1
+        if isinstance(document_id, str) and ObjectId.is_valid(document_id):
+            document_id = ObjectId(document_id)
+        return self.documents().get(document_id) if isinstance(document_id, ObjectId) else None
+
+    def get_stats(self):
+        return {
+            'collection': self.collection_name,
+            'documents': len(self._documents),
+            'version': self._token,
+            'reloads': self.reloads,
+            'lookups': self.lookups
+        }
+
+
+def summary(document, fields):
+    """Sous-ensemble d'un résumé pour une réponse donnée"""
+    return {field: document.get(field) for field in fields}
+
+
+# Instance globale : résumés des méditations référencées par les sessions
+meditation_summaries = DocumentLoader(
+    'meditations',
+    ('titre', 'description', 'type_meditation', 'niveau_difficulte',
+     'duree_minutes', 'instructions'),
+    ttl=int(os.getenv('MEDITATION_SUMMARY_TTL', '60'))
+)
+
+# Instance globale : exercices référencés par l'import groupé d'historiques
+exercice_catalog = CatalogIndex(
+    'exercices', ('nom', 'duree_inspiration', 'duree_apnee', 'duree_expiration')
+)
+
+# Une méditation modifiée (version incrémentée) évince les résumés en cache
+collection_versions.subscribe(
+    lambda name, version: meditation_summaries.invalidate() if name == 'meditations' else None
+)
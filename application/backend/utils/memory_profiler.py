@@ -0,0 +1,263 @@
+"""
+Suivi des allocations mémoire (tracemalloc) pour l'application Flask
+"""
+
+import os
+import time
+import tracemalloc
+import linecache
+import threading
+import sysconfig
+from collections import OrderedDict
+from flask import request, g, jsonify
+from utils.auth_middleware import require_admin
+from utils.performance import performance_monitor
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Racine du backend, pour afficher des chemins relatifs (utils/..., routes/...)
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STDLIB_ROOT = os.path.abspath(sysconfig.get_paths()['stdlib'])
+
+# Fichiers ignorés dans les snapshots (bruit du profileur lui-même)
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+
+def module_group(filename):
+    """Regroupe un fichier par module applicatif (utils/*, routes/*, ...)"""
+    if filename.startswith('<'):
+        return 'stdlib'
+    path = os.path.abspath(filename)
+    if not path.startswith(BACKEND_ROOT + os.sep):
+        if 'site-packages' in path:
+            package = path.split('site-packages' + os.sep, 1)[1].split(os.sep, 1)[0]
+            return f"lib:{package}"
+        if path.startswith(STDLIB_ROOT + os.sep):
+            return 'stdlib'
+        return 'other'
+    relative = os.path.relpath(path, BACKEND_ROOT)
+    parts = relative.split(os.sep)
+    if len(parts) > 1:
+        return f"{parts[0]}/*"
+    return relative
+
+
+class MemoryProfiler:
+    def __init__(self, max_snapshots=10):
+        self.max_snapshots = max_snapshots
+        self.snapshots = OrderedDict()
+        self.started_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return tracemalloc.is_tracing()
+
+    def start(self, frames=10):
+        """Démarrer le traçage (frames = profondeur de pile conservée)"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self.started_at = time.time()
+            logger.info(f"Traçage mémoire activé ({frames} frames)")
+
+    def stop(self):
+        """Arrêter le traçage et libérer les snapshots"""
+        with self._lock:
+            self.snapshots.clear()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("Traçage mémoire désactivé")
+        self.started_at = None
+
+    def take_snapshot(self, name):
+        """Prendre un snapshot nommé (les plus anciens sont évincés)"""
+        if not self.enabled:
+            raise RuntimeError("Le traçage mémoire n'est pas actif")
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        with self._lock:
+            self.snapshots.pop(name, None)
+            self.snapshots[name] = (snapshot, time.time())
+            while len(self.snapshots) > self.max_snapshots:
+                self.snapshots.popitem(last=False)
+        return {
+            'name': name,
+            'size': sum(stat.size for stat in snapshot.statistics('filename')),
+        }
+
+    def list_snapshots(self):
+        with self._lock:
+            return [{'name': name, 'timestamp': taken_at}
+                    for name, (_, taken_at) in self.snapshots.items()]
+
+    def _get_snapshot(self, name):
+        if name is None:
+            if not self.enabled:
+                raise RuntimeError("Le traçage mémoire n'est pas actif")
+            return tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        with self._lock:
+            if name not in self.snapshots:
+                raise KeyError(name)
+            return self.snapshots[name][0]
+
+    def diff(self, old_name, new_name=None, limit=20):
+        """
+        Comparer deux snapshots (new_name=None : état courant)
+
+        Retourne les principaux sites d'allocation (fichier:ligne) et les
+        totaux regroupés par module applicatif.
+        """
+        old = self._get_snapshot(old_name)
+        new = self._get_snapshot(new_name)
+
+        top_sites = []
+        for stat in new.compare_to(old, 'lineno')[:limit]:
+            frame = stat.traceback[0]
+            top_sites.append({
+                'site': f"{self._display_path(frame.filename)}:{frame.lineno}",
+                'module': module_group(frame.filename),
+                'size_diff': stat.size_diff,
+                'size': stat.size,
+                'count_diff': stat.count_diff,
+            })
+
+        groups = {}
+        for stat in new.compare_to(old, 'filename'):
+            group = groups.setdefault(module_group(stat.traceback[0].filename),
+                                      {'size_diff': 0, 'size': 0, 'count_diff': 0})
+            group['size_diff'] += stat.size_diff
+            group['size'] += stat.size
+            group['count_diff'] += stat.count_diff
+
+        by_module = sorted(({'module': name, **values} for name, values in groups.items()),
+                           key=lambda item: abs(item['size_diff']), reverse=True)
+        return {
+            'from': old_name,
+            'to': new_name or 'current',
+            'total_size_diff': sum(item['size_diff'] for item in by_module),
+            'top_sites': top_sites,
+            'by_module': by_module,
+        }
+
+    def get_stats(self):
+        current, peak = tracemalloc.get_traced_memory() if self.enabled else (0, 0)
+        return {
+            'enabled': self.enabled,
+            'started_at': self.started_at,
+            'traced_current': current,
+            'traced_peak': peak,
+            'snapshots': self.list_snapshots(),
+        }
+
+    @staticmethod
+    def _display_path(filename):
+        path = os.path.abspath(filename)
+        if path.startswith(BACKEND_ROOT + os.sep):
+            return os.path.relpath(path, BACKEND_ROOT)
+        return filename
+
+
+# Instance globale
+memory_profiler = MemoryProfiler()
+
+
+def _tracked_structures():
+    """Taille des structures en mémoire suspectées de croître sans borne"""
+    from utils.rate_limiter import rate_limiter
+    return {
+        'rate_limiter.requests': len(rate_limiter.requests),
+        'rate_limiter.blocked_ips': len(rate_limiter.blocked_ips),
+        'performance_monitor.request_times': len(performance_monitor.request_times),
+        'performance_monitor.memory_by_endpoint': len(performance_monitor.memory_by_endpoint),
+    }
+
+
+def monitor_memory(app):
+    """Middleware de suivi mémoire par endpoint et endpoints d'administration"""
+
+    if os.getenv('MEMORY_PROFILING', 'false').lower() == 'true':
+        memory_profiler.start(int(os.getenv('MEMORY_PROFILING_FRAMES', '10')))
+
+    @app.before_request
+    def before_request_memory():
+        if memory_profiler.enabled:
+            # Le pic est global au processus : avec des workers multi-threads,
+            # les requêtes concurrentes se chevauchent dans la mesure
+            tracemalloc.reset_peak()
+            g.memory_start = tracemalloc.get_traced_memory()[0]
+
+    @app.after_request
+    def after_request_memory(response):
+        if memory_profiler.enabled and hasattr(g, 'memory_start'):
+            current, peak = tracemalloc.get_traced_memory()
+            performance_monitor.log_request_memory(
+                request.endpoint or 'unknown',
+                max(0, peak - g.memory_start),
+                current - g.memory_start
+            )
+        return response
+
+    @app.route('/metrics/memory', methods=['GET'])
+    @require_admin
+    def memory_metrics():
+        """État du traçage, allocations par endpoint et structures suivies"""
+        return jsonify({
+            'tracemalloc': memory_profiler.get_stats(),
+            'endpoints': performance_monitor.get_memory_stats(),
+            'structures': _tracked_structures(),
+            'timestamp': time.time()
+        })
+
+    @app.route('/metrics/memory/start', methods=['POST'])
+    @require_admin
+    def memory_start():
+        data = request.get_json(silent=True) or {}
+        try:
+            frames = int(data.get('frames', 10))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'frames doit être un entier'}), 400
+        memory_profiler.start(max(1, frames))
+        return jsonify(memory_profiler.get_stats()), 200
+
+    @app.route('/metrics/memory/stop', methods=['POST'])
+    @require_admin
+    def memory_stop():
+        memory_profiler.stop()
+        return jsonify(memory_profiler.get_stats()), 200
+
+    @app.route('/metrics/memory/snapshots', methods=['POST'])
+    @require_admin
+    def memory_snapshot():
+        data = request.get_json(silent=True) or {}
+        name = data.get('name') or time.strftime('%Y%m%d-%H%M%S')
+        try:
+            snapshot = memory_profiler.take_snapshot(str(name))
+        except RuntimeError as e:
+            return jsonify({'error': str(e)}), 409
+        return jsonify(snapshot), 201
+
+    @app.route('/metrics/memory/diff', methods=['GET'])
+    @require_admin
+    def memory_diff():
+        old_name = request.args.get('from')
+        if not old_name:
+            return jsonify({'error': 'Paramètre from requis'}), 400
+        try:
+            limit = min(int(request.args.get('limit', 20)), 200)
+        except ValueError:
+            limit = 20
+        try:
+            result = memory_profiler.diff(old_name, request.args.get('to'), limit)
+        except KeyError as e:
+            return jsonify({'error': f'Snapshot inconnu: {e.args[0]}'}), 404
+        except RuntimeError as e:
+            return jsonify({'error': str(e)}), 409
+        return jsonify(result), 200
+
+    return app
@@ -15,6 +15,8 @@ class PerformanceMonitor:
     def __init__(self):
         self.request_times = []
         self.slow_queries = []
+        # Allocations mémoire par endpoint (renseigné si tracemalloc est actif)
+        self.memory_by_endpoint = {}
     
     def log_request_time(self, duration, endpoint, method):
         """Enregistrer les temps de réponse"""
@@ -33,6 +35,28 @@ class PerformanceMonitor:
         if duration > 1.0:
             logger.warning(f"Requête lente détectée: {method} {endpoint} - {duration:.2f}s")
     
+    def log_request_memory(self, endpoint, allocated, retained):
+        """Enregistrer les octets alloués (pic) et conservés par une requête"""
+        stats = self.memory_by_endpoint.setdefault(endpoint, {
+            'count': 0, 'allocated_total': 0, 'allocated_max': 0, 'retained_total': 0
+        })
+        stats['count'] += 1
+        stats['allocated_total'] += allocated
+        stats['allocated_max'] = max(stats['allocated_max'], allocated)
+        stats['retained_total'] += retained
+
+    def get_memory_stats(self):
+        """Moyennes d'allocation par endpoint"""
+        return {
+            endpoint: {
+                'requests': stats['count'],
+                'avg_allocated_bytes': stats['allocated_total'] / stats['count'],
+                'max_allocated_bytes': stats['allocated_max'],
+                'avg_retained_bytes': stats['retained_total'] / stats['count']
+            }
+            for endpoint, stats in self.memory_by_endpoint.items()
+        }
+
     def get_stats(self):
         """Obtenir les statistiques de performance"""
         if not self.request_times:
@@ -86,8 +110,39 @@ def monitor_performance(app):
             "disk_usage": psutil.disk_usage('/').percent if os.name != 'nt' else psutil.disk_usage('C:').percent
         }
         
+        from utils.cache import response_cache
+        from utils.invalidation import invalidation_bus
+        from utils.snapshots import snapshots
+        from utils.compression import compression_stats, compressed_variants
+        from utils.counters import hot_counters
+        from utils.loaders import meditation_summaries, exercice_catalog
+        from utils.identity_map import identity_map_stats
+        from utils.search import search_index
+        from utils.trie import autocomplete_index
+        from jobs.scheduler import scheduler
+        from jobs.queue import job_queue
+        from utils.history_store import history_store
+        from utils.auth_middleware import principal_cache
+
         return jsonify({
             "performance": stats,
+            "cache": response_cache.get_stats(),
+            "invalidation": invalidation_bus.get_stats(),
+            "snapshots": {name: snapshot.get_stats() for name, snapshot in snapshots.items()},
+            "compression": {
+                "endpoints": compression_stats.get_stats(),
+                "variants": compressed_variants.get_stats()
+            },
+            "counters": hot_counters.get_stats(),
+            "loaders": {"meditations": meditation_summaries.get_stats(),
+                        "exercices": exercice_catalog.get_stats()},
+            "identity_map": identity_map_stats.get_stats(),
+            "principals": principal_cache.get_stats(),
+            "search": search_index.get_stats(),
+            "autocomplete": autocomplete_index.get_stats(),
+            "scheduler": scheduler.get_stats(),
+            "queue": job_queue.get_stats(),
+            "history_store": history_store.get_stats(),
             "system": system_stats,
             "timestamp": time.time()
         })
@@ -95,42 +150,20 @@ def monitor_performance(app):
     return app
 
 def cache_response(timeout=300):
-    """Décorateur pour mettre en cache les réponses"""
-    def decorator(f):
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            # Simple cache en mémoire pour le développement
-            # En production, utiliser Redis
-            cache_key = f"{request.endpoint}:{str(request.args)}"
-            
-            if hasattr(g, 'cache') and cache_key in g.cache:
-                cached_data, cached_time = g.cache[cache_key]
-                if time.time() - cached_time < timeout:
-                    return cached_data
-            
-            result = f(*args, **kwargs)
-            
-            # Stocker en cache
-            if not hasattr(g, 'cache'):
-                g.cache = {}
-            g.cache[cache_key] = (result, time.time())
-            
-            return result
-        return decorated_function
-    return decorator
+    """Décorateur pour mettre en cache les réponses (voir utils/cache.py)"""
+    from utils.cache import cached_route
+    return cached_route(ttl=timeout)
+
+def compress_response(min_bytes=None):
+    """Décorateur pour compresser les réponses d'une route (voir utils/compression.py)"""
+    from flask import make_response
+    from utils.compression import compress_response_object
 
-def compress_response():
-    """Décorateur pour compresser les réponses JSON"""
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            response = f(*args, **kwargs)
-            
-            # Ajouter header pour la compression
-            if hasattr(response, 'headers'):
-                response.headers['Content-Encoding'] = 'gzip'
-            
-            return response
+            response = make_response(f(*args, **kwargs))
+            return compress_response_object(response, min_bytes=min_bytes)
         return decorated_function
     return decorator
 
@@ -0,0 +1,201 @@
+"""
+Recherche plein texte sur les catalogues (méditations, exercices, contenus)
+
+Index inversé en mémoire, par worker :
+- normalisation française : minuscules, suppression des accents, mots vides,
+  racinisation légère (pluriels et suffixes courants) ;
+- pondération par champ (titre > tags > texte) et classement BM25 ;
+- reconstruit quand la version d'un catalogue change (voir utils/versions.py),
+  jamais de scan de collection au moment de la requête.
+"""
+
+import re
+import math
+import time
+import threading
+import unicodedata
+from collections import defaultdict
+from utils.versions import collection_versions
+import logging
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a au aux avec ce ces d dans de des du elle en et eux il je l la le les leur lui m ma
+mais me meme mes moi mon n ne nos notre nous on ou par pas pour qu que qui s sa se
+ses son sur t ta te tes toi ton tu un une vos votre vous y c est sont etre avoir
+""".split())
+
+# Suffixes retirés, du plus long au plus court (racinisation "légère")
+SUFFIXES = (
+    'issements', 'issement', 'atrices', 'ateurs', 'ations', 'atrice', 'ateur', 'ation',
+    'ements', 'ement', 'ments', 'ment', 'ances', 'ences', 'ance', 'ence', 'ismes', 'isme',
+    'istes', 'iste', 'ites', 'ite', 'euses', 'euse', 'eux', 'ives', 'ive', 'ifs', 'if',
+    'ees', 'ee', 'es', 'er', 'ez', 'e', 's', 'x'
+)
+MIN_STEM = 3
+
+
+def fold(text):
+    """Minuscules sans accents : "Cohérence" -> "coherence" """
+    decomposed = unicodedata.normalize('NFKD', str(text).lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def stem(word):
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+
+def analyze(text):
+    """Texte -> termes indexés (repliés, sans mots vides, racinisés)"""
+    return [stem(token) for token in TOKEN_RE.findall(fold(text))
+            if token not in STOPWORDS]
+
+
+class SearchSource:
+    """Catalogue indexé : collection, champs pondérés et mise en forme des résultats"""
+
+    def __init__(self, name, collection, fields, title_field, text_field,
+                 result_type, query=None):
+        self.name = name
+        self.collection = collection
+        # champ -> poids (un terme du titre compte pour `poids` occurrences)
+        self.fields = fields
+        self.title_field = title_field
+        self.text_field = text_field
+        self.result_type = result_type
+        self.query = query or {}
+
+
+class SearchIndex:
+    def __init__(self, sources, k1=1.2, b=0.75, snippet_length=160):
+        self.sources = {source.name: source for source in sources}
+        self.k1 = k1
+        self.b = b
+        self.snippet_length = snippet_length
+        self._lock = threading.Lock()
+        self._tokens = None
+        # (documents, postings, longueurs, longueur moyenne), remplacé d'un bloc
+        self._state = ([], {}, [], 0.0)
+        self.builds = 0
+        self.last_build_duration = None
+        self.queries = 0
+
+    def _current_tokens(self):
+        return {name: collection_versions.token(source.collection)
+                for name, source in self.sources.items()}
+
+    def ensure_fresh(self):
+        tokens = self._current_tokens()
+        if tokens == self._tokens:
+            return
+        with self._lock:
+            if tokens != self._tokens:
+                self._rebuild(tokens)
+
+    def _rebuild(self, tokens):
+        from config.database import get_db
+        started = time.perf_counter()
+        db = get_db()
+        documents, lengths = [], []
+        postings = defaultdict(dict)
+        for source in self.sources.values():
+            projection = {field: 1 for field in source.fields}
+            projection.update({source.title_field: 1, source.text_field: 1})
+            for document in db[source.collection].find(source.query, projection):
+                frequencies = defaultdict(float)
+                length = 0
+                for field, weight in source.fields.items():
+                    value = document.get(field)
+                    if isinstance(value, (list, tuple)):
+                        value = ' '.join(str(item) for item in value)
+                    for term in analyze(value or ''):
+                        frequencies[term] += weight
+                        length += weight
+                if not frequencies:
+                    continue
+                index = len(documents)
+                text = str(document.get(source.text_field) or '')
+                documents.append({
+                    'type': source.result_type,
+                    'catalog': source.name,
+                    'id': str(document['_id']),
+                    'titre': document.get(source.title_field, ''),
+                    'extrait': text[:self.snippet_length]
+                })
+                lengths.append(length)
+                for term, frequency in frequencies.items():
+                    postings[term][index] = frequency
+
+        avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+        self._state = (documents, dict(postings), lengths, avg_length)
+        self._tokens = tokens
+        self.builds += 1
+        self.last_build_duration = time.perf_counter() - started
+        logger.info(f"Index de recherche reconstruit: {len(documents)} documents, "
+                    f"{len(postings)} termes en {self.last_build_duration * 1000:.1f}ms")
+
+    def search(self, query, catalogs=None, page=1, per_page=20):
+        """
+        Recherche BM25 paginée
+
+        Args:
+            catalogs: Noms de catalogues à interroger (tous par défaut)
+
+        Returns:
+            dict: results (documents avec score), total, page, per_page
+        """
+        self.ensure_fresh()
+        self.queries += 1
+        documents, postings, lengths, avg_length = self._state
+        avg_length = avg_length or 1.0
+        wanted = set(catalogs) if catalogs else None
+        scores = defaultdict(float)
+        total_documents = len(documents)
+
+        for term in set(analyze(query)):
+            matches = postings.get(term)
+            if not matches:
+                continue
+            idf = math.log(1 + (total_documents - len(matches) + 0.5) / (len(matches) + 0.5))
+            for index, frequency in matches.items():
+                if wanted and documents[index]['catalog'] not in wanted:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * lengths[index] / avg_length)
+                scores[index] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        start = (page - 1) * per_page
+        results = [dict(documents[index], score=round(score, 4))
+                   for index, score in ranked[start:start + per_page]]
+        return {'results': results, 'total': len(ranked), 'page': page, 'per_page': per_page}
+
+    def get_stats(self):
+        return {
+            'documents': len(self._state[0]),
+            'terms': len(self._state[1]),
+            'versions': self._tokens,
+            'builds': self.builds,
+            'queries': self.queries,
+            'last_build_ms': self.last_build_duration * 1000
+            if self.last_build_duration is not None else None
+        }
+
+
+# Instance globale
+search_index = SearchIndex([
+    SearchSource('meditations', 'meditations',
+                 {'titre': 3, 'tags': 2, 'description': 1},
+                 'titre', 'description', 'meditation', query={'is_active': True}),
+    SearchSource('exercices', 'exercices',
+                 {'nom': 3, 'description': 1},
+                 'nom', 'description', 'exercice'),
+    SearchSource('contenus', 'contenus',
+                 {'titre': 3, 'texte': 1},
+                 'titre', 'texte', 'contenu'),
+])
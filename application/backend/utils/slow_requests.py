@@ -0,0 +1,295 @@
+"""
+Capture des requêtes lentes pour l'application Flask
+
+Au-delà d'un seuil (global ou par endpoint), un "bundle" JSON est écrit dans
+un anneau borné sur disque : ligne de requête et corps nettoyés, identité,
+commandes MongoDB émises avec leur durée et temps par phase. Le script
+replay_slow_request.py rejoue un bundle contre une instance locale.
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from bson import ObjectId
+from flask import request, g, jsonify
+from pymongo import monitoring
+import jwt
+from config.config import SECRET_KEY
+from utils.auth_middleware import require_admin
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Clés dont la valeur n'est jamais écrite sur disque
+SENSITIVE_KEYS = {'mot_de_passe', 'password', 'token', 'access_token',
+                  'refresh_token', 'secret', 'authorization', 'cookie'}
+# En-têtes conservés (les autres, dont Cookie et Authorization, sont omis)
+KEPT_HEADERS = ('Content-Type', 'Content-Length', 'Accept', 'Accept-Encoding',
+                'User-Agent', 'If-None-Match')
+MAX_BODY_BYTES = 64 * 1024
+MAX_MONGO_COMMANDS = 500
+
+
+def _parse_thresholds(raw):
+    """Format: "endpoint=secondes,endpoint2=secondes" """
+    thresholds = {}
+    for item in filter(None, (part.strip() for part in raw.split(','))):
+        endpoint, _, value = item.partition('=')
+        try:
+            thresholds[endpoint.strip()] = float(value)
+        except ValueError:
+            logger.warning(f"Seuil de requête lente ignoré: {item}")
+    return thresholds
+
+
+def redact(value, depth=0):
+    """Masque les valeurs sensibles et les chaînes d'une structure JSON/BSON"""
+    if depth > 10:
+        return '...'
+    if isinstance(value, dict):
+        return {key: '***' if key.lower() in SENSITIVE_KEYS else redact(item, depth + 1)
+                for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item, depth + 1) for item in value[:50]]
+    if isinstance(value, ObjectId):
+        return {'$oid': str(value)}
+    if isinstance(value, datetime):
+        return {'$date': value.isoformat()}
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    return str(value)[:200]
+
+
+class SlowRequestRecorder(monitoring.CommandListener):
+    """Listener pymongo qui rattache chaque commande à la requête en cours"""
+
+    def __init__(self, directory, ring_size=200, default_threshold=1.0, thresholds=None):
+        self.directory = directory
+        self.ring_size = ring_size
+        self.default_threshold = default_threshold
+        self.thresholds = thresholds or {}
+        self._local = threading.local()
+        self._ring_lock = threading.Lock()
+
+    # ---- Contexte de capture (un par thread / greenlet) ----
+
+    def begin(self):
+        self._local.start = time.perf_counter()
+        self._local.commands = []
+        self._local.pending = {}
+        self._local.phases = {}
+
+    def end(self):
+        commands = getattr(self._local, 'commands', None) or []
+        phases = getattr(self._local, 'phases', None) or {}
+        self._local.commands = None
+        self._local.pending = None
+        self._local.phases = None
+        return commands, phases
+
+    @contextmanager
+    def phase(self, name):
+        """Mesurer une phase nommée d'un handler (ex: 'serialization')"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            phases = getattr(self._local, 'phases', None)
+            if phases is not None:
+                phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+    # ---- CommandListener ----
+
+    def started(self, event):
+        pending = getattr(self._local, 'pending', None)
+        if pending is None:
+            return
+        command = event.command
+        pending[event.request_id] = {
+            'command': event.command_name,
+            'database': event.database_name,
+            'collection': command.get(event.command_name) if isinstance(
+                command.get(event.command_name), str) else None,
+            'details': redact({key: command[key] for key in
+                               ('filter', 'pipeline', 'sort', 'limit', 'projection',
+                                'updates', 'deletes', 'q', 'u')
+                               if key in command}),
+            'offset': time.perf_counter() - self._local.start,
+        }
+
+    def _finish(self, event, success):
+        pending = getattr(self._local, 'pending', None)
+        if pending is None:
+            return
+        entry = pending.pop(event.request_id, None)
+        commands = self._local.commands
+        if entry is None or len(commands) >= MAX_MONGO_COMMANDS:
+            return
+        entry['duration_ms'] = event.duration_micros / 1000.0
+        entry['success'] = success
+        if not success:
+            entry['failure'] = redact(event.failure)
+        commands.append(entry)
+
+    def succeeded(self, event):
+        self._finish(event, True)
+
+    def failed(self, event):
+        self._finish(event, False)
+
+    # ---- Bundles ----
+
+    def threshold_for(self, endpoint):
+        return self.thresholds.get(endpoint, self.default_threshold)
+
+    def write_bundle(self, bundle):
+        """Écrire un bundle et évincer les plus anciens au-delà de ring_size"""
+        os.makedirs(self.directory, exist_ok=True)
+        filename = f"{int(bundle['timestamp'] * 1000)}-{bundle['endpoint']}-{bundle['id'][:8]}.json"
+        path = os.path.join(self.directory, filename.replace('/', '_'))
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(bundle, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+        with self._ring_lock:
+            bundles = self.list_bundle_files()
+            for old in bundles[:max(0, len(bundles) - self.ring_size)]:
+                try:
+                    os.remove(os.path.join(self.directory, old))
+                except OSError:
+                    pass
+        return path
+
+    def list_bundle_files(self):
+        if not os.path.isdir(self.directory):
+            return []
+        # Le préfixe en millisecondes garantit l'ordre chronologique
+        return sorted(name for name in os.listdir(self.directory) if name.endswith('.json'))
+
+
+slow_request_recorder = SlowRequestRecorder(
+    directory=os.getenv('SLOW_REQUEST_DIR', os.path.join('logs', 'slow_requests')),
+    ring_size=int(os.getenv('SLOW_REQUEST_RING_SIZE', '200')),
+    default_threshold=float(os.getenv('SLOW_REQUEST_THRESHOLD', '1.0')),
+    thresholds=_parse_thresholds(os.getenv('SLOW_REQUEST_THRESHOLDS', ''))
+)
+
+# Doit être enregistré avant la création des MongoClient pour les observer
+monitoring.register(slow_request_recorder)
+
+
+def phase(name):
+    """Raccourci: `with phase('serialization'): ...` dans un handler"""
+    return slow_request_recorder.phase(name)
+
+
+def _request_identity():
+    """Identité déduite du token, sans accès à la base"""
+    token = request.cookies.get('access_token')
+    auth_header = request.headers.get('Authorization', '')
+    if not token and auth_header.startswith('Bearer '):
+        token = auth_header.split(' ', 1)[1]
+    if not token:
+        return {'authenticated': False}
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+        return {'authenticated': True, 'user_id': payload.get('user_id'),
+                'email': payload.get('email')}
+    except jwt.InvalidTokenError:
+        return {'authenticated': False, 'invalid_token': True}
+
+
+def _request_body():
+    if request.content_length and request.content_length > MAX_BODY_BYTES:
+        return {'truncated': True, 'size': request.content_length}
+    data = request.get_data(cache=True)
+    if not data:
+        return None
+    if request.is_json:
+        try:
+            return {'json': redact(json.loads(data))}
+        except ValueError:
+            pass
+    return {'raw_size': len(data)}
+
+
+def capture_slow_requests(app):
+    """Middleware de capture des requêtes lentes"""
+
+    @app.before_request
+    def before_request_capture():
+        g.slow_start = time.perf_counter()
+        slow_request_recorder.begin()
+
+    @app.after_request
+    def after_request_capture(response):
+        if not hasattr(g, 'slow_start'):
+            return response
+        duration = time.perf_counter() - g.slow_start
+        commands, phases = slow_request_recorder.end()
+        endpoint = request.endpoint or 'unknown'
+        if duration < slow_request_recorder.threshold_for(endpoint):
+            return response
+
+        mongo_total = sum(command['duration_ms'] for command in commands) / 1000.0
+        phases = dict(phases)
+        phases['mongo'] = mongo_total
+        phases['application'] = max(0.0, duration - mongo_total)
+        phases['total'] = duration
+        try:
+            bundle = {
+                'id': uuid.uuid4().hex,
+                'timestamp': time.time(),
+                'endpoint': endpoint,
+                'threshold': slow_request_recorder.threshold_for(endpoint),
+                'request': {
+                    'method': request.method,
+                    'path': request.path,
+                    'query_string': request.query_string.decode('utf-8', 'replace'),
+                    'headers': {name: request.headers[name] for name in KEPT_HEADERS
+                                if name in request.headers},
+                    'body': _request_body(),
+                },
+                'identity': _request_identity(),
+                'response': {'status': response.status_code,
+                             'size': response.calculate_content_length()},
+                'phases': phases,
+                'mongo_commands': commands,
+            }
+            path = slow_request_recorder.write_bundle(bundle)
+            logger.warning(f"Requête lente capturée: {request.method} {request.path} "
+                           f"- {duration:.2f}s -> {path}")
+        except Exception as e:
+            logger.error(f"Impossible d'écrire le bundle de requête lente: {e}")
+        return response
+
+    @app.teardown_request
+    def teardown_request_capture(exc):
+        # Une exception non gérée saute after_request : ne pas laisser fuiter le contexte
+        slow_request_recorder.end()
+
+    @app.route('/metrics/slow-requests', methods=['GET'])
+    @require_admin
+    def slow_requests_list():
+        """Bundles capturés, du plus récent au plus ancien"""
+        files = slow_request_recorder.list_bundle_files()
+        return jsonify({
+            'directory': slow_request_recorder.directory,
+            'ring_size': slow_request_recorder.ring_size,
+            'bundles': files[::-1]
+        }), 200
+
+    @app.route('/metrics/slow-requests/<name>', methods=['GET'])
+    @require_admin
+    def slow_request_detail(name):
+        if name not in slow_request_recorder.list_bundle_files():
+            return jsonify({'error': 'Bundle non trouvé'}), 404
+        with open(os.path.join(slow_request_recorder.directory, name), encoding='utf-8') as f:
+            return jsonify(json.load(f)), 200
+
+    return app
@@ -0,0 +1,107 @@
+"""
+Snapshots pré-sérialisés des catalogues
+
+Les catalogues (exercices, contenus) sont identiques pour tous les
+utilisateurs : leur JSON et ses versions compressées (gzip, br si
+disponible) sont gardés en mémoire et
+reconstruits uniquement quand la version de la collection change
+(voir utils/versions.py). Un GET devient une lecture de dictionnaire suivie
+de l'écriture des octets.
+"""
+
+import time
+import threading
+from flask import current_app, request, Response
+from config.database import get_db
+from utils.versions import collection_versions
+from utils.compression import (
+    COMPRESSION_MIN_BYTES, available_encodings, compress_bytes, negotiate_encoding
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogSnapshot:
+    def __init__(self, name, loader):
+        """
+        Args:
+            name: Collection dont la version pilote la reconstruction
+            loader: Fonction (db) -> données JSON-sérialisables du catalogue
+        """
+        self.name = name
+        self.loader = loader
+        self._token = None
+        self._body = None
+        # encodage -> corps compressé
+        self._encoded = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.last_build_duration = None
+        self.hits = 0
+
+    def get(self):
+        """Retourne (json, {encodage: json_compressé}) pour la version courante"""
+        token = collection_versions.token(self.name)
+        if token == self._token:
+            self.hits += 1
+            return self._body, self._encoded
+        with self._lock:
+            # Un autre thread a pu reconstruire pendant l'attente du verrou
+            if token != self._token:
+                self._rebuild(token)
+            return self._body, self._encoded
+
+    def _rebuild(self, token):
+        started = time.perf_counter()
+        data = self.loader(get_db())
+        if hasattr(current_app.json, 'dumps_bytes'):
+            body = current_app.json.dumps_bytes(data) + b"\n"
+        else:
+            body = current_app.json.dumps(data).encode('utf-8') + b"\n"
+        encoded = {}
+        if len(body) >= COMPRESSION_MIN_BYTES:
+            encoded = {encoding: compress_bytes(body, encoding)
+                       for encoding in available_encodings()}
+        # La version est lue avant le chargement : une écriture concurrente
+        # donnera un nouveau token et donc une reconstruction au prochain appel
+        self._body, self._encoded, self._token = body, encoded, token
+        self.builds += 1
+        self.last_build_duration = time.perf_counter() - started
+        logger.info(f"Snapshot {self.name} reconstruit ({token}): {len(body)} octets "
+                    f"en {self.last_build_duration * 1000:.1f}ms")
+
+    def response(self):
+        """Réponse Flask servant les octets du snapshot"""
+        body, encoded = self.get()
+        response = Response(mimetype='application/json')
+        response.headers['Vary'] = 'Accept-Encoding'
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''),
+                                      tuple(encoded))
+        if encoding is not None:
+            response.set_data(encoded[encoding])
+            response.headers['Content-Encoding'] = encoding
+        else:
+            response.set_data(body)
+        return response
+
+    def get_stats(self):
+        return {
+            'version': self._token,
+            'bytes': len(self._body) if self._body else 0,
+            'encoded_bytes': {encoding: len(data) for encoding, data in self._encoded.items()},
+            'builds': self.builds,
+            'hits': self.hits,
+            'last_build_ms': self.last_build_duration * 1000
+            if self.last_build_duration is not None else None
+        }
+
+
+# Registre des snapshots (pour les métriques)
+snapshots = {}
+
+
+def register_snapshot(name, loader):
+    snapshot = CatalogSnapshot(name, loader)
+    snapshots[name] = snapshot
+    return snapshot
@@ -0,0 +1,186 @@
+"""
+Autocomplétion par préfixe (trie compressé en mémoire, par worker)
+
+Les noms d'exercices et titres de contenus sont normalisés (minuscules, sans
+accents) et insérés dans un trie radix : le nom complet, puis chaque suffixe
+commençant à un mot ("cardiaque" trouve "Cohérence cardiaque"). Chaque nœud
+garde ses k meilleures suggestions : une complétion ne coûte que la descente
+du préfixe. Les tries sont reconstruits quand la version du catalogue change.
+"""
+
+import time
+import threading
+from utils.search import fold
+from utils.versions import collection_versions
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Une correspondance en début de nom passe avant une correspondance sur un mot
+SCORE_NAME_START = 2
+SCORE_WORD_START = 1
+
+
+class _Node:
+    __slots__ = ('children', 'top')
+
+    def __init__(self):
+        # premier caractère -> (étiquette de l'arête, nœud)
+        self.children = {}
+        # [(rang, suggestion)] trié, borné à top_k
+        self.top = []
+
+
+class RadixTrie:
+    def __init__(self, top_k=10):
+        self.top_k = top_k
+        self.root = _Node()
+        self.keys = 0
+        self.nodes = 1
+
+    def _offer(self, node, rank, suggestion):
+        top = node.top
+        for index, (_, existing) in enumerate(top):
+            if existing['id'] == suggestion['id']:
+                if rank >= top[index][0]:
+                    return
+                del top[index]
+                break
+        if len(top) >= self.top_k and rank >= top[-1][0]:
+            return
+        top.append((rank, suggestion))
+        top.sort(key=lambda entry: entry[0])
+        del top[self.top_k:]
+
+    def insert(self, key, suggestion, score):
+        """Insérer une clé normalisée ; rang = (-score, longueur, texte)"""
+        rank = (-score, len(suggestion['texte']), suggestion['texte'])
+        node = self.root
+        self._offer(node, rank, suggestion)
+        while key:
+            edge = node.children.get(key[0])
+            if edge is None:
+                leaf = _Node()
+                node.children[key[0]] = (key, leaf)
+                self.nodes += 1
+                self._offer(leaf, rank, suggestion)
+                break
+            label, child = edge
+            common = 0
+            limit = min(len(label), len(key))
+            while common < limit and label[common] == key[common]:
+                common += 1
+            if common < len(label):
+                # Scinder l'arête : le nœud intermédiaire hérite des suggestions de l'enfant
+                middle = _Node()
+                middle.children[label[common]] = (label[common:], child)
+                middle.top = list(child.top)
+                node.children[key[0]] = (label[:common], middle)
+                self.nodes += 1
+                child = middle
+            node = child
+            key = key[common:]
+            self._offer(node, rank, suggestion)
+        self.keys += 1
+
+    def complete(self, prefix, limit=None):
+        """Meilleures suggestions pour un préfixe normalisé"""
+        node = self.root
+        while prefix:
+            edge = node.children.get(prefix[0])
+            if edge is None:
+                return []
+            label, child = edge
+            if label.startswith(prefix):
+                node = child
+                break
+            if not prefix.startswith(label):
+                return []
+            node = child
+            prefix = prefix[len(label):]
+        return node.top[:limit or self.top_k]
+
+
+class AutocompleteSource:
+    def __init__(self, name, collection, field, result_type):
+        self.name = name
+        self.collection = collection
+        self.field = field
+        self.result_type = result_type
+
+
+class AutocompleteIndex:
+    def __init__(self, sources, top_k=10):
+        self.sources = {source.name: source for source in sources}
+        self.top_k = top_k
+        self._tries = {}
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.last_build_duration = None
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+
+    def _trie(self, name):
+        source = self.sources[name]
+        token = collection_versions.token(source.collection)
+        if self._tokens.get(name) != token:
+            with self._lock:
+                if self._tokens.get(name) != token:
+                    self._tries[name] = self._build(source)
+                    self._tokens[name] = token
+        return self._tries[name]
+
+    def _build(self, source):
+        from config.database import get_db
+        started = time.perf_counter()
+        trie = RadixTrie(self.top_k)
+        for document in get_db()[source.collection].find({}, {source.field: 1}):
+            text = str(document.get(source.field) or '').strip()
+            normalized = ' '.join(fold(text).split())
+            if not normalized:
+                continue
+            suggestion = {'type': source.result_type, 'id': str(document['_id']), 'texte': text}
+            trie.insert(normalized, suggestion, SCORE_NAME_START)
+            position = normalized.find(' ')
+            while position != -1:
+                trie.insert(normalized[position + 1:], suggestion, SCORE_WORD_START)
+                position = normalized.find(' ', position + 1)
+        self.builds += 1
+        self.last_build_duration = time.perf_counter() - started
+        logger.info(f"Trie {source.name} reconstruit: {trie.keys} clés, {trie.nodes} nœuds "
+                    f"en {self.last_build_duration * 1000:.1f}ms")
+        return trie
+
+    def complete(self, prefix, catalogs=None, limit=8):
+        normalized = ' '.join(fold(prefix).split())
+        if not normalized:
+            return []
+        tries = [self._trie(name) for name in (catalogs or self.sources)]
+        started = time.perf_counter()
+        entries = []
+        for trie in tries:
+            entries.extend(trie.complete(normalized, limit))
+        entries.sort(key=lambda entry: entry[0])
+        suggestions = [suggestion for _, suggestion in entries[:limit]]
+        self.lookups += 1
+        self.lookup_seconds += time.perf_counter() - started
+        return suggestions
+
+    def get_stats(self):
+        return {
+            'versions': dict(self._tokens),
+            'keys': {name: trie.keys for name, trie in self._tries.items()},
+            'builds': self.builds,
+            'last_build_ms': self.last_build_duration * 1000
+            if self.last_build_duration is not None else None,
+            'lookups': self.lookups,
+            'avg_lookup_us': self.lookup_seconds * 1e6 / self.lookups if self.lookups else None
+        }
+
+
+# Instance globale
+autocomplete_index = AutocompleteIndex([
+    AutocompleteSource('exercices', 'exercices', 'nom', 'exercice'),
+    AutocompleteSource('contenus', 'contenus', 'titre', 'contenu'),
+])
@@ -0,0 +1,229 @@
+"""
+Opérations groupées sur les comptes utilisateurs (admin)
+
+Désactivation, réactivation ou suppression d'un ensemble de comptes désignés
+par une liste d'ids ou par un filtre (rôle, statut, domaine d'email, date de
+création : une promotion entière par exemple).
+
+- Pré-vérification : une seule agrégation ($facet) donne le nombre de comptes
+  visés, leur répartition par rôle et ceux déjà dans l'état demandé.
+- Exécution : une tâche de la file (jobs/queue.py) parcourt les comptes par
+  lots (pagination sur _id) et les modifie par bulk_write ; la progression
+  est écrite dans `operations_utilisateurs` après chaque lot. Les mises à
+  jour sont conditionnelles : une tâche reprise repasse sans effet sur les
+  comptes déjà traités.
+- Une suppression marque les comptes ; leurs données sont supprimées en
+  arrière-plan (jobs/user_deletion.py).
+- Chaque lot invalide le cache des utilisateurs authentifiés
+  (utils/auth_middleware.py) : un compte désactivé est refusé par tous les
+  workers dès la relecture suivante de la version de `utilisateurs`.
+"""
+
+import os
+import re
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+from utils.auth_middleware import invalidate_principals
+from jobs.user_deletion import DELETIONS_COLLECTION, start_deletion
+from jobs.queue import task, enqueue
+import logging
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS_COLLECTION = 'operations_utilisateurs'
+CHUNK_SIZE = int(os.getenv('BULK_USERS_CHUNK_SIZE', '500'))
+MAX_IDS = int(os.getenv('BULK_USERS_MAX_IDS', '10000'))
+
+ACTIONS = ('deactivate', 'reactivate', 'delete')
+FILTER_FIELDS = ('role', 'est_actif', 'email_domaine', 'cree_apres', 'cree_avant')
+
+# Comptes déjà dans l'état visé (ignorés à l'exécution)
+ALREADY_DONE = {
+    'deactivate': {'est_actif': False},
+    'reactivate': {'est_actif': {'$ne': False}},
+    'delete': {'suppression_demandee_le': {'$exists': True}},
+}
+
+
+class OperationError(ValueError):
+    pass
+
+
+def build_query(ids=None, filtre=None, admin=None):
+    """Filtre MongoDB des comptes visés, à partir d'ids ou d'un filtre restreint"""
+    if bool(ids) == bool(filtre):
+        raise OperationError("Fournir soit 'ids', soit 'filtre'")
+
+    if ids:
+        if not isinstance(ids, list) or len(ids) > MAX_IDS:
+            raise OperationError(f"'ids' doit être une liste d'au plus {MAX_IDS} identifiants")
+        try:
+            query = {'_id': {'$in': [ObjectId(user_id) for user_id in ids]}}
+        except Exception:
+            raise OperationError("ID d'utilisateur invalide")
+    else:
+        if not isinstance(filtre, dict):
+            raise OperationError("'filtre' doit être un objet")
+        query = {}
+        if 'role' in filtre:
+            query['role'] = str(filtre['role'])
+        if 'est_actif' in filtre:
+            query['est_actif'] = {'$ne': False} if filtre['est_actif'] else False
+        if filtre.get('email_domaine'):
+            domain = str(filtre['email_domaine']).lstrip('@').lower()
+            query['email'] = {'$regex': f"@{re.escape(domain)}$"}
+        dates = {}
+        try:
+            if filtre.get('cree_apres'):
+                dates['$gte'] = datetime.fromisoformat(str(filtre['cree_apres']))
+            if filtre.get('cree_avant'):
+                dates['$lt'] = datetime.fromisoformat(str(filtre['cree_avant']))
+        except ValueError:
+            raise OperationError("Format de date invalide (ISO 8601 attendu)")
+        if dates:
+            query['date_creation'] = dates
+        if not query:
+            raise OperationError("Filtre vide : préciser au moins un critère")
+
+    if admin is not None:
+        # Mêmes règles que DELETE /users/<id> : jamais son propre compte,
+        # les autres admins seulement pour un super-admin
+        query = {'$and': [query, {'_id': {'$ne': admin['_id']}}]}
+        if admin.get('role') != 'super-admin':
+            query['$and'].append({'role': {'$ne': 'admin'}})
+    return query
+
+
+def preflight(db, action, query):
+    """Comptes visés par l'opération, en une agrégation"""
+    if action not in ACTIONS:
+        raise OperationError(f"Action inconnue: {action}")
+    pipeline = [
+        {'$match': query},
+        {'$facet': {
+            'total': [{'$count': 'n'}],
+            'par_role': [{'$group': {'_id': {'$ifNull': ['$role', 'utilisateur']}, 'n': {'$sum': 1}}}],
+            'deja_fait': [{'$match': ALREADY_DONE[action]}, {'$count': 'n'}]
+        }}
+    ]
+    result = next(db.utilisateurs.aggregate(pipeline, allowDiskUse=True), {})
+
+    def count(name):
+        values = result.get(name) or []
+        return values[0]['n'] if values else 0
+
+    return {
+        'action': action,
+        'total': count('total'),
+        'par_role': {row['_id']: row['n'] for row in result.get('par_role', [])},
+        'deja_fait': count('deja_fait'),
+        'a_traiter': count('total') - count('deja_fait')
+    }
+
+
+def _requests(db, action, chunk, admin_id, now):
+    """Opérations bulk_write d'un lot"""
+    ids = [user['_id'] for user in chunk]
+    if action == 'deactivate':
+        return [UpdateOne({'_id': user_id, 'est_actif': {'$ne': False}},
+                          {'$set': {'est_actif': False, 'desactive_le': now, 'desactive_par': admin_id}})
+                for user_id in ids]
+    if action == 'reactivate':
+        # Un compte en cours de suppression n'est pas réactivé
+        return [UpdateOne({'_id': user_id, 'est_actif': False,
+                           'suppression_demandee_le': {'$exists': False}},
+                          {'$set': {'est_actif': True},
+                           '$unset': {'desactive_le': '', 'desactive_par': ''}})
+                for user_id in ids]
+    # Suppression : suivi créé avant le marquage, comme request_deletion
+    db[DELETIONS_COLLECTION].bulk_write([UpdateOne(
+        {'_id': user['_id']},
+        {'$setOnInsert': {'email': user.get('email'),
+                          'nom': f"{user.get('prenom', '')} {user.get('nom', '')}".strip(),
+                          'statut': 'en_attente', 'progression': {}, 'tentatives': 0,
+                          'demandee_le': now, 'demandee_par': admin_id}},
+        upsert=True) for user in chunk], ordered=False)
+    return [UpdateOne({'_id': user_id, 'suppression_demandee_le': {'$exists': False}},
+                      {'$set': {'est_actif': False, 'suppression_demandee_le': now}})
+            for user_id in ids]
+
+
+def _chunks(db, query, chunk_size):
+    """Comptes visés par lots, pagination sur _id (stable pendant les écritures)"""
+    last_id = None
+    while True:
+        page_query = query if last_id is None else {'$and': [query, {'_id': {'$gt': last_id}}]}
+        chunk = list(db.utilisateurs.find(page_query, {'email': 1, 'nom': 1, 'prenom': 1})
+                     .sort('_id', 1).limit(chunk_size))
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]['_id']
+
+
+def run_operation(db, operation_id, action, query, admin_id=None, chunk_size=CHUNK_SIZE):
+    """Exécuter l'opération par lots ; la progression est écrite après chaque lot"""
+    progress = {'traites': 0, 'modifies': 0, 'ignores': 0}
+    operations = db[OPERATIONS_COLLECTION]
+    try:
+        for chunk in _chunks(db, query, chunk_size):
+            result = db.utilisateurs.bulk_write(_requests(db, action, chunk, admin_id, datetime.utcnow()),
+                                                ordered=False)
+            changed = result.modified_count
+            invalidate_principals(*[user['_id'] for user in chunk])
+            progress['traites'] += len(chunk)
+            progress['modifies'] += changed
+            progress['ignores'] += len(chunk) - changed
+            operations.update_one({'_id': operation_id}, {'$set': dict(progress)})
+        if action == 'delete':
+            # Les comptes marqués sont traités tout de suite, sans attendre la tâche planifiée
+            start_deletion(db)
+    except Exception as e:
+        logger.error(f"Opération {operation_id} en échec: {e}")
+        operations.update_one({'_id': operation_id}, {'$set': {
+            'statut': 'erreur', 'erreur': str(e), 'fin': datetime.utcnow()}})
+        raise
+    operations.update_one({'_id': operation_id}, {
+        '$set': {'statut': 'termine', 'fin': datetime.utcnow()}, '$unset': {'erreur': ''}})
+    return progress
+
+
+def start_operation(db, action, summary, admin, ids=None, filtre=None):
+    """
+    Mettre l'opération en file ; retourne le document de suivi
+
+    La tâche reçoit les ids ou le filtre (pas la requête MongoDB : les clés
+    en $ ne peuvent pas être stockées) et reconstruit la requête.
+    """
+    operation = {
+        '_id': ObjectId(),
+        'action': action,
+        'critere': {'ids': len(ids)} if ids else filtre,
+        'preverification': summary,
+        'statut': 'en_attente',
+        'total': summary['total'],
+        'traites': 0,
+        'modifies': 0,
+        'ignores': 0,
+        'demande_par': admin['_id'],
+        'debut': datetime.utcnow()
+    }
+    db[OPERATIONS_COLLECTION].insert_one(operation)
+    operation['tache'] = enqueue('operation_utilisateurs', {
+        'operation_id': operation['_id'],
+        'action': action,
+        'ids': [str(user_id) for user_id in ids] if ids else None,
+        'filtre': {key: filtre[key] for key in FILTER_FIELDS if key in filtre} if filtre else None,
+        'admin': {'_id': admin['_id'], 'role': admin.get('role')}
+    }, priority=5, db=db)
+    return operation
+
+
+@task('operation_utilisateurs', priority=5)
+def operation_task(db, donnees):
+    """Handler de la file : reconstruire la requête puis exécuter l'opération"""
+    operation_id = donnees['operation_id']
+    db[OPERATIONS_COLLECTION].update_one({'_id': operation_id}, {'$set': {'statut': 'en_cours'}})
+    query = build_query(donnees.get('ids'), donnees.get('filtre'), donnees['admin'])
+    return run_operation(db, operation_id, donnees['action'], query, donnees['admin']['_id'])
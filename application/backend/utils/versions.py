@@ -0,0 +1,206 @@
+"""
+Compteurs de version par collection et GET conditionnels (ETag)
+
+Chaque écriture admin sur un catalogue incrémente le compteur de la collection
+(document {_id: <collection>, version: n} dans `versions_collections`). Les
+ETags des endpoints de catalogue en sont dérivés : un If-None-Match qui
+correspond est servi en 304 sans interroger le catalogue ni sérialiser.
+
+Toute version plus récente observée par un worker (écriture locale, relecture
+périodique ou bus d'invalidation) évince ses entrées de cache pour la collection.
+"""
+
+import os
+import time
+import threading
+import uuid
+from functools import wraps
+from flask import request, make_response
+from pymongo import ReturnDocument
+from datetime import datetime
+from utils.cache import response_cache
+from utils.invalidation import invalidation_bus
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CollectionVersions:
+    """Versions des collections, mises en cache localement par worker"""
+
+    def __init__(self, collection_name='versions_collections', refresh_interval=1.0):
+        self.collection_name = collection_name
+        # Durée pendant laquelle une version lue est considérée fraîche
+        self.refresh_interval = refresh_interval
+        self._collection = None
+        # name -> (version, epoch, vu_a)
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """callback(name, version) appelé quand une version plus récente est vue"""
+        self._subscribers.append(callback)
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            from config.database import get_db
+            self._collection = get_db()[self.collection_name]
+        return self._collection
+
+    def _fresh_entry(self, name):
+        cached = self._versions.get(name)
+        now = time.monotonic()
+        if cached is not None and now - cached[2] < self.refresh_interval:
+            return cached
+        doc = self.collection.find_one({'_id': name})
+        if doc is None:
+            # L'epoch distingue un compteur recréé (base réinitialisée) de l'ancien
+            doc = self.collection.find_one_and_update(
+                {'_id': name},
+                {'$setOnInsert': {'version': 0, 'epoch': uuid.uuid4().hex[:8]}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        return self._store(name, doc['version'], doc.get('epoch', ''), now)
+
+    def get(self, name):
+        """Version courante (lecture MongoDB au plus une fois par refresh_interval)"""
+        return self._fresh_entry(name)[0]
+
+    def token(self, name):
+        """Identifiant de version "epoch.version" utilisé dans les ETags"""
+        version, epoch, _ = self._fresh_entry(name)
+        return f"{epoch}.{version}"
+
+    def bump(self, name):
+        """Incrémenter atomiquement la version d'une collection"""
+        doc = self.collection.find_one_and_update(
+            {'_id': name},
+            {
+                '$inc': {'version': 1},
+                '$set': {'modifie_le': datetime.utcnow()},
+                '$setOnInsert': {'epoch': uuid.uuid4().hex[:8]}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._store(name, doc['version'], doc.get('epoch', ''), time.monotonic())
+        return doc['version'], doc.get('epoch', '')
+
+    def set_local(self, name, version, epoch):
+        """Mettre à jour la version connue localement (sans accès MongoDB)"""
+        self._store(name, version, epoch, time.monotonic())
+
+    def _store(self, name, version, epoch, seen_at):
+        with self._lock:
+            current = self._versions.get(name)
+            # Ne jamais revenir à une version plus ancienne du même compteur
+            if current is None or current[1] != epoch or version >= current[0]:
+                self._versions[name] = (version, epoch, seen_at)
+            stored = self._versions[name]
+        changed = current is not None and (current[0], current[1]) != (stored[0], stored[1])
+        if changed:
+            for callback in self._subscribers:
+                try:
+                    callback(name, version)
+                except Exception as e:
+                    logger.error(f"Abonné de version en erreur: {e}")
+        return stored
+
+    def snapshot(self):
+        return {name: {'version': version, 'epoch': epoch}
+                for name, (version, epoch, _) in self._versions.items()}
+
+
+# Instance globale : la relecture périodique borne la durée de vie des
+# entrées périmées même si le bus d'invalidation est indisponible
+collection_versions = CollectionVersions(
+    refresh_interval=min(float(os.getenv('VERSION_REFRESH_SECONDS', '1.0')),
+                         invalidation_bus.max_staleness)
+)
+
+# Nouvelle version observée -> éviction locale des entrées de la collection
+collection_versions.subscribe(
+    lambda name, version: response_cache.invalidate_tag(name, local_only=True)
+)
+# Version reçue d'un autre worker -> mise à jour locale (et donc éviction)
+invalidation_bus.subscribe(collection_versions.set_local)
+
+
+def bump_version(*names):
+    """À appeler après une écriture sur un catalogue"""
+    for name in names:
+        try:
+            version, epoch = collection_versions.bump(name)
+            logger.info(f"Version de {name}: {version}")
+            invalidation_bus.publish(name, version, epoch)
+        except Exception as e:
+            logger.error(f"Impossible d'incrémenter la version de {name}: {e}")
+            response_cache.invalidate_tag(name, local_only=True)
+        if response_cache.shared is not None:
+            response_cache.shared.invalidate_tag(name)
+
+
+def compute_etag(collections):
+    parts = [f"{name}.{collection_versions.token(name)}" for name in collections]
+    parts.extend(f"{key}.{value}" for key, value in sorted((request.view_args or {}).items()))
+    return '"' + '-'.join(parts) + '"'
+
+
+def encoded_etag(etag, encoding):
+    """Variante d'ETag fort propre à un Content-Encoding (gzip, br)"""
+    return f'{etag[:-1]}-{encoding}"' if encoding and encoding != 'identity' else etag
+
+
+def etag_matches(etag, header):
+    """
+    Comparaison faible (RFC 9110) d'un If-None-Match avec l'ETag courant
+    ou l'une de ses variantes encodées ; retourne le tag correspondant
+    """
+    if not header:
+        return None
+    if header.strip() == '*':
+        return etag
+    accepted = {etag} | {encoded_etag(etag, encoding) for encoding in ('gzip', 'br')}
+    for tag in (candidate.strip() for candidate in header.split(',')):
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag in accepted:
+            return tag
+    return None
+
+
+def conditional_get(*collections):
+    """
+    Décorateur d'ETag fort basé sur les versions de collections
+
+    À placer avant @cached_route : un 304 court-circuite le cache et le handler.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return f(*args, **kwargs)
+            try:
+                etag = compute_etag(collections)
+            except Exception as e:
+                logger.warning(f"ETag indisponible: {e}")
+                return f(*args, **kwargs)
+
+            matched = etag_matches(etag, request.headers.get('If-None-Match'))
+            if matched:
+                response = make_response('', 304)
+                response.headers['ETag'] = matched
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response.headers['ETag'] = encoded_etag(
+                    etag, response.headers.get('Content-Encoding'))
+            # Le client peut garder la réponse mais doit la revalider
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return decorated_function
+    return decorator